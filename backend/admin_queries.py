@@ -0,0 +1,71 @@
+"""
+Admin endpoint queries and validation, shared by the Flask views in
+app.py and the async endpoints in asgi.py so both modes serve the same
+API from one definition.
+
+Queries are (table, op, build) specs, run with run_query(*spec) or
+await run_query_async(*spec). Validation raises ValueError with the
+message the endpoint answers 400 with.
+"""
+LEARNED_LOCATION_FIELDS = ("verified", "municipality", "barangay", "location_type", "location_name")
+REPORT_STATUSES = ("confirmed", "not_yet_confirmed", "ongoing")
+
+
+def _object(body) -> dict:
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    return body
+
+
+def list_rows(table: str) -> tuple:
+    return table, "select", lambda t: t.select("*").order("created_at", desc=True)
+
+
+def delete_row(table: str, row_id: int) -> tuple:
+    return table, "delete", lambda t: t.delete().eq("id", row_id)
+
+
+def update_learned_location(loc_id: int, body) -> tuple:
+    updates = {field: value for field, value in _object(body).items() if field in LEARNED_LOCATION_FIELDS}
+    if not updates:
+        raise ValueError("No valid fields to update")
+    return "learned_locations", "update", lambda t: t.update(updates).eq("id", loc_id)
+
+
+def update_report_status(report_id: int, body) -> tuple:
+    status = _object(body).get("status")
+    if status not in REPORT_STATUSES:
+        raise ValueError("Invalid status")
+    return "community_reports", "update", lambda t: t.update({"status": status}).eq("id", report_id)
+
+
+def get_maintenance() -> tuple:
+    return "app_settings", "select", lambda t: t.select("value").eq("key", "maintenance_mode")
+
+
+def set_maintenance(body) -> tuple:
+    """(query, enabled) for turning maintenance mode on or off."""
+    enabled = "true" if _object(body).get("enabled") else "false"
+    query = "app_settings", "upsert", lambda t: t.upsert({"key": "maintenance_mode", "value": enabled}, on_conflict="key")
+    return query, enabled == "true"
+
+
+def maintenance_enabled(res) -> bool:
+    return res.data[0]["value"] == "true" if res.data else False
+
+
+def first_row(res) -> dict:
+    return res.data[0] if res.data else {}
+
+
+def overview_queries() -> list:
+    """Independent reads for GET /api/admin/overview; asgi.py runs them concurrently."""
+    return [list_rows("learned_locations"), list_rows("community_reports"), get_maintenance()]
+
+
+def overview(locations, reports, maintenance) -> dict:
+    return {
+        "learned_locations": locations.data or [],
+        "reports": reports.data or [],
+        "maintenance": {"enabled": maintenance_enabled(maintenance)},
+    }
@@ -1,8 +1,14 @@
 import truststore
 truststore.inject_into_ssl()
 
+import hmac
+import json
 import os
+import secrets
+import threading
+import time
 import requests as http_requests
+from datetime import datetime
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
@@ -11,18 +17,33 @@ from dotenv import load_dotenv
 # Load .env at the very beginning
 load_dotenv()
 
-from logic import get_notices
-from db import save_notices_to_supabase, delete_old_notices
-from supabase_client import supabase
+from supabase_client import run_query
+from db import bump_learned_locations_version, deactivate_subscriptions, get_subscription_secret, save_subscriptions
+from jobs import enqueue_job, get_job, start_worker, acquire_trigger, release_trigger
+import admin_queries
+import outage_index
+import location_search
+import notify
+import report_heatmap
+import report_ingest
+import reference_data
 
 ADMIN_KEY = os.getenv("ADMIN_KEY", "")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
 GITHUB_REPO = os.getenv("GITHUB_REPO", "iandotjs/brownout-schedule-checker")
 GITHUB_WORKFLOW = os.getenv("GITHUB_WORKFLOW", "scraper.yml")
+# Repeat workflow dispatches for the same environment within this window are refused
+SCRAPE_TRIGGER_COOLDOWN_SECONDS = int(os.getenv("SCRAPE_TRIGGER_COOLDOWN_SECONDS", "600"))
+# Subscribe/unsubscribe requests allowed per client IP per hour
+SUBSCRIPTION_RATE_PER_HOUR = int(os.getenv("SUBSCRIPTION_RATE_PER_HOUR", "20"))
 
 # --- Flask app setup ---
 app = Flask(__name__)
 
+# Resume any queued/orphaned scrape jobs left over from a previous process.
+if os.getenv("SCRAPE_WORKER_ENABLED", "true").lower() == "true":
+    start_worker()
+
 # Lock CORS to known frontend origins while allowing local dev.
 ALLOWED_ORIGINS = [
     os.getenv("FRONTEND_ORIGIN", "https://zn-outages.vercel.app"),
@@ -33,7 +54,7 @@ CORS(
     app,
     resources={r"/api/.*": {"origins": ALLOWED_ORIGINS}},
     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "X-Admin-Key"],
+    allow_headers=["Content-Type", "Authorization", "X-Admin-Key", "X-Device-Id", "X-Subscription-Secret"],
 )
 
 
@@ -44,7 +65,7 @@ def add_cors_headers(response):
         response.headers["Access-Control-Allow-Origin"] = origin
         response.headers["Vary"] = "Origin"
         response.headers["Access-Control-Allow-Methods"] = "GET,POST,PUT,PATCH,DELETE,OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization,X-Admin-Key"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type,Authorization,X-Admin-Key,X-Device-Id,X-Subscription-Secret"
     return response
 
 @app.route("/")
@@ -58,10 +79,293 @@ def scrape_and_save_notices():
         return ("", 204)
 
     try:
-        notices = get_notices()  # scrape fresh notices
-        result = save_notices_to_supabase(notices)  # save via db.py
-        deleted = delete_old_notices() # clean up fully expired schedules
-        return jsonify({"message": f"Saved {result['inserted']} notices. Deleted {deleted} old notices."}), 201
+        # The scrape runs on the background worker (see jobs.py); poll the job for progress
+        # Concurrent triggers share the in-flight job; recent runs are reused during cooldown
+        start_worker()
+        job, outcome = enqueue_job("scrape")
+        if outcome == "cooldown":
+            return jsonify({
+                "message": "A scrape finished recently; returning its summary",
+                "job_id": job["id"],
+                "job": job,
+            }), 200
+        message = "Scrape already in progress" if outcome == "in_progress" else "Scrape job queued"
+        return jsonify({"message": message, "job_id": job["id"], "job": job}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/notices/jobs/<job_id>", methods=["GET", "OPTIONS"])
+def get_scrape_job(job_id):
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ==============================
+# Location search (see location_search.py)
+# ==============================
+
+@app.route("/api/locations/search", methods=["GET", "OPTIONS"])
+def search_locations():
+    """
+    Barangay candidates for a purok, landmark, street or barangay name (see location_search.py).
+    `?q=` (prefix queries work as the user types), optional `?municipality=` name or code, `?limit=`.
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+    query = (request.args.get("q") or "").strip()
+    if len(query) > 100:
+        return jsonify({"error": "q is too long"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 25)
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    try:
+        results = location_search.search(query, limit, request.args.get("municipality"))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    resp = jsonify({"query": query, "results": results})
+    resp.headers["Cache-Control"] = "public, max-age=60"
+    return resp
+
+
+# ==============================
+# Outage lookups (see outage_index.py)
+# ==============================
+
+@app.route("/api/outages/barangays/<code>", methods=["GET", "OPTIONS"])
+def get_barangay_outages(code):
+    """
+    Is this barangay (PSGC code) without power? `?at=` (ISO time, default
+    now) for one moment, or `?start=&end=` for every outage in a range.
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        if request.args.get("start") or request.args.get("end"):
+            start = outage_index.parse_time(request.args.get("start"))
+            end = outage_index.parse_time(request.args.get("end"))
+            if end <= start:
+                return jsonify({"error": "end must be after start"}), 400
+        else:
+            start = None
+            at = outage_index.parse_time(request.args.get("at"))
+    except ValueError:
+        return jsonify({"error": "Invalid time; use ISO 8601"}), 400
+    try:
+        index = outage_index.get_index()
+        if start is not None:
+            outages = outage_index.outages_between(index, code, start, end)
+            window = {"start": start.isoformat(), "end": end.isoformat()}
+        else:
+            outages = outage_index.outages_at(index, code, at)
+            window = {"at": at.isoformat()}
+        return jsonify({
+            "barangay": code,
+            **window,
+            "affected": bool(outages),
+            "outages": [outage_index.serialize(o) for o in outages],
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/outages/municipalities/<code>", methods=["GET", "OPTIONS"])
+def get_municipality_outages(code):
+    """Barangays of a municipality (PSGC code) without power `?at=` (default now)."""
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        at = outage_index.parse_time(request.args.get("at"))
+    except ValueError:
+        return jsonify({"error": "Invalid time; use ISO 8601"}), 400
+    try:
+        affected = outage_index.affected_in_municipality(outage_index.get_index(), code, at)
+        return jsonify({
+            "municipality": code,
+            "at": at.isoformat(),
+            "affected": [
+                {"code": b["code"], "name": b["name"], "outages": [outage_index.serialize(o) for o in b["outages"]]}
+                for b in affected
+            ],
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/stats/outages", methods=["GET", "OPTIONS"])
+def get_outage_stats():
+    """
+    Reliability statistics (see outage_stats.py) for schedules starting in
+    `?from=`..`?to=` (YYYY-MM), optionally `?municipality=` / `?barangay=` (PSGC), `?top=`.
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        top = min(max(int(request.args.get("top", 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "top must be a number"}), 400
+    try:
+        # Imported here: numpy is the heaviest import, and only this endpoint needs it
+        import outage_stats
+
+        stats = outage_stats.get_stats(
+            request.args.get("from"), request.args.get("to"),
+            request.args.get("municipality"), request.args.get("barangay"), top,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    resp = jsonify(stats)
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    return resp
+
+
+# ==============================
+# Schedule subscriptions (see notify.py)
+# ==============================
+
+_subscription_requests = {}  # client IP -> request times in the last hour
+_subscription_lock = threading.Lock()
+
+
+def subscription_retry_after(ip: str) -> float:
+    """0 if this IP may make another subscription request (counted), else seconds to wait."""
+    now = time.time()
+    with _subscription_lock:
+        if len(_subscription_requests) > 10000:
+            for key in [k for k, times in _subscription_requests.items() if now - times[-1] > 3600]:
+                del _subscription_requests[key]
+        times = [t for t in _subscription_requests.get(ip, []) if now - t < 3600]
+        if len(times) >= SUBSCRIPTION_RATE_PER_HOUR:
+            _subscription_requests[ip] = times
+            return times[0] + 3600 - now
+        _subscription_requests[ip] = times + [now]
+        return 0.0
+
+
+@app.route("/api/subscriptions", methods=["POST", "DELETE", "OPTIONS"])
+def manage_subscriptions():
+    """
+    POST {"barangay_codes": [...], "kind": "webhook"|"webpush", "endpoint": url or PushSubscription}
+    subscribes. A new endpoint gets a secret (webhook signing key, needed to unsubscribe);
+    a new webhook must first echo a verification challenge (notify.verify_webhook). Changing
+    an existing endpoint's barangays needs its X-Subscription-Secret, and the secret is
+    never returned again.
+    DELETE with X-Subscription-Secret (and optional {"barangay_codes"}) unsubscribes.
+    """
+    if request.method == "OPTIONS":
+        return ("", 204)
+    retry_after = subscription_retry_after(client_ip())
+    if retry_after:
+        response = jsonify({"error": "Too many subscription requests; please try again later"})
+        response.headers["Retry-After"] = str(int(retry_after) + 1)
+        return response, 429
+    body = request.get_json(silent=True) or {}
+    codes = body.get("barangay_codes")
+    if codes is not None and (not isinstance(codes, list) or not all(isinstance(c, str) for c in codes)):
+        return jsonify({"error": "barangay_codes must be a list of PSGC codes"}), 400
+    try:
+        if request.method == "DELETE":
+            secret = request.headers.get("X-Subscription-Secret", "")
+            if not secret:
+                return jsonify({"error": "X-Subscription-Secret header required"}), 400
+            return jsonify({"unsubscribed": deactivate_subscriptions(secret, codes)})
+
+        known = {
+            b["code"]
+            for muni in reference_data.get_index()["municipalities"].values()
+            for b in muni["barangays"]
+        }
+        if not codes or any(c not in known for c in codes):
+            return jsonify({"error": "barangay_codes must be known barangay PSGC codes"}), 400
+        kind = body.get("kind", "webhook")
+        endpoint = body.get("endpoint")
+        if kind == "webhook":
+            if not isinstance(endpoint, str) or not endpoint.startswith("https://"):
+                return jsonify({"error": "endpoint must be an https URL"}), 400
+        elif kind == "webpush":
+            if not isinstance(endpoint, dict) or not str(endpoint.get("endpoint", "")).startswith("https://"):
+                return jsonify({"error": "endpoint must be a PushSubscription object"}), 400
+            endpoint = json.dumps(endpoint, sort_keys=True)
+        else:
+            return jsonify({"error": "kind must be webhook or webpush"}), 400
+
+        existing = get_subscription_secret(kind, endpoint)
+        if existing is not None:
+            # Only the holder of the endpoint's secret may change its subscriptions
+            secret = request.headers.get("X-Subscription-Secret", "")
+            if not hmac.compare_digest(secret.encode(), existing.encode()):
+                return jsonify({"error": "Endpoint already subscribed; send its X-Subscription-Secret"}), 403
+            return jsonify({"subscribed": save_subscriptions(kind, endpoint, secret, codes)})
+
+        secret = secrets.token_urlsafe(24)
+        if kind == "webhook" and not notify.verify_webhook(endpoint, secret):
+            return jsonify({"error": "endpoint did not echo the verification challenge"}), 400
+        subscribed = save_subscriptions(kind, endpoint, secret, codes)
+        if not subscribed:
+            # A concurrent request subscribed this endpoint first; its secret stands
+            return jsonify({"error": "Endpoint already subscribed; send its X-Subscription-Secret"}), 409
+        return jsonify({"subscribed": subscribed, "secret": secret}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ==============================
+# Community reports (see report_ingest.py)
+# ==============================
+
+def client_ip() -> str:
+    # Behind Render's proxy the client is the first X-Forwarded-For hop
+    forwarded = request.headers.get("X-Forwarded-For", "")
+    return forwarded.split(",")[0].strip() or request.remote_addr or ""
+
+
+@app.route("/api/reports", methods=["POST", "OPTIONS"])
+def submit_report():
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        row = report_ingest.validate(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        ip = client_ip()
+        device = report_ingest.fingerprint(
+            request.headers.get("X-Device-Id", ""), ip, request.headers.get("User-Agent", "")
+        )
+        outcome, retry_after = report_ingest.submit(row, ip, device)
+        if outcome == "rate_limited":
+            response = jsonify({"error": "Too many reports; please wait a moment", "status": outcome})
+            response.headers["Retry-After"] = str(int(retry_after) + 1)
+            return response, 429
+        # A repeat from the same device is acknowledged like a new one
+        return jsonify({"status": outcome}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ==============================
+# Community report heatmap (see report_heatmap.py)
+# ==============================
+
+@app.route("/api/reports/heatmap", methods=["GET", "OPTIONS"])
+def get_report_heatmap():
+    """Per-barangay outage report counts over the last 15 and 60 minutes."""
+    if request.method == "OPTIONS":
+        return ("", 204)
+    try:
+        response = jsonify(report_heatmap.heatmap())
+        response.headers["Cache-Control"] = f"public, max-age={int(report_heatmap.CACHE_SECONDS)}"
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -90,10 +394,7 @@ def admin_get_learned_locations():
     if auth_err:
         return auth_err
     try:
-        res = supabase.table("learned_locations") \
-            .select("*") \
-            .order("created_at", desc=True) \
-            .execute()
+        res = run_query(*admin_queries.list_rows("learned_locations"))
         return jsonify(res.data or [])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -108,18 +409,15 @@ def admin_update_learned_location(loc_id):
         return auth_err
     try:
         if request.method == "DELETE":
-            supabase.table("learned_locations").delete().eq("id", loc_id).execute()
+            run_query(*admin_queries.delete_row("learned_locations", loc_id))
+            bump_learned_locations_version()
             return jsonify({"message": "Deleted"})
         # PATCH
-        body = request.get_json(force=True)
-        updates = {}
-        for field in ("verified", "municipality", "barangay", "location_type", "location_name"):
-            if field in body:
-                updates[field] = body[field]
-        if not updates:
-            return jsonify({"error": "No valid fields to update"}), 400
-        res = supabase.table("learned_locations").update(updates).eq("id", loc_id).execute()
-        return jsonify(res.data[0] if res.data else {})
+        res = run_query(*admin_queries.update_learned_location(loc_id, request.get_json(force=True, silent=True)))
+        bump_learned_locations_version()
+        return jsonify(admin_queries.first_row(res))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -136,15 +434,22 @@ def admin_get_reports():
     if auth_err:
         return auth_err
     try:
-        res = supabase.table("community_reports") \
-            .select("*") \
-            .order("created_at", desc=True) \
-            .execute()
+        res = run_query(*admin_queries.list_rows("community_reports"))
         return jsonify(res.data or [])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/admin/reports/ingest-stats", methods=["GET", "OPTIONS"])
+def admin_report_ingest_stats():
+    if request.method == "OPTIONS":
+        return ("", 204)
+    auth_err = require_admin()
+    if auth_err:
+        return auth_err
+    return jsonify(report_ingest.get_stats())
+
+
 @app.route("/api/admin/reports/<int:report_id>", methods=["PATCH", "DELETE", "OPTIONS"])
 def admin_update_report(report_id):
     if request.method == "OPTIONS":
@@ -154,15 +459,13 @@ def admin_update_report(report_id):
         return auth_err
     try:
         if request.method == "DELETE":
-            supabase.table("community_reports").delete().eq("id", report_id).execute()
+            run_query(*admin_queries.delete_row("community_reports", report_id))
             return jsonify({"message": "Deleted"})
         # PATCH — update status
-        body = request.get_json(force=True)
-        status = body.get("status")
-        if status not in ("confirmed", "not_yet_confirmed", "ongoing"):
-            return jsonify({"error": "Invalid status"}), 400
-        res = supabase.table("community_reports").update({"status": status}).eq("id", report_id).execute()
-        return jsonify(res.data[0] if res.data else {})
+        res = run_query(*admin_queries.update_report_status(report_id, request.get_json(force=True, silent=True)))
+        return jsonify(admin_queries.first_row(res))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -180,17 +483,32 @@ def admin_maintenance():
         return auth_err
     try:
         if request.method == "GET":
-            res = supabase.table("app_settings").select("value").eq("key", "maintenance_mode").execute()
-            enabled = res.data[0]["value"] == "true" if res.data else False
-            return jsonify({"enabled": enabled})
+            res = run_query(*admin_queries.get_maintenance())
+            return jsonify({"enabled": admin_queries.maintenance_enabled(res)})
         # PUT
-        body = request.get_json(force=True)
-        enabled = "true" if body.get("enabled") else "false"
-        supabase.table("app_settings").upsert(
-            {"key": "maintenance_mode", "value": enabled},
-            on_conflict="key"
-        ).execute()
-        return jsonify({"enabled": enabled == "true"})
+        query, enabled = admin_queries.set_maintenance(request.get_json(force=True, silent=True))
+        run_query(*query)
+        return jsonify({"enabled": enabled})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ==============================
+# Admin: Overview
+# ==============================
+
+@app.route("/api/admin/overview", methods=["GET", "OPTIONS"])
+def admin_overview():
+    """Learned locations, reports and maintenance mode in one response (concurrent under asgi.py)."""
+    if request.method == "OPTIONS":
+        return ("", 204)
+    auth_err = require_admin()
+    if auth_err:
+        return auth_err
+    try:
+        return jsonify(admin_queries.overview(*(run_query(*q) for q in admin_queries.overview_queries())))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -215,18 +533,37 @@ def admin_trigger_scrape():
             return jsonify({"error": "Invalid environment"}), 400
         ref = "main" if target_env == "prod" else "dev"
 
-        resp = http_requests.post(
-            f"https://api.github.com/repos/{GITHUB_REPO}/actions/workflows/{GITHUB_WORKFLOW}/dispatches",
-            headers={
-                "Authorization": f"Bearer {GITHUB_TOKEN}",
-                "Accept": "application/vnd.github.v3+json",
-            },
-            json={"ref": ref, "inputs": {"target_environment": target_env}},
-            timeout=15,
-        )
+        # Single-flight per environment: refuse duplicate dispatches while one is
+        # in flight or within the cooldown after the last one.
+        lease_name = f"trigger-scrape:{target_env}"
+        acquired, outcome, last = acquire_trigger(lease_name, SCRAPE_TRIGGER_COOLDOWN_SECONDS)
+        if not acquired:
+            message = (
+                "A dispatch is already in progress"
+                if outcome == "in_progress"
+                else f"Workflow was dispatched recently for {target_env}; try again later"
+            )
+            return jsonify({"message": message, "skipped": outcome, "last_run": last})
+
+        try:
+            resp = http_requests.post(
+                f"https://api.github.com/repos/{GITHUB_REPO}/actions/workflows/{GITHUB_WORKFLOW}/dispatches",
+                headers={
+                    "Authorization": f"Bearer {GITHUB_TOKEN}",
+                    "Accept": "application/vnd.github.v3+json",
+                },
+                json={"ref": ref, "inputs": {"target_environment": target_env}},
+                timeout=15,
+            )
+        except Exception:
+            release_trigger(lease_name)
+            raise
         if resp.status_code == 204:
-            return jsonify({"message": f"Workflow dispatched for {target_env} on {ref}"})
+            message = f"Workflow dispatched for {target_env} on {ref}"
+            release_trigger(lease_name, {"message": message, "dispatched_at": datetime.utcnow().isoformat()})
+            return jsonify({"message": message})
         else:
+            release_trigger(lease_name)
             return jsonify({"error": f"GitHub API returned {resp.status_code}: {resp.text}"}), resp.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,183 @@
+"""
+Async serving mode for the API.
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+Under `gunicorn app:app`, each Flask view holds a worker for its whole
+Supabase round trip. The free-tier hosts run only one or two workers, so
+a few slow admin queries queue every request behind them.
+
+This module is a plain ASGI app. The admin endpoints that are mostly
+Supabase calls are served here with run_query_async(): while a query is
+in flight the event loop serves other requests, so one process keeps
+many slow requests going, and an endpoint's independent queries run
+concurrently (asyncio.gather). Every other path goes to the Flask app in
+app.py on a small thread pool (a2wsgi). Both modes serve the same API;
+`gunicorn app:app` stays the sync path.
+"""
+import asyncio
+import json
+import os
+import re
+
+from a2wsgi import WSGIMiddleware
+
+import admin_queries
+from app import ADMIN_KEY, ALLOWED_ORIGINS
+from app import app as flask_app
+from db import bump_learned_locations_version_async
+from supabase_client import run_query_async
+
+# Threads for the Flask endpoints that are not served natively here
+WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "10"))
+
+CORS_HEADERS = [
+    (b"vary", b"Origin"),
+    (b"access-control-allow-methods", b"GET,POST,PUT,PATCH,DELETE,OPTIONS"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization,X-Admin-Key,X-Device-Id,X-Subscription-Secret"),
+]
+
+_flask = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+
+class Request:
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope["method"]
+        self.headers = {k.decode("latin1").lower(): v.decode("latin1") for k, v in scope.get("headers", [])}
+        self.body = body
+
+    def json(self):
+        """The JSON body, or None when it isn't JSON (like Flask's get_json(silent=True))."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+def _unauthorized(request: Request):
+    """require_admin() in app.py: X-Admin-Key must match ADMIN_KEY."""
+    if not ADMIN_KEY or request.headers.get("x-admin-key", "") != ADMIN_KEY:
+        return 401, {"error": "Unauthorized"}
+    return None
+
+
+# ==============================
+# Admin endpoints (queries and validation in admin_queries.py, as in app.py)
+# ==============================
+
+async def learned_locations(request: Request):
+    res = await run_query_async(*admin_queries.list_rows("learned_locations"))
+    return 200, res.data or []
+
+
+async def learned_location(request: Request, loc_id: int):
+    if request.method == "DELETE":
+        await run_query_async(*admin_queries.delete_row("learned_locations", loc_id))
+        await bump_learned_locations_version_async()
+        return 200, {"message": "Deleted"}
+    res = await run_query_async(*admin_queries.update_learned_location(loc_id, request.json()))
+    await bump_learned_locations_version_async()
+    return 200, admin_queries.first_row(res)
+
+
+async def reports(request: Request):
+    res = await run_query_async(*admin_queries.list_rows("community_reports"))
+    return 200, res.data or []
+
+
+async def report(request: Request, report_id: int):
+    if request.method == "DELETE":
+        await run_query_async(*admin_queries.delete_row("community_reports", report_id))
+        return 200, {"message": "Deleted"}
+    res = await run_query_async(*admin_queries.update_report_status(report_id, request.json()))
+    return 200, admin_queries.first_row(res)
+
+
+async def maintenance(request: Request):
+    if request.method == "GET":
+        res = await run_query_async(*admin_queries.get_maintenance())
+        return 200, {"enabled": admin_queries.maintenance_enabled(res)}
+    query, enabled = admin_queries.set_maintenance(request.json())
+    await run_query_async(*query)
+    return 200, {"enabled": enabled}
+
+
+async def overview(request: Request):
+    # Independent reads: one round trip of wall time instead of three
+    results = await asyncio.gather(*(run_query_async(*q) for q in admin_queries.overview_queries()))
+    return 200, admin_queries.overview(*results)
+
+
+# (path pattern, methods, handler); integer groups are passed as ints
+ROUTES = [
+    (re.compile(r"/api/admin/learned-locations"), {"GET"}, learned_locations),
+    (re.compile(r"/api/admin/learned-locations/(?P<loc_id>\d+)"), {"PATCH", "DELETE"}, learned_location),
+    (re.compile(r"/api/admin/reports"), {"GET"}, reports),
+    (re.compile(r"/api/admin/reports/(?P<report_id>\d+)"), {"PATCH", "DELETE"}, report),
+    (re.compile(r"/api/admin/maintenance"), {"GET", "PUT"}, maintenance),
+    (re.compile(r"/api/admin/overview"), {"GET"}, overview),
+]
+
+
+def _route(method: str, path: str):
+    for pattern, methods, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match and (method in methods or method == "OPTIONS"):
+            return handler, {k: int(v) for k, v in match.groupdict().items()}
+    return None, None
+
+
+# ==============================
+# ASGI plumbing
+# ==============================
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond(send, request: Request, status: int, payload):
+    body = b"" if payload is None else json.dumps(payload).encode()
+    headers = [(b"content-length", str(len(body)).encode())]
+    if payload is not None:
+        headers.append((b"content-type", b"application/json"))
+    origin = request.headers.get("origin")
+    if origin in ALLOWED_ORIGINS:
+        headers += [(b"access-control-allow-origin", origin.encode("latin1"))] + CORS_HEADERS
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    handler, params = _route(scope["method"], scope["path"]) if scope["type"] == "http" else (None, None)
+    if handler is None:
+        return await _flask(scope, receive, send)
+
+    request = Request(scope, await _read_body(receive))
+    if request.method == "OPTIONS":
+        return await _respond(send, request, 204, None)
+    status, payload = _unauthorized(request) or (None, None)
+    if status is None:
+        try:
+            status, payload = await handler(request, **params)
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+    await _respond(send, request, status, payload)
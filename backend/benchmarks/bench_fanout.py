@@ -0,0 +1,137 @@
+"""
+Subscriber fan-out benchmark against a local webhook sink.
+
+Seeds the in-memory PostgREST stand-in with subscriptions spread over
+the real barangay codes, then runs notify.fan_out() for a batch of
+synthetic notices and reports the time spent loading the inverted index,
+planning and delivering, plus what the sink received. Nothing touches
+the network.
+
+    python benchmarks/bench_fanout.py --subscribers 20000 --notices 10
+    python benchmarks/bench_fanout.py --fail-rate 0.05 --gone 0.01 --sink-latency 0.02
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import FakePostgrest, FakeWebhookSink  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--max-barangays", type=int, default=3, help="barangays per subscriber (1..N)")
+    parser.add_argument("--notices", type=int, default=10)
+    parser.add_argument("--barangays-per-notice", type=int, default=40)
+    parser.add_argument("--sink-latency", type=float, default=0.005, help="seconds per webhook")
+    parser.add_argument("--fail-rate", type=float, default=0.02, help="fraction of webhooks answered 503")
+    parser.add_argument("--gone", type=float, default=0.005, help="fraction of subscribers answering 410")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--endpoint-concurrency", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, str(BACKEND_DIR))
+    reference = json.loads(Path("zamboanga_del_norte_locations.json").read_text(encoding="utf-8"))
+    barangays = [(m, b) for m in reference for b in m["barangays"]]
+
+    gone = {i for i in range(args.subscribers) if random.random() < args.gone}
+    sink = FakeWebhookSink(latency=args.sink_latency, fail_rate=args.fail_rate, gone=gone).start()
+    subscriptions = [
+        {"barangay_code": b["code"], "kind": "webhook", "endpoint": sink.url(i), "secret": f"s{i}", "active": True}
+        for i in range(args.subscribers)
+        for _, b in random.sample(barangays, random.randint(1, args.max_barangays))
+    ]
+    store = FakePostgrest(seed={"subscriptions": subscriptions}).start()
+
+    # Must be set before the backend modules are imported
+    os.environ.update({
+        "SUPABASE_URL": store.base_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench",
+        "NOTIFY_WORKERS": str(args.workers),
+        "NOTIFY_ENDPOINT_CONCURRENCY": str(args.endpoint_concurrency),
+        "NOTIFY_RETRY_BACKOFF_SECONDS": "0.05",
+    })
+    import notify
+
+    notices = []
+    for n in range(args.notices):
+        picked = random.sample(barangays, args.barangays_per_notice)
+        by_muni = {}
+        for m, b in picked:
+            by_muni.setdefault((m["code"], m["name"]), []).append({"code": b["code"], "name": b["name"], "affected_area": None})
+        notices.append({
+            "title": f"Power interruption {n}",
+            "url": f"https://zaneco.ph/bench-{n}/",
+            "processed_images": [{"structured": [{
+                "dates": ["April 20, 2026"],
+                "times": ["8:00AM - 5:00PM"],
+                "intervals": [{"start": "2026-04-20T08:00:00", "end": "2026-04-20T17:00:00", "all_day": False}],
+                "reason": "Line maintenance",
+                "locations": [
+                    {"municipality": {"code": code, "name": name}, "barangays": bgys}
+                    for (code, name), bgys in by_muni.items()
+                ],
+            }]}],
+        })
+
+    try:
+        start = time.perf_counter()
+        index = notify.load_subscriber_index()
+        loaded = time.perf_counter()
+        deliveries = notify.plan_deliveries(notices, index)
+        planned = time.perf_counter()
+        result = notify.deliver(deliveries)
+        delivered = time.perf_counter()
+        if result["gone_subscription_ids"]:
+            notify._deactivate(result["gone_subscription_ids"])
+    finally:
+        sink.stop()
+        store.stop()
+
+    deliver_s = delivered - planned
+    report = {
+        "config": vars(args),
+        "subscription_rows": len(subscriptions),
+        "indexed_barangays": len(index),
+        "deliveries": len(deliveries),
+        "events": sum(len(d["events"]) for d in deliveries),
+        "timings_s": {
+            "load_index": round(loaded - start, 3),
+            "plan": round(planned - loaded, 3),
+            "deliver": round(deliver_s, 3),
+        },
+        "deliveries_per_s": round(len(deliveries) / deliver_s, 1) if deliver_s else 0,
+        "result": {k: v for k, v in result.items() if k != "gone_subscription_ids"},
+        "deactivated_rows": sum(1 for r in store.tables["subscriptions"] if r.get("active") is False),
+        "sink": dict(sink.stats),
+        "sink_events": sum(sink.events.values()),
+        "peak_in_flight_per_endpoint": max(sink.peak_in_flight.values(), default=0),
+    }
+
+    t = report["timings_s"]
+    print(f"Fan-out: {args.subscribers} subscribers ({len(subscriptions)} rows), {args.notices} notices")
+    print(f"  index {t['load_index']}s ({len(index)} barangays), plan {t['plan']}s, deliver {t['deliver']}s")
+    print(f"  {len(deliveries)} deliveries, {report['events']} events, {report['deliveries_per_s']} deliveries/s")
+    print(f"  Result: {report['result']}")
+    print(f"  Sink: {report['sink']}, {report['sink_events']} events received, "
+          f"peak {report['peak_in_flight_per_endpoint']} in flight per endpoint")
+    print(f"  Subscription rows deactivated (410): {report['deactivated_rows']}")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Offline micro-benchmarks for the normalization and parsing hot paths.
+
+Everything runs against checked-in fixtures (recorded Gemini responses,
+ZANECO category/post HTML) and the real reference JSON files; nothing
+touches the network. Each case reports ops/sec and peak memory allocated
+per call (tracemalloc), and is compared against benchmarks/baseline.json.
+
+    python benchmarks/bench_hotpaths.py                  # run + compare
+    python benchmarks/bench_hotpaths.py --save-baseline  # record a new baseline
+    python benchmarks/bench_hotpaths.py -k snap          # only matching cases
+
+Exits with status 1 when a case is slower than the baseline by more than
+--tolerance (default 25%), so it can gate a deploy. Baselines are only
+comparable on the same machine, so record them where the check runs.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+
+# logic.py resolves its reference files relative to the working directory
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, str(BACKEND_DIR))
+# Offline: placeholders so a local .env can't point any case at the real database
+os.environ["SUPABASE_URL"] = "http://127.0.0.1:54321"
+os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "benchmark"
+
+import location_search  # noqa: E402
+import logic  # noqa: E402
+import notice_schema  # noqa: E402
+import outage_index  # noqa: E402
+import reference_data  # noqa: E402
+import text_extract  # noqa: E402
+from db import _parse_latest_date_from_title_or_url  # noqa: E402
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES_DIR / name).read_text(encoding="utf-8")
+
+
+def fixture_json(text: str):
+    """The JSON object in a recorded response that may be fenced or wrapped in prose."""
+    match = re.search(r"```json(.*?)```", text, re.DOTALL) or re.search(r"({.*})", text, re.DOTALL)
+    return json.loads(match.group(1).strip() if match else text)
+
+
+def _time_round(fn, min_time: float, max_iters: int) -> tuple:
+    iters = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    batch = 1
+    while elapsed < min_time and iters < max_iters:
+        for _ in range(batch):
+            fn()
+        iters += batch
+        batch = min(batch * 2, 1000)
+        elapsed = time.perf_counter() - start
+    return iters, elapsed
+
+
+def bench(fn, min_time: float = 0.5, rounds: int = 5, max_iters: int = 1_000_000) -> dict:
+    """
+    Time fn over `rounds` rounds totalling about min_time seconds and keep
+    the fastest round (least disturbed by other processes); return ops/sec
+    and peak KB allocated per call.
+    """
+    fn()  # warm up (lazy loads, regex caches)
+
+    iters, elapsed = max(
+        (_time_round(fn, min_time / rounds, max_iters) for _ in range(rounds)),
+        key=lambda r: r[0] / r[1],
+    )
+
+    # Allocation profile on a separate, short run so tracing doesn't skew timing
+    samples = 5
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - base
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(iters / elapsed, 1),
+        "us_per_op": round(elapsed / iters * 1e6, 2),
+        "peak_kb_per_op": round(peak_total / samples / 1024, 2),
+    }
+
+
+# ==============================
+# Cases
+# ==============================
+
+def build_cases() -> dict:
+    from bs4 import BeautifulSoup
+
+    reference = logic.get_reference_json()
+    details = logic.get_barangay_details()
+    dipolog = next(m for m in reference if m["name"] == "CITY OF DIPOLOG")
+    muni_names = [m["name"] for m in reference]
+    dipolog_bgy_names = [b["name"] for b in dipolog["barangays"]]
+
+    # Recorded responses → the barangay lists the normalizer feeds downstream
+    route_json = fixture_json(load_fixture("gemini_route_response.txt"))
+    route_bgys = []
+    for entry in route_json["notices"][0]["locations"][0]["barangays"]:
+        name = logic.snap_to_reference(entry["name"], dipolog_bgy_names)
+        ref = next((b for b in dipolog["barangays"] if b["name"] == name), None)
+        route_bgys.append({"code": ref["code"] if ref else None, "name": name, "affected_area": entry["affected_area"]})
+
+    # Verified learned locations shaped like the Supabase rows
+    verified = [
+        {"municipality": muni, "barangay": bgy, "location_type": "purok", "location_name": loc}
+        for muni, bgys in details.items() if muni != "_README"
+        for bgy, d in bgys.items()
+        for loc in d.get("puroks", [])[:2]
+    ]
+
+    category_soup = BeautifulSoup(load_fixture("zaneco_category.html"), "html.parser")
+    category_items = [(a.get_text(strip=True), a.get("href")) for a in category_soup.select("article h2 a")]
+    post_soup = BeautifulSoup(load_fixture("zaneco_post.html"), "html.parser")
+    post_imgs = post_soup.select("div.entry-content img")
+    image_urls = [u for u in (logic.pick_real_image_url(i) for i in post_imgs) if u]
+    image_urls += [
+        "https://zaneco.ph/wp-content/uploads/2026/02/4-1024x724.jpg",
+        "https://zaneco.ph/wp-content/uploads/2026/04/notice-apr-20-2026.png",
+    ]
+
+    text_index = logic.get_reference_index()
+    text_post = BeautifulSoup(load_fixture("zaneco_text_post.html"), "html.parser")
+    post_text = text_post.select_one("div.entry-content").get_text("\n", strip=True)
+
+    responses = [
+        load_fixture("gemini_route_response.txt"),
+        load_fixture("gemini_multi_response.json"),
+        load_fixture("gemini_prose_response.txt"),
+    ]
+
+    # Same responses as the API returns them in JSON mode (bare, compact)
+    json_mode_responses = [json.dumps(fixture_json(r), separators=(",", ":")) for r in responses]
+
+    # A season of notices: two schedules a day over 90 days, each for a handful of Dipolog barangays
+    dipolog_codes = [b["code"] for b in dipolog["barangays"]]
+    interval_rows = [
+        {"id": n, "title": f"notice {n}", "url": f"https://zaneco.ph/notice-{n}/", "data": {"processed_images": [{
+            "structured": [{
+                "dates": [(date(2026, 1, 1) + timedelta(days=n // 2)).strftime("%B %d, %Y")],
+                "times": ["8:00AM - 5:00PM" if n % 2 else "10:00PM - 2:00AM"],
+                "locations": [{
+                    "municipality": {"code": dipolog["code"], "name": dipolog["name"]},
+                    "barangays": [{"code": c, "name": c, "affected_area": None} for c in dipolog_codes[n % 7::7]],
+                }],
+            }],
+        }]}}
+        for n in range(180)
+    ]
+    interval_index = outage_index.build_index(interval_rows)
+    query_times = [datetime(2026, 1, 1) + timedelta(hours=7 * i) for i in range(300)]
+
+    # What a resident types, keystroke by keystroke, into the purok/landmark search
+    # search() refreshes from reference_data on every call; serve it the seeded rows, not Supabase's
+    seeded = [dict(r, id=i) for i, r in enumerate(verified)]
+    reference_data.get_verified_locations = lambda force=False: seeded
+    location_search.refresh(reference_data.get_index(), seeded)
+    typed = [q[:n] for q in ("Gaisano", "Prk. Greenleaves", "Aliguay Island", "Rizal St") for n in range(2, len(q) + 1)]
+
+    return {
+        "snap_to_reference.municipality": lambda: logic.snap_to_reference("DIPOLOG CITY", muni_names),
+        "snap_to_reference.barangay": lambda: logic.snap_to_reference("STA. ISABEL", dipolog_bgy_names),
+        "expand_route_barangays": lambda: logic.expand_route_barangays("CITY OF DIPOLOG", route_bgys, dipolog),
+        "filter_affected_area_by_barangay": lambda: logic.filter_affected_area_by_barangay(
+            "CITY OF DIPOLOG", route_bgys, dipolog, verified
+        ),
+        "extract_notice_date_from_text": lambda: [
+            logic.extract_notice_date_from_text(f"{t} {u}") for t, u in category_items
+        ],
+        "is_filename_date_past": lambda: [logic.is_filename_date_past(u) for u in image_urls],
+        "parse_latest_date_from_title_or_url": lambda: [
+            _parse_latest_date_from_title_or_url(t, u) for t, u in category_items
+        ],
+        "parse_notices": lambda: [notice_schema.parse_notices(r) for r in json_mode_responses],
+        "pick_real_image_url": lambda: [logic.pick_real_image_url(i) for i in post_imgs],
+        "parse_notice_text": lambda: text_extract.parse_notice_text(post_text, text_index),
+        "outage_index.affected_in_municipality": lambda: [
+            outage_index.affected_in_municipality(interval_index, dipolog["code"], t) for t in query_times
+        ],
+        "location_search.search": lambda: [location_search.search(q, 5) for q in typed],
+    }
+
+
+# ==============================
+# Baseline comparison
+# ==============================
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return names of cases whose ops/sec dropped more than `tolerance`."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = r["ops_per_sec"] / base["ops_per_sec"]
+        r["vs_baseline"] = round(ratio, 2)
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="filter", default="", help="only run cases containing this text")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per case (default 0.5)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed ops/sec drop vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="write results to baseline.json")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    cases = {k: v for k, v in build_cases().items() if args.filter in k}
+    results = {name: bench(fn, args.min_time) for name, fn in cases.items()}
+
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    regressions = [] if args.save_baseline else compare(results, baseline, args.tolerance)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':<38} {'ops/sec':>12} {'us/op':>10} {'peak KB':>9} {'vs base':>8}")
+        for name, r in results.items():
+            vs = f"{r['vs_baseline']:.2f}x" if "vs_baseline" in r else "-"
+            print(f"{name:<38} {r['ops_per_sec']:>12.1f} {r['us_per_op']:>10.2f} {r['peak_kb_per_op']:>9.2f} {vs:>8}")
+
+    if args.save_baseline:
+        baseline.update({k: {"ops_per_sec": v["ops_per_sec"], "peak_kb_per_op": v["peak_kb_per_op"]} for k, v in results.items()})
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {BASELINE_FILE.relative_to(BACKEND_DIR)}")
+    elif regressions:
+        print(f"\nRegressions (> {args.tolerance:.0%} slower than baseline): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
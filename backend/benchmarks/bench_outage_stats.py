@@ -0,0 +1,209 @@
+"""
+Outage statistics benchmark on a synthetic multi-year archive.
+
+Generates notices spread over --years of schedules across the real
+barangay codes, archives them month by month into a temporary
+notice_archive directory, then times:
+
+- the naive way: walking the nested notices.data JSON in Python,
+- loading the archive into the NumPy frame (outage_stats.make_chunk),
+- outage_stats.compute() for the whole range and for one municipality,
+- an incremental refresh that only reads one newly archived month.
+
+It checks that both ways agree on the totals and per-barangay hours.
+Nothing touches the network.
+
+    python benchmarks/bench_outage_stats.py --years 5 --notices-per-month 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def synthetic_notices(barangays: list, years: int, per_month: int, first: date) -> list:
+    times = ["8:00AM - 5:00PM", "6:00AM - 12:00NN", "1:00PM - 4:30PM", "10:00PM - 2:00AM", None]
+    notices = []
+    for m in range(years * 12):
+        month = date(first.year + (first.month - 1 + m) // 12, (first.month - 1 + m) % 12 + 1, 1)
+        for n in range(per_month):
+            day = month + timedelta(days=random.randrange(28))
+            picked = random.sample(barangays, random.randint(3, 40))
+            by_muni = {}
+            for muni, bgy in picked:
+                by_muni.setdefault((muni["code"], muni["name"]), []).append(
+                    {"code": bgy["code"], "name": bgy["name"], "affected_area": None}
+                )
+            t = random.choice(times)
+            dates = [day.strftime("%B %d, %Y")]
+            if random.random() < 0.3:
+                dates = [f"{day.strftime('%B %d')} & {(day + timedelta(days=1)).day}, {day.year}"] if day.day < 28 else dates
+            notices.append({
+                "id": len(notices) + 1,
+                "title": f"Power interruption {month:%Y-%m} #{n}",
+                "url": f"https://zaneco.ph/bench-{month:%Y%m}-{n}/",
+                "created_at": f"{day.isoformat()}T00:00:00+00:00",
+                "data": {"processed_images": [{"structured": [{
+                    "dates": dates,
+                    "times": [t] if t else [],
+                    "reason": "Line maintenance",
+                    "locations": [
+                        {"municipality": {"code": code, "name": name}, "barangays": bgys}
+                        for (code, name), bgys in by_muni.items()
+                    ],
+                }]}]},
+            })
+    return notices
+
+
+def naive_stats(notices: list, schedule_intervals) -> dict:
+    """Per-barangay hours and counts by walking the nested JSON, the way it would be done without a frame."""
+    hours, counts, weekday = {}, {}, [0] * 7
+    seen = set()
+    for notice in notices:
+        for processed in notice["data"]["processed_images"]:
+            for sched in processed["structured"]:
+                intervals = schedule_intervals(sched)
+                for loc in sched["locations"]:
+                    for bgy in loc["barangays"]:
+                        for iv in intervals:
+                            key = (notice["url"], bgy["code"], iv["start"], iv["end"])
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            start, end = datetime.fromisoformat(iv["start"]), datetime.fromisoformat(iv["end"])
+                            hours[bgy["code"]] = hours.get(bgy["code"], 0) + (end - start).total_seconds() / 3600
+                            counts[bgy["code"]] = counts.get(bgy["code"], 0) + 1
+                            weekday[start.weekday()] += 1
+    top = sorted(hours, key=lambda c: (-hours[c], -counts[c]))[:10]
+    return {"outages": sum(counts.values()), "hours": sum(hours.values()), "top": top, "hours_by_code": hours,
+            "weekday": weekday}
+
+
+def timed(fn, repeat: int = 1):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--notices-per-month", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N for compute()")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, str(BACKEND_DIR))
+    archive_dir = tempfile.mkdtemp(prefix="notice_archive_")
+    # Must be set before the backend modules are imported
+    os.environ.update({"NOTICE_ARCHIVE_DIR": archive_dir, "NOTICE_ARCHIVE_BUCKET": ""})
+    import notice_archive
+    import outage_stats
+    from outage_index import schedule_intervals
+
+    reference = json.loads(Path("zamboanga_del_norte_locations.json").read_text(encoding="utf-8"))
+    barangays = [(m, b) for m in reference for b in m["barangays"]]
+    notices = synthetic_notices(barangays, args.years, args.notices_per_month, date(2021, 1, 1))
+    last_month = notices[-1]["created_at"][:7]
+    history = [n for n in notices if n["created_at"][:7] != last_month]
+    newest = [n for n in notices if n["created_at"][:7] == last_month]
+
+    _, archive_s = timed(lambda: notice_archive.archive_notices(history))
+    naive, naive_s = timed(lambda: naive_stats(history, schedule_intervals))
+
+    labels = outage_stats.new_labels()
+    keys = set()
+    columns = list(outage_stats.LOAD_COLUMNS)
+
+    def load():
+        return [
+            outage_stats.make_chunk(notice_archive.read_part(m, n, columns), labels, skip_keys=keys, keys=keys)
+            for m, n in notice_archive.list_parts()
+        ]
+
+    chunks, load_s = timed(load)
+    loaded_parts = set(notice_archive.list_parts())
+    frame = outage_stats.combine(chunks, labels)
+    stats, compute_s = timed(lambda: outage_stats.compute(frame), args.repeat)
+    muni_code = reference[0]["code"]
+    _, muni_s = timed(lambda: outage_stats.compute(frame, municipality_code=muni_code), args.repeat)
+    _, year_s = timed(lambda: outage_stats.compute(frame, "2022-01", "2022-12"), args.repeat)
+
+    # Next scrape archives one more month: only that part is read
+    notice_archive.archive_notices(newest)
+
+    def incremental():
+        new = [p for p in notice_archive.list_parts() if p not in loaded_parts]
+        chunks.extend(
+            outage_stats.make_chunk(notice_archive.read_part(m, n, columns), labels, skip_keys=keys, keys=keys)
+            for m, n in new
+        )
+        return outage_stats.combine(chunks, labels), len(new)
+
+    (frame2, new_parts), incremental_s = timed(incremental)
+
+    by_code = {b["code"]: b["hours"] for b in outage_stats.compute(frame, top=10 ** 6)["barangays"]}
+    mismatched = [c for c, h in naive["hours_by_code"].items() if abs(by_code.get(c, 0) - h) > 0.05]
+    agree = (
+        stats["totals"]["outages"] == naive["outages"]
+        and abs(stats["totals"]["hours"] - naive["hours"]) < 0.5
+        and [d["outages"] for d in stats["by_weekday"]] == naive["weekday"]
+        and not mismatched
+    )
+
+    report = {
+        "config": vars(args),
+        "notices": len(history),
+        "rows": int(frame["start"].size),
+        "rows_after_increment": int(frame2["start"].size),
+        "archive_parts": len(loaded_parts),
+        "archive_bytes": sum(f.stat().st_size for f in Path(archive_dir).rglob("*") if f.is_file()),
+        "timings_s": {
+            "archive_write": round(archive_s, 3),
+            "naive_json_walk": round(naive_s, 3),
+            "load_frame": round(load_s, 3),
+            "compute_all": round(compute_s, 4),
+            "compute_municipality": round(muni_s, 4),
+            "compute_one_year": round(year_s, 4),
+            "incremental_refresh": round(incremental_s, 3),
+        },
+        "speedup_compute_vs_naive": round(naive_s / compute_s, 1) if compute_s else None,
+        "new_parts_read": new_parts,
+        "results_agree": agree,
+    }
+
+    t = report["timings_s"]
+    print(f"Outage stats: {args.years} years, {len(history)} notices, {report['rows']} schedule rows, "
+          f"{report['archive_parts']} archive parts ({report['archive_bytes'] / 1e6:.1f} MB)")
+    print(f"  naive JSON walk    {t['naive_json_walk']}s")
+    print(f"  load frame         {t['load_frame']}s (once; afterwards incremental)")
+    print(f"  compute all        {t['compute_all']}s   ({report['speedup_compute_vs_naive']}x vs naive)")
+    print(f"  compute 1 muni     {t['compute_municipality']}s")
+    print(f"  compute 1 year     {t['compute_one_year']}s")
+    print(f"  incremental        {t['incremental_refresh']}s ({new_parts} new part(s), {report['rows_after_increment']} rows)")
+    print(f"  results agree with naive: {agree}")
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.json_out}")
+    if not agree:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
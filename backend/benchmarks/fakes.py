@@ -0,0 +1,454 @@
+"""
+Local stand-ins for the services the backend talks to, for the replay
+harness and load tests. Each runs an in-process ThreadingHTTPServer on an
+ephemeral port:
+
+- FakeZanecoSite: WordPress-like category pages, posts and notice images
+- FakeGemini: generateContent stub returning recorded responses, with
+  configurable latency and 429 rate
+- FakePostgrest: in-memory PostgREST-compatible store (the subset of
+  filters/upsert/order that supabase-py sends for this backend)
+- FakeWebhookSink: receives subscriber webhooks, with configurable
+  latency, 5xx rate and unsubscribed (410) endpoints
+
+    site = FakeZanecoSite(posts=200, images_per_post=5).start()
+    print(site.base_url)
+    site.stop()
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit, unquote
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+MONTH_DATE_RE = re.compile(
+    r"(January|February|March|April|May|June|July|August|September|October|November|December)"
+    r"\s+\d{1,2}(?:\s*&\s*\d{1,2})?,\s*\d{4}"
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set per server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.service.handle(self.command, self.path, self.headers, body)
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode()
+            headers = {"Content-Type": "application/json", **headers}
+        elif isinstance(payload, str):
+            payload = payload.encode()
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_PUT = _dispatch
+
+
+class _FakeService:
+    """Base class: starts/stops a threaded HTTP server bound to 127.0.0.1."""
+
+    latency = 0.0
+
+    def __init__(self):
+        self.stats = Counter()
+        self._server = None
+        self.base_url = None
+
+    def start(self):
+        handler = type(f"{type(self).__name__}Handler", (_Handler,), {"service": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+
+    def handle(self, method, path, headers, body):
+        raise NotImplementedError
+
+
+# ==============================
+# ZANECO WordPress site
+# ==============================
+
+class FakeZanecoSite(_FakeService):
+    def __init__(self, posts: int = 100, images_per_post: int = 4, per_page: int = 20,
+                 latency: float = 0.0, schedule_date: date = None, text_posts: float = 0.0):
+        super().__init__()
+        self.posts = posts
+        self.images_per_post = images_per_post
+        # Fraction of posts that also spell the schedule out as text
+        self.text_posts = text_posts
+        # Post edits for revalidation runs: {post index: {"title_suffix": str, "extra_images": int}}
+        self.edits = {}
+        self.per_page = per_page
+        self.latency = latency
+        # Future-dated so the scraper treats every post as current
+        self.schedule_date = schedule_date or (date.today() + timedelta(days=7))
+        self._png = self._make_png()
+
+    @staticmethod
+    def _make_png() -> bytes:
+        from PIL import Image
+
+        buf = BytesIO()
+        Image.new("RGB", (800, 566), "white").save(buf, format="PNG")
+        return buf.getvalue()
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.posts // self.per_page))
+
+    def _post_path(self, i: int) -> str:
+        d = self.schedule_date
+        return f"/{d.year}/{d.month:02d}/{d.day:02d}/power-interruption-update-{i}/"
+
+    def _title(self, i: int) -> str:
+        d = self.schedule_date
+        suffix = self.edits.get(i, {}).get("title_suffix", "")
+        return f"POWER INTERRUPTION UPDATE #{i} – {d.strftime('%B')} {d.day}, {d.year}{suffix}"
+
+    def _category_page(self, page: int) -> str:
+        start = (page - 1) * self.per_page
+        items = []
+        for i in range(start, min(start + self.per_page, self.posts)):
+            items.append(
+                f'<article class="post"><h2 class="entry-title">'
+                f'<a href="{self.base_url}{self._post_path(i)}">{self._title(i)}</a></h2></article>'
+            )
+        nav = ""
+        if page < self.pages:
+            nav = f'<a class="next page-numbers" href="{self.base_url}/category/power-interruption-update/page/{page + 1}/">Next</a>'
+        return f"<html><body><main>{''.join(items)}{nav}</main></body></html>"
+
+    def _post_page(self, i: int) -> str:
+        d = self.schedule_date
+        imgs = []
+        for j in range(self.images_per_post + self.edits.get(i, {}).get("extra_images", 0)):
+            src = f"/wp-content/uploads/{d.year}/{d.month:02d}/notice-{i}-{j}.png"
+            # Mix of lazy-load markup styles seen on the real site
+            if j % 2:
+                imgs.append(f'<p><img src="data:image/gif;base64,R0lGOD" data-lazy-src="{self.base_url}{src}"></p>')
+            else:
+                imgs.append(f'<p><img src="{src}"></p>')
+        text = ""
+        if int((i + 1) * self.text_posts) > int(i * self.text_posts):
+            text = (
+                f'<p><strong>Date:</strong> {d.strftime("%B")} {d.day}, {d.year}<br>'
+                f'<strong>Time:</strong> 8:00 AM – 5:00 PM</p>'
+                f'<p>DIPOLOG CITY: Galas, Prk. Malayan, Sta. Isabel<br>POLANCO – All barangays</p>'
+                f'<p><strong>Reason:</strong> Line maintenance</p>'
+            )
+        return (
+            f'<html><body><article><h1 class="entry-title">{self._title(i)}</h1>'
+            f'<time class="entry-date" datetime="{d.isoformat()}T08:00:00+08:00"></time>'
+            f'<div class="entry-content">{text}{"".join(imgs)}</div></article></body></html>'
+        )
+
+    def handle(self, method, path, headers, body):
+        self._sleep()
+        path = urlsplit(path).path
+        if path.startswith("/wp-content/uploads/"):
+            self.stats["image"] += 1
+            return 200, {"Content-Type": "image/png"}, self._png
+        m = re.match(r"^/category/power-interruption-update/(?:page/(\d+)/)?$", path)
+        if m:
+            page = int(m.group(1) or 1)
+            self.stats["category"] += 1
+            if page > self.pages:
+                return 404, {}, "Not found"
+            return 200, {"Content-Type": "text/html; charset=UTF-8"}, self._category_page(page)
+        m = re.match(r"^/\d{4}/\d{2}/\d{2}/power-interruption-update-(\d+)/$", path)
+        if m and int(m.group(1)) < self.posts:
+            self.stats["post"] += 1
+            html = self._post_page(int(m.group(1)))
+            etag = '"%s"' % hashlib.sha1(html.encode()).hexdigest()[:16]
+            if headers.get("If-None-Match") == etag:
+                self.stats["post_304"] += 1
+                return 304, {"ETag": etag}, b""
+            return 200, {"Content-Type": "text/html; charset=UTF-8", "ETag": etag}, html
+        return 404, {}, "Not found"
+
+
+# ==============================
+# Gemini generateContent stub
+# ==============================
+
+def _recorded_json(text: str) -> dict:
+    """The JSON object inside a recorded (free-form) model response."""
+    m = re.search(r"```json(.*?)```", text, re.DOTALL) or re.search(r"({.*})", text, re.DOTALL)
+    return json.loads(m.group(1).strip() if m else text)
+
+
+def load_recorded_responses(schedule_date: date = None) -> list:
+    """Recorded model outputs from fixtures, re-dated to `schedule_date`."""
+    schedule_date = schedule_date or (date.today() + timedelta(days=7))
+    replacement = f"{schedule_date.strftime('%B')} {schedule_date.day}, {schedule_date.year}"
+    responses = []
+    for name in ("gemini_route_response.txt", "gemini_multi_response.json", "gemini_prose_response.txt"):
+        text = (FIXTURES_DIR / name).read_text(encoding="utf-8")
+        responses.append(MONTH_DATE_RE.sub(replacement, text))
+    return responses
+
+
+class FakeGemini(_FakeService):
+    def __init__(self, responses: list = None, latency: float = 0.05, rate_429: float = 0.0,
+                 retry_after: int = 0, malformed: float = 0.0):
+        super().__init__()
+        self.responses = responses or load_recorded_responses()
+        self.latency = latency
+        self.rate_429 = rate_429
+        # Fraction of JSON-mode answers cut off mid-object (exercises the repair path)
+        self.malformed = malformed
+        self.retry_after = retry_after
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, headers, body):
+        m = re.search(r"/models/([^/:]+):generateContent", path)
+        if method != "POST" or not m:
+            return 404, {}, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}}
+        model = m.group(1)
+        self.stats[f"{model}.requests"] += 1
+        if random.random() < self.rate_429:
+            self.stats[f"{model}.429"] += 1
+            return 429, {}, {"error": {
+                "code": 429,
+                "message": f"Resource has been exhausted. Please retry in {self.retry_after}s.",
+                "status": "RESOURCE_EXHAUSTED",
+            }}
+        self._sleep()
+        with self._lock:
+            text = self.responses[self._n % len(self.responses)]
+            self._n += 1
+        try:
+            config = json.loads(body or b"{}").get("generationConfig") or {}
+        except ValueError:
+            config = {}
+        if config.get("responseMimeType") == "application/json":
+            # JSON mode: bare, compact JSON like the real API returns
+            text = json.dumps(_recorded_json(text), separators=(",", ":"), ensure_ascii=False)
+            if random.random() < self.malformed:
+                self.stats[f"{model}.malformed"] += 1
+                text = text[: len(text) // 2]
+        return 200, {}, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {
+                "promptTokenCount": len(body) // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": len(body) // 4 + len(text) // 4,
+            },
+            "modelVersion": model,
+        }
+
+
+# ==============================
+# PostgREST-compatible in-memory store
+# ==============================
+
+class FakePostgrest(_FakeService):
+    """
+    Supports GET/POST/PATCH/DELETE on /rest/v1/<table> with eq/neq/gt/gte/
+    lt/lte/is/in filters, select=, order=, limit=, and upsert via
+    on_conflict + Prefer: resolution=merge-duplicates.
+    """
+
+    def __init__(self, latency: float = 0.0, seed: dict = None):
+        super().__init__()
+        self.latency = latency
+        self.tables = {}
+        self._ids = Counter()
+        self._lock = threading.Lock()
+        for table, rows in (seed or {}).items():
+            for row in rows:
+                self._insert(table, dict(row))
+
+    def _insert(self, table: str, row: dict) -> dict:
+        if "id" not in row:
+            self._ids[table] += 1
+            row["id"] = self._ids[table]
+        row.setdefault("created_at", datetime.utcnow().isoformat())
+        self.tables.setdefault(table, []).append(row)
+        return row
+
+    @staticmethod
+    def _coerce(value: str):
+        low = value.lower()
+        if low in ("true", "false"):
+            return low == "true"
+        if low == "null":
+            return None
+        return value
+
+    @classmethod
+    def _matches(cls, row: dict, col: str, expr: str) -> bool:
+        op, _, raw = expr.partition(".")
+        have = row.get(col)
+        if op == "in":
+            values = [v.strip().strip('"') for v in raw.strip("()").split(",") if v.strip()]
+            return str(have) in values
+        if op == "is":
+            return have is cls._coerce(raw) if raw.lower() == "null" else have == cls._coerce(raw)
+        want = cls._coerce(raw)
+        if isinstance(want, bool) or want is None:
+            return (have == want) if op == "eq" else (have != want)
+        have_s = "" if have is None else str(have)
+        if op == "eq":
+            return have_s == want
+        if op == "neq":
+            return have_s != want
+        try:
+            a, b = float(have_s), float(want)
+        except ValueError:
+            a, b = have_s, want
+        return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}.get(op, False)
+
+    def _filtered(self, table: str, params: list) -> list:
+        rows = self.tables.get(table, [])
+        for col, expr in params:
+            if col in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            rows = [r for r in rows if self._matches(r, col, expr)]
+        return rows
+
+    @staticmethod
+    def _project(rows: list, select: str) -> list:
+        if not select or select.strip() == "*":
+            return [dict(r) for r in rows]
+        cols = [c.strip() for c in select.split(",")]
+        return [{c: r.get(c) for c in cols} for r in rows]
+
+    def handle(self, method, path, headers, body):
+        self._sleep()
+        parts = urlsplit(path)
+        m = re.match(r"^/rest/v1/([A-Za-z0-9_]+)$", parts.path)
+        if not m:
+            return 404, {}, {"message": "Not found"}
+        table = m.group(1)
+        params = [(k, unquote(v)) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+        opts = dict(params)
+        prefer = (headers.get("Prefer") or "").lower()
+        self.stats[f"{method} {table}"] += 1
+
+        with self._lock:
+            if method == "GET":
+                rows = list(self._filtered(table, params))
+                for spec in reversed([o for o in opts.get("order", "").split(",") if o]):
+                    col, _, direction = spec.partition(".")
+                    rows.sort(key=lambda r: (r.get(col) is None, str(r.get(col))), reverse=direction.startswith("desc"))
+                if "limit" in opts:
+                    rows = rows[int(opts.get("offset", 0)):][: int(opts["limit"])]
+                return 200, {}, self._project(rows, opts.get("select"))
+
+            if method == "POST":
+                payload = json.loads(body or b"[]")
+                items = payload if isinstance(payload, list) else [payload]
+                conflict_cols = [c.strip() for c in opts.get("on_conflict", "").split(",") if c.strip()]
+                merge = "merge-duplicates" in prefer
+                out = []
+                for item in items:
+                    existing = None
+                    if conflict_cols:
+                        existing = next(
+                            (r for r in self.tables.get(table, [])
+                             if all(r.get(c) == item.get(c) for c in conflict_cols)),
+                            None,
+                        )
+                    if existing is not None:
+                        if merge:
+                            existing.update(item)
+                        out.append(dict(existing))
+                    else:
+                        out.append(dict(self._insert(table, dict(item))))
+                return 201, {}, out
+
+            if method == "PATCH":
+                updates = json.loads(body or b"{}")
+                rows = self._filtered(table, params)
+                for r in rows:
+                    r.update(updates)
+                return 200, {}, [dict(r) for r in rows]
+
+            if method == "DELETE":
+                doomed = self._filtered(table, params)
+                doomed_ids = {id(r) for r in doomed}
+                self.tables[table] = [r for r in self.tables.get(table, []) if id(r) not in doomed_ids]
+                return 200, {}, [dict(r) for r in doomed]
+
+        return 405, {}, {"message": "Method not allowed"}
+
+
+# ==============================
+# Subscriber webhook sink
+# ==============================
+
+class FakeWebhookSink(_FakeService):
+    """
+    Accepts POST /hook/<id>. Records each delivery's event count and the
+    peak number of concurrent requests per path; answers 503 for a
+    `fail_rate` fraction of requests and 410 for ids in `gone`.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_rate: float = 0.0, gone=()):
+        super().__init__()
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.gone = {str(g) for g in gone}
+        self.events = Counter()
+        self.peak_in_flight = Counter()
+        self._in_flight = Counter()
+        self._lock = threading.Lock()
+
+    def url(self, subscriber_id) -> str:
+        return f"{self.base_url}/hook/{subscriber_id}"
+
+    def handle(self, method, path, headers, body):
+        m = re.match(r"^/hook/([^/?]+)$", path)
+        if method != "POST" or not m:
+            return 404, {}, {"message": "Not found"}
+        hook = m.group(1)
+        with self._lock:
+            self._in_flight[hook] += 1
+            self.peak_in_flight[hook] = max(self.peak_in_flight[hook], self._in_flight[hook])
+        try:
+            self._sleep()
+            if hook in self.gone:
+                self.stats["410"] += 1
+                return 410, {}, {"message": "Gone"}
+            if random.random() < self.fail_rate:
+                self.stats["503"] += 1
+                return 503, {}, {"message": "Try again"}
+            payload = json.loads(body or b"{}")
+            with self._lock:
+                self.stats["200"] += 1
+                self.events[hook] += len(payload.get("events", []))
+            return 200, {}, {"ok": True}
+        finally:
+            with self._lock:
+                self._in_flight[hook] -= 1
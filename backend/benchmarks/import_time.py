@@ -0,0 +1,105 @@
+"""
+Import-time report for the backend modules.
+
+Imports each module in a fresh interpreter and reports wall time, peak
+RSS, which heavy dependencies ended up loaded, and the slowest imports
+from `python -X importtime`. Run from the backend directory:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MODULES = ["app", "db", "logic", "jobs"]
+
+# Modules that should only load when a scrape actually runs
+HEAVY_MODULES = ["google.genai", "PIL.Image", "bs4", "rapidfuzz"]
+
+# Runs in the child interpreter; prints one JSON line
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "module": "{module}",
+    "import_ms": round(elapsed * 1000, 1),
+    "max_rss_mb": round(rss_kb / 1024, 1),
+    "heavy_loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    # Importing should never need real credentials; placeholders keep it offline.
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+    env.setdefault("SUPABASE_SERVICE_ROLE_KEY", "benchmark")
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    env["SCRAPE_WORKER_ENABLED"] = "false"
+    return env
+
+
+def measure(module: str, top: int = 8) -> dict:
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return {"module": module, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    slowest = []
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.+)$", line)
+        if m and m.group(3).strip() not in (module, "site"):
+            slowest.append((int(m.group(2)), m.group(3).strip()))
+    slowest.sort(reverse=True)
+    result["slowest_imports"] = [
+        {"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in slowest[:top]
+    ]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", action="store_true", help="print raw JSON instead of a table")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    results = [measure(m) for m in args.modules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'module':<10} {'import ms':>10} {'max RSS MB':>11}  heavy deps loaded")
+    for r in results:
+        if "error" in r:
+            print(f"{r['module']:<10} failed: {r['error']}")
+            continue
+        heavy = ", ".join(r["heavy_loaded"]) or "-"
+        print(f"{r['module']:<10} {r['import_ms']:>10} {r['max_rss_mb']:>11}  {heavy}")
+    for r in results:
+        if r.get("slowest_imports"):
+            print(f"\nSlowest imports under {r['module']} (cumulative):")
+            for s in r["slowest_imports"]:
+                print(f"  {s['cumulative_ms']:>8} ms  {s['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+HTTP load test for the Flask API.
+
+Runs app.py under gunicorn (or asgi.py under uvicorn with --server asgi)
+against an in-memory PostgREST stand-in (and
+a fake ZANECO site/Gemini stub for the scrape job the notices endpoint
+queues), then drives it with concurrent virtual users. Reports RPS,
+latency percentiles and error rate per endpoint, and stores each run in
+benchmarks/results/ so runs can be compared.
+
+    python benchmarks/loadtest_api.py --users 50 --duration 30 --workers 2
+    python benchmarks/loadtest_api.py --users 50 --duration 30 --server asgi
+    python benchmarks/loadtest_api.py --compare benchmarks/results/loadtest-20260401-120000.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import FakeGemini, FakePostgrest, FakeZanecoSite  # noqa: E402
+
+ADMIN_KEY = "loadtest"
+
+
+def seed_rows(learned: int, reports: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "learned_locations": [
+            {
+                "municipality": "CITY OF DIPOLOG",
+                "barangay": "MIPUTAK (POB.)",
+                "location_type": "purok",
+                "location_name": f"Prk. Loadtest {i}",
+                "source_url": f"https://zaneco.ph/notice-{i}/",
+                "verified": i % 3 == 0,
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+            }
+            for i in range(learned)
+        ],
+        "community_reports": [
+            {
+                "municipality": "CITY OF DIPOLOG",
+                "barangay": "GALAS",
+                "message": "No power since 8AM",
+                "status": "not_yet_confirmed",
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+            }
+            for i in range(reports)
+        ],
+        "app_settings": [{"key": "maintenance_mode", "value": "false"}],
+    }
+
+
+# name, weight, method, path (callable for ids), json body
+def build_scenarios(learned: int, reports: int) -> list:
+    admin = {"X-Admin-Key": ADMIN_KEY}
+    return [
+        ("GET /api/admin/learned-locations", 30, "GET", lambda: "/api/admin/learned-locations", None, admin),
+        ("GET /api/admin/reports", 25, "GET", lambda: "/api/admin/reports", None, admin),
+        ("PATCH /api/admin/learned-locations/<id>", 15, "PATCH",
+         lambda: f"/api/admin/learned-locations/{random.randint(1, max(1, learned))}", {"verified": True}, admin),
+        ("PATCH /api/admin/reports/<id>", 10, "PATCH",
+         lambda: f"/api/admin/reports/{random.randint(1, max(1, reports))}", {"status": "ongoing"}, admin),
+        ("GET /api/admin/maintenance", 15, "GET", lambda: "/api/admin/maintenance", None, admin),
+        ("GET /api/admin/overview", 5, "GET", lambda: "/api/admin/overview", None, admin),
+        ("GET /api/reports/heatmap", 20, "GET", lambda: "/api/reports/heatmap", None, {}),
+        ("POST /api/reports", 20, "POST", lambda: "/api/reports",
+         {"type": "outage_report", "municipality": "CITY OF DIPOLOG", "barangay": "GALAS"}, {}),
+        ("POST /api/notices", 5, "POST", lambda: "/api/notices", None, {}),
+    ]
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))]
+
+
+def run_users(base_url: str, scenarios: list, users: int, duration: float) -> dict:
+    samples = {name: [] for name, *_ in scenarios}
+    errors = {name: 0 for name, *_ in scenarios}
+    lock = threading.Lock()
+    weights = [s[1] for s in scenarios]
+    deadline = time.perf_counter() + duration
+
+    def user():
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            name, _, method, path, body, headers = random.choices(scenarios, weights)[0]
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path(), json=body, headers=headers, timeout=30)
+                ok = resp.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                samples[name].append(elapsed_ms)
+                if not ok:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(users)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    endpoints = {}
+    for name, lat in samples.items():
+        lat.sort()
+        endpoints[name] = {
+            "requests": len(lat),
+            "rps": round(len(lat) / wall, 1),
+            "error_rate": round(errors[name] / len(lat), 4) if lat else 0.0,
+            "p50_ms": round(_percentile(lat, 50), 1),
+            "p95_ms": round(_percentile(lat, 95), 1),
+            "p99_ms": round(_percentile(lat, 99), 1),
+            "max_ms": round(lat[-1], 1) if lat else 0.0,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    total_errors = sum(errors.values())
+    return {
+        "wall_s": round(wall, 2),
+        "total": {"requests": total, "rps": round(total / wall, 1), "error_rate": round(total_errors / total, 4) if total else 0.0},
+        "endpoints": endpoints,
+    }
+
+
+def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API did not come up at {url}")
+
+
+def print_report(report: dict, previous: dict = None):
+    print(f"\n{'endpoint':<42} {'reqs':>7} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, e in report["endpoints"].items():
+        line = (
+            f"{name:<42} {e['requests']:>7} {e['rps']:>7.1f} {e['error_rate'] * 100:>6.2f} "
+            f"{e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f}"
+        )
+        prev = (previous or {}).get("endpoints", {}).get(name)
+        if prev and prev["rps"]:
+            line += f"   rps {e['rps'] / prev['rps']:.2f}x, p95 {e['p95_ms'] - prev['p95_ms']:+.1f}ms"
+        print(line)
+    t = report["total"]
+    print(f"{'TOTAL':<42} {t['requests']:>7} {t['rps']:>7.1f} {t['error_rate'] * 100:>6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run")
+    parser.add_argument("--server", choices=["gunicorn", "asgi"], default="gunicorn",
+                        help="gunicorn app:app (sync) or uvicorn asgi:app (async admin endpoints)")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes (free tier: 1)")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="gunicorn threads per worker; with --server asgi, threads for the Flask endpoints")
+    parser.add_argument("--db-latency", type=float, default=0.03, help="seconds per PostgREST request")
+    parser.add_argument("--learned", type=int, default=500, help="seeded learned_locations rows")
+    parser.add_argument("--reports", type=int, default=300, help="seeded community_reports rows")
+    parser.add_argument("--compare", help="previous result JSON to compare against")
+    args = parser.parse_args()
+
+    store = FakePostgrest(latency=args.db_latency, seed=seed_rows(args.learned, args.reports)).start()
+    site = FakeZanecoSite(posts=0).start()
+    gemini = FakeGemini().start()
+    jobs_db = Path(tempfile.mkdtemp()) / "scrape_jobs.sqlite3"
+
+    port = random.randint(20000, 40000)
+    env = {
+        **os.environ,
+        "SUPABASE_URL": store.base_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "loadtest",
+        "ADMIN_KEY": ADMIN_KEY,
+        "ZANECO_BASE_URL": site.base_url,
+        "GEMINI_BASE_URL": gemini.base_url,
+        "GEMINI_API_KEY": "loadtest",
+        "SCRAPE_JOBS_DB": str(jobs_db),
+        # All virtual users share one IP; measure report intake, not the rate limiter
+        "REPORT_RATE_PER_MINUTE": "1000000",
+        "REPORT_RATE_BURST": "1000000",
+        "REPORT_IP_RATE_PER_MINUTE": "1000000",
+    }
+    if args.server == "asgi":
+        env["ASGI_WSGI_THREADS"] = str(args.threads)
+        command = ["uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--workers", str(args.workers), "--log-level", "warning"]
+    else:
+        command = ["gunicorn", "app:app", "-b", f"127.0.0.1:{port}",
+                   "-w", str(args.workers), "--threads", str(args.threads), "--log-level", "warning"]
+    server = subprocess.Popen(
+        [sys.executable, "-m", *command],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url + "/")
+        print(f"Running {args.users} users for {args.duration:.0f}s against {args.server}, "
+              f"{args.workers} worker(s) x {args.threads} thread(s)...")
+        report = run_users(base_url, build_scenarios(args.learned, args.reports), args.users, args.duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        store.stop()
+        site.stop()
+        gemini.stop()
+
+    report["config"] = vars(args)
+    report["run_at"] = datetime.utcnow().isoformat()
+
+    previous = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, previous)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    out = RESULTS_DIR / f"loadtest-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {out.relative_to(BACKEND_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
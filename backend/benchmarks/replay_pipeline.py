@@ -0,0 +1,122 @@
+"""
+End-to-end replay of the scrape pipeline against local stand-ins.
+
+Starts a fake ZANECO site, a Gemini stub and an in-memory PostgREST
+store (benchmarks/fakes.py), points the real get_notices →
+save_notices_to_supabase → delete_old_notices pipeline at them, and
+reports throughput plus per-stage latency from the tracing spans.
+
+    python benchmarks/replay_pipeline.py --posts 200 --images-per-post 5
+    python benchmarks/replay_pipeline.py --gemini-latency 0.8 --rate-429 0.05 --json out.json
+
+No network access, API keys or database are needed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import FakeGemini, FakePostgrest, FakeZanecoSite  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--images-per-post", type=int, default=4)
+    parser.add_argument("--text-posts", type=float, default=0.0, help="fraction of posts with the schedule as text")
+    parser.add_argument("--site-latency", type=float, default=0.02, help="seconds per site request")
+    parser.add_argument("--gemini-latency", type=float, default=0.05, help="seconds per generateContent")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of Gemini calls answered 429")
+    parser.add_argument("--malformed", type=float, default=0.0, help="fraction of Gemini answers cut off mid-JSON")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="seconds per PostgREST request")
+    parser.add_argument("--token-budget", type=int, default=0, help="GEMINI_RUN_TOKEN_BUDGET for the run (0 = unlimited)")
+    parser.add_argument("--backoff", type=int, default=1, help="Gemini retry backoff seconds (prod: 30)")
+    parser.add_argument("--trace", help="also write spans to this JSON lines file")
+    parser.add_argument("--json", dest="json_out", help="write the report to this file")
+    args = parser.parse_args()
+
+    site = FakeZanecoSite(
+        posts=args.posts, images_per_post=args.images_per_post,
+        latency=args.site_latency, text_posts=args.text_posts,
+    ).start()
+    gemini = FakeGemini(latency=args.gemini_latency, rate_429=args.rate_429, malformed=args.malformed).start()
+    store = FakePostgrest(latency=args.db_latency).start()
+
+    # Must be set before the backend modules are imported
+    os.environ.update({
+        "ZANECO_BASE_URL": site.base_url,
+        "GEMINI_BASE_URL": gemini.base_url,
+        "GEMINI_API_KEY": "replay",
+        "SUPABASE_URL": store.base_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "replay",
+        "SCRAPER_MAX_CATEGORY_PAGES": str(site.pages),
+        "GEMINI_RETRY_BACKOFF_SECONDS": str(args.backoff),
+        "GEMINI_RETRY_BUFFER_SECONDS": "0",
+        "GEMINI_RUN_TOKEN_BUDGET": str(args.token_budget),
+        "GEMINI_USAGE_FILE": os.devnull,
+    })
+    os.chdir(BACKEND_DIR)
+
+    import gemini_usage
+    import tracing
+    from jobs import run_scrape_pipeline
+    from logic import model_output_stats
+
+    tracing.configure(args.trace)
+    progress = {}
+    start = time.perf_counter()
+    try:
+        result = run_scrape_pipeline(progress=lambda **counts: progress.update(counts))
+    finally:
+        elapsed = time.perf_counter() - start
+        tracing.close()
+        site.stop()
+        gemini.stop()
+        store.stop()
+
+    images = progress.get("images_processed", 0)
+    report = {
+        "config": vars(args),
+        "result": result,
+        "elapsed_s": round(elapsed, 2),
+        "throughput": {
+            "posts_per_s": round(result["notices"] / elapsed, 2) if elapsed else 0,
+            "images_per_s": round(images / elapsed, 2) if elapsed else 0,
+        },
+        "images_processed": images,
+        "notices_from_text": progress.get("notices_from_text", 0),
+        "llm_calls_avoided": progress.get("llm_calls_avoided", 0),
+        "model_output": dict(model_output_stats),
+        "gemini_usage": gemini_usage.summary(),
+        "stages": tracing.summarize()["stages"],
+        "models": tracing.summarize()["models"],
+        "servers": {
+            "site": dict(site.stats),
+            "gemini": dict(gemini.stats),
+            "postgrest": dict(store.stats),
+        },
+        "rows": {table: len(rows) for table, rows in store.tables.items()},
+    }
+
+    print("\n" + "=" * 60)
+    print(f"Replay: {args.posts} posts x {args.images_per_post} images in {elapsed:.1f}s")
+    print(f"  {report['throughput']['posts_per_s']} posts/s, {report['throughput']['images_per_s']} images/s")
+    print(f"  Result: {result}")
+    print(f"  Model output: {report['model_output']}")
+    print(f"  Gemini calls avoided: {report['llm_calls_avoided']} ({report['notices_from_text']} notices parsed from text)")
+    print(f"  Rows in store: {report['rows']}")
+    tracing.print_summary()
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,13 @@
 import os
 import re
+import time
 from typing import List, Dict, Any
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta
+from supabase_client import run_query, run_query_async
 
 load_dotenv()
 
-SUPABASE_URL = os.environ["SUPABASE_URL"]
-SUPABASE_SERVICE_ROLE_KEY = os.environ["SUPABASE_SERVICE_ROLE_KEY"]
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-
 def flatten_notice_for_db(n: Dict[str, Any]) -> Dict[str, Any]:
     """
     Convert one notice_result from your OCR pipeline into a single DB row.
@@ -48,12 +44,63 @@ def save_notices_to_supabase(final_results: List[Dict[str, Any]]) -> dict:
         return {"inserted": 0, "data": []}
 
     # upsert using unique index on url
-    res = supabase.table("notices").upsert(rows, on_conflict="url").execute()
+    res = run_query("notices", "upsert", lambda t: t.upsert(rows, on_conflict="url"))
     return {"inserted": len(res.data or []), "data": res.data}
 
+def get_active_notices() -> list:
+    """Active (not cancelled) notices with their data, for revalidation."""
+    res = run_query(
+        "notices", "select",
+        lambda t: t.select("id,title,url,status,data").eq("status", "active"),
+    )
+    return res.data or []
+
+def update_notice(notice_id, fields: dict):
+    """Update one notice row in place (title/status/data)."""
+    run_query("notices", "update", lambda t: t.update(fields).eq("id", notice_id))
+
+def get_subscription_secret(kind: str, endpoint: str):
+    """The secret an endpoint was first subscribed with, or None for a new endpoint."""
+    res = run_query(
+        "subscriptions", "select",
+        lambda t: t.select("secret").eq("kind", kind).eq("endpoint", endpoint).order("id").limit(1),
+    )
+    return res.data[0]["secret"] if res.data else None
+
+def save_subscriptions(kind: str, endpoint: str, secret: str, barangay_codes) -> int:
+    """
+    Subscribe an endpoint to barangays with its secret. Returns the endpoint's
+    active rows under that secret. Existing rows keep their secret; only
+    `active` is set again, so re-subscribing reactivates a row without
+    handing its signing key to whoever posted.
+    """
+    codes = sorted(set(barangay_codes))
+    rows = [
+        {"barangay_code": c, "kind": kind, "endpoint": endpoint, "secret": secret, "active": True}
+        for c in codes
+    ]
+    run_query(
+        "subscriptions", "upsert",
+        lambda t: t.upsert(rows, on_conflict="kind,endpoint,barangay_code", ignore_duplicates=True),
+    )
+    res = run_query(
+        "subscriptions", "update",
+        lambda t: t.update({"active": True}).eq("kind", kind).eq("endpoint", endpoint)
+        .eq("secret", secret).in_("barangay_code", codes),
+    )
+    return len(res.data or [])
+
+def deactivate_subscriptions(secret: str, barangay_codes=None) -> int:
+    """Unsubscribe every row with this secret, or only the given barangays. Returns rows changed."""
+    def build(t):
+        q = t.update({"active": False}).eq("secret", secret).eq("active", True)
+        return q.in_("barangay_code", list(barangay_codes)) if barangay_codes else q
+    res = run_query("subscriptions", "update", build)
+    return len(res.data or [])
+
 def get_processed_urls() -> set:
     try:
-        res = supabase.table("notices").select("url").execute()
+        res = run_query("notices", "select", lambda t: t.select("url"))
         return {row["url"] for row in res.data}
     except Exception as e:
         print(f"Error fetching processed urls: {e}")
@@ -64,7 +111,8 @@ def save_learned_locations(mappings: list):
     """
     Save purok/landmark → barangay mappings learned from ZANECO notices.
     Each mapping: { municipality, barangay, location_type, location_name, source_url }
-    Stores to 'learned_locations' table for admin review and periodic merge into barangay_details.json.
+    Stores to 'learned_locations' table for admin review and periodic merge into barangay_details.json
+    (see learned_merge.py).
     Skips entries where municipality + location_name already exist (regardless of barangay)
     to avoid overriding admin corrections.
     """
@@ -72,9 +120,10 @@ def save_learned_locations(mappings: list):
         return
     try:
         # Fetch existing (municipality, location_name) pairs to avoid overriding corrections
-        existing_res = supabase.table("learned_locations") \
-            .select("municipality,location_name") \
-            .execute()
+        existing_res = run_query(
+            "learned_locations", "select",
+            lambda t: t.select("municipality,location_name"),
+        )
         existing_keys = set()
         for row in (existing_res.data or []):
             key = (row.get("municipality", "").upper(), row.get("location_name", "").upper())
@@ -98,30 +147,42 @@ def save_learned_locations(mappings: list):
         if not rows:
             print("  No new learned locations to save (all already exist)")
             return
-        supabase.table("learned_locations").upsert(
-            rows,
-            on_conflict="municipality,barangay,location_name"
-        ).execute()
+        run_query(
+            "learned_locations", "upsert",
+            lambda t: t.upsert(rows, on_conflict="municipality,barangay,location_name"),
+        )
         print(f"  Saved {len(rows)} learned location mappings")
     except Exception as e:
         # Non-critical — don't break the scraper if table doesn't exist yet
         print(f"  Note: Could not save learned locations ({e})")
 
 
-def get_verified_learned_locations() -> list:
+def bump_learned_locations_version():
     """
-    Fetch verified learned_locations from Supabase for use during scrape processing.
-    Returns list of dicts: { municipality, barangay, location_type, location_name }
+    Move the learned_locations version watermark so long-running processes
+    reload their verified locations (see reference_data.py). Call after any
+    admin change to learned_locations.
     """
     try:
-        res = supabase.table("learned_locations") \
-            .select("municipality,barangay,location_type,location_name") \
-            .eq("verified", True) \
-            .execute()
-        return res.data or []
+        run_query(*_learned_locations_version_query())
+    except Exception as e:
+        print(f"  Note: Could not bump learned_locations version ({e})")
+
+
+async def bump_learned_locations_version_async():
+    """bump_learned_locations_version() for the async endpoints (asgi.py)."""
+    try:
+        await run_query_async(*_learned_locations_version_query())
     except Exception as e:
-        print(f"  Note: Could not fetch learned locations ({e})")
-        return []
+        print(f"  Note: Could not bump learned_locations version ({e})")
+
+
+def _learned_locations_version_query() -> tuple:
+    version = str(time.time_ns())
+    return (
+        "app_settings", "upsert",
+        lambda t: t.upsert({"key": "learned_locations_version", "value": version}, on_conflict="key"),
+    )
 
 
 def _parse_latest_date_from_title_or_url(title: str, url: str):
@@ -202,6 +263,10 @@ def delete_old_notices():
     Deletes records where the LATEST scheduled date inside the JSON data 
     has entirely passed (is older than today). This ensures notices with 
     multiple future dates are kept until all dates have passed.
+
+    Expired notices are first flattened into the month-partitioned
+    archive (notice_archive.py); if that fails they are kept for the
+    next run instead of being deleted.
     """
     try:
         from dateutil import parser
@@ -210,7 +275,7 @@ def delete_old_notices():
         stale_fallback_days = int(os.getenv("SCRAPER_STALE_NOTICE_DAYS", "21"))
         
         # 1. Fetch all notices with their data
-        res = supabase.table("notices").select("id, title, url, created_at, data").execute()
+        res = run_query("notices", "select", lambda t: t.select("id, title, url, created_at, data"))
         if not res.data:
             return 0
             
@@ -262,9 +327,25 @@ def delete_old_notices():
                     except Exception:
                         pass
                 
-        # 2. Delete the fully expired notices
+        # 2. Archive their schedules so the history outlives the hot table
+        import notice_archive
+
+        expiring = set(ids_to_delete)
+        expired = [
+            row for row in res.data
+            if row.get("id") in expiring and (row.get("data") or {}).get("processed_images")
+        ]
+        if expired and notice_archive.ARCHIVE_ENABLED:
+            try:
+                notice_archive.archive_notices(expired)
+            except Exception as e:
+                print(f"  Note: Archiving expired notices failed ({e}); keeping them until the next run")
+                kept = {row.get("id") for row in expired}
+                ids_to_delete = [i for i in ids_to_delete if i not in kept]
+
+        # 3. Delete the fully expired notices
         if ids_to_delete:
-            del_res = supabase.table("notices").delete().in_("id", ids_to_delete).execute()
+            del_res = run_query("notices", "delete", lambda t: t.delete().in_("id", ids_to_delete))
             deleted_count = len(del_res.data or [])
             print(f"Cleanup: Deleted {deleted_count} perfectly expired notices based on schedule dates.")
             return deleted_count
@@ -36,6 +36,13 @@ interface CommunityReport {
   created_at: string;
 }
 
+interface HeatmapEntry {
+  municipality: string;
+  barangay: string;
+  last_15m: number;
+  last_60m: number;
+}
+
 type Tab = 'locations' | 'reports' | 'settings';
 type ReportStatus = 'confirmed' | 'not_yet_confirmed' | 'ongoing';
 
@@ -91,6 +98,7 @@ export default function AdminPage() {
   const [tab, setTab] = useState<Tab>('locations');
   const [locations, setLocations] = useState<LearnedLocation[]>([]);
   const [reports, setReports] = useState<CommunityReport[]>([]);
+  const [heatmap, setHeatmap] = useState<HeatmapEntry[]>([]);
   const [maintenanceEnabled, setMaintenanceEnabled] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -137,6 +145,15 @@ export default function AdminPage() {
     }
   }, []);
 
+  const fetchHeatmap = useCallback(async () => {
+    try {
+      const data = await adminFetch('/api/reports/heatmap');
+      setHeatmap(data.barangays || []);
+    } catch {
+      // ignore — the next poll retries
+    }
+  }, []);
+
   const fetchMaintenance = useCallback(async () => {
     try {
       const data = await adminFetch('/api/admin/maintenance');
@@ -152,6 +169,14 @@ export default function AdminPage() {
     else if (tab === 'settings') fetchMaintenance();
   }, [tab, fetchLocations, fetchReports, fetchMaintenance]);
 
+  // Live report counts: the endpoint is cached server-side, so polling is cheap
+  useEffect(() => {
+    if (tab !== 'reports') return;
+    fetchHeatmap();
+    const timer = setInterval(fetchHeatmap, 30000);
+    return () => clearInterval(timer);
+  }, [tab, fetchHeatmap]);
+
   // ---------- Actions ----------
 
   const toggleVerified = async (loc: LearnedLocation) => {
@@ -514,6 +539,21 @@ export default function AdminPage() {
                   <RefreshCw className={`w-4 h-4 ${loading ? 'animate-spin' : ''} ${textMuted}`} />
                 </button>
               </div>
+              {heatmap.length > 0 && (
+                <div className={`rounded-2xl p-4 ${isLight ? 'bg-white/60 border border-amber-100' : 'bg-white/5 border border-white/10'}`}>
+                  <h3 className={`text-sm font-semibold mb-2 ${textMain}`}>Reporting outages now</h3>
+                  <div className="space-y-1">
+                    {heatmap.slice(0, 10).map((h) => (
+                      <div key={`${h.municipality}/${h.barangay}`} className={`flex items-center justify-between text-xs ${textMain}`}>
+                        <span className="truncate">{h.barangay}, {h.municipality}</span>
+                        <span className={`flex-shrink-0 ml-3 ${textMuted}`}>
+                          {h.last_15m} in 15 min &middot; {h.last_60m} in 1 hr
+                        </span>
+                      </div>
+                    ))}
+                  </div>
+                </div>
+              )}
               {loading ? (
                 <div className={`text-center py-8 ${textMuted}`}>
                   <Loader2 className="w-6 h-6 animate-spin mx-auto mb-2" />
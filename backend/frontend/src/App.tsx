@@ -1,6 +1,6 @@
 import { useEffect, useState, useMemo } from 'react';
 import { motion, AnimatePresence } from 'motion/react';
-import { MapPin, Building2, Zap, Calendar, Clock, CheckCircle2, AlertCircle, Info, Sun, Moon, MessageSquarePlus, Shield } from 'lucide-react';
+import { MapPin, Building2, Zap, Calendar, Clock, CheckCircle2, AlertCircle, Info, Sun, Moon, MessageSquarePlus, Shield, Search } from 'lucide-react';
 import localLocations from './locations.json';
 import { Analytics } from '@vercel/analytics/react';
 
@@ -31,9 +31,24 @@ type MunicipalityValue = { code?: string | null; name?: string | null } | string
 type BarangayValue = { code?: string | null; name?: string | null } | string | null | undefined;
 type ThemeMode = 'light' | 'dark';
 
+interface LocationSearchResult {
+  municipality: { code: string; name: string };
+  barangay: { code: string; name: string };
+  score: number;
+  matches: { name: string; kind: string }[];
+}
+
+interface HeatmapEntry {
+  municipality: string;
+  barangay: string;
+  last_15m: number;
+  last_60m: number;
+}
+
 const SUPABASE_URL = (import.meta.env.VITE_SUPABASE_URL || '').replace(/\/$/, '');
 const SUPABASE_ANON_KEY = import.meta.env.VITE_SUPABASE_ANON_KEY || '';
 const ADMIN_KEY = import.meta.env.VITE_ADMIN_KEY || '';
+const API_BASE_URL = (import.meta.env.VITE_API_BASE_URL || '').replace(/\/$/, '');
 
 const normalizeLocations = (data: unknown): Location[] => {
   if (Array.isArray(data)) {
@@ -127,6 +142,60 @@ const fetchNoticesFromSupabase = async (): Promise<Notice[]> => {
   return Array.isArray(data) ? data : [];
 };
 
+// Canonical schedules (one row per barangay and interval, cancellations applied; see backend/reconcile.py).
+// Returns null when the schedules table isn't available so the caller can fall back to notices.
+const fetchBarangaySchedules = async (barangayCode: string, locationStr: string): Promise<MatchedSchedule[] | null> => {
+  if (!SUPABASE_URL || !SUPABASE_ANON_KEY) {
+    return null;
+  }
+
+  // Schedules are stored in Philippine time (UTC+8) without an offset
+  const nowManila = new Date(Date.now() + 8 * 3600 * 1000).toISOString().slice(0, 19);
+  const url = new URL(`${SUPABASE_URL}/rest/v1/schedules`);
+  url.searchParams.set('select', 'schedule_key,notice_url,start_at,end_at,all_day,date_text,time_text,affected_area');
+  url.searchParams.set('barangay_code', `eq.${barangayCode}`);
+  url.searchParams.set('status', 'eq.active');
+  url.searchParams.set('or', `(end_at.is.null,end_at.gte.${nowManila})`);
+  url.searchParams.set('order', 'start_at.asc.nullslast');
+
+  try {
+    const res = await fetch(url.toString(), {
+      headers: {
+        apikey: SUPABASE_ANON_KEY,
+        Authorization: `Bearer ${SUPABASE_ANON_KEY}`,
+      },
+    });
+    if (!res.ok) return null;
+    const rows = await res.json();
+    if (!Array.isArray(rows)) return null;
+
+    const formatTime = (value: string) =>
+      new Date(value).toLocaleTimeString('en-PH', { hour: 'numeric', minute: '2-digit', hour12: true });
+    return rows.map((row: any) => {
+      if (!row.start_at) {
+        return {
+          id: row.schedule_key,
+          url: row.notice_url,
+          dateStr: row.date_text || 'See official notice',
+          timeStr: row.time_text || 'See official notice',
+          locationStr,
+          affectedArea: row.affected_area,
+        };
+      }
+      return {
+        id: row.schedule_key,
+        url: row.notice_url,
+        dateStr: new Date(row.start_at).toLocaleDateString('en-PH', { month: 'long', day: 'numeric', year: 'numeric' }),
+        timeStr: row.all_day ? 'Whole day' : `${formatTime(row.start_at)} - ${formatTime(row.end_at)}`,
+        locationStr,
+        affectedArea: row.affected_area,
+      };
+    });
+  } catch {
+    return null;
+  }
+};
+
 export default function App() {
   // Dev-only crash test: open /?crash=1 to trigger the ErrorBoundary maintenance page
   // if (import.meta.env.DEV && new URLSearchParams(window.location.search).get('crash') === '1') {
@@ -136,7 +205,11 @@ export default function App() {
   const [locations] = useState<Location[]>(normalizeLocations(localLocations));
   const [selectedCity, setSelectedCity] = useState('');
   const [selectedBarangay, setSelectedBarangay] = useState('');
+  const [locationQuery, setLocationQuery] = useState('');
+  const [locationResults, setLocationResults] = useState<LocationSearchResult[]>([]);
   const [notices, setNotices] = useState<Notice[]>([]);
+  const [barangaySchedules, setBarangaySchedules] = useState<MatchedSchedule[] | null>(null);
+  const [outageReports, setOutageReports] = useState<HeatmapEntry | null>(null);
   const [loading, setLoading] = useState(false);
   const [loadError, setLoadError] = useState<string | null>(null);
   const [lastUpdated, setLastUpdated] = useState<string | null>(null);
@@ -234,14 +307,90 @@ export default function App() {
     void loadNotices();
   }, []);
 
+  // Purok/landmark search: debounced so each keystroke doesn't hit the API
+  useEffect(() => {
+    const query = locationQuery.trim();
+    if (!API_BASE_URL || query.length < 2) {
+      setLocationResults([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = window.setTimeout(async () => {
+      try {
+        const url = new URL(`${API_BASE_URL}/api/locations/search`);
+        url.searchParams.set('q', query);
+        url.searchParams.set('limit', '5');
+        const res = await fetch(url.toString(), { signal: controller.signal });
+        if (res.ok) {
+          const body = await res.json();
+          setLocationResults(Array.isArray(body.results) ? body.results : []);
+        }
+      } catch {
+        // non-critical; the dropdowns still work
+      }
+    }, 200);
+    return () => {
+      controller.abort();
+      window.clearTimeout(timer);
+    };
+  }, [locationQuery]);
+
+  const pickLocationResult = (result: LocationSearchResult) => {
+    setSelectedCity(result.municipality.code);
+    setSelectedBarangay(result.barangay.code);
+    setLocationQuery('');
+    setLocationResults([]);
+  };
+
   const availableBarangays = useMemo(() => {
     const city = locations.find(c => c.code === selectedCity);
     return city ? city.barangays : [];
   }, [locations, selectedCity]);
 
+  useEffect(() => {
+    setBarangaySchedules(null);
+    if (!selectedCity || !selectedBarangay) return;
+    const city = locations.find((l) => l.code === selectedCity);
+    const barangayName = city?.barangays.find((b) => b.code === selectedBarangay)?.name || '';
+    let cancelled = false;
+    void fetchBarangaySchedules(selectedBarangay, `${barangayName}, ${city?.name || ''}`).then((rows) => {
+      if (!cancelled) setBarangaySchedules(rows);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedCity, selectedBarangay, locations]);
+
+  // Live "no power" reports from residents of the selected barangay (see report_heatmap.py)
+  useEffect(() => {
+    setOutageReports(null);
+    if (!API_BASE_URL || !selectedCity || !selectedBarangay) return;
+    const city = locations.find((l) => l.code === selectedCity);
+    const barangayName = city?.barangays.find((b) => b.code === selectedBarangay)?.name || '';
+    const poll = async () => {
+      try {
+        const res = await fetch(`${API_BASE_URL}/api/reports/heatmap`);
+        if (!res.ok) return;
+        const body = await res.json();
+        const entry = (body.barangays || []).find(
+          (h: HeatmapEntry) =>
+            h.municipality === (city?.name || '').toUpperCase() && h.barangay === barangayName.toUpperCase()
+        );
+        setOutageReports(entry || null);
+      } catch {
+        // non-critical; the next poll retries
+      }
+    };
+    void poll();
+    const timer = window.setInterval(poll, 30000);
+    return () => window.clearInterval(timer);
+  }, [selectedCity, selectedBarangay, locations]);
+
   // Filter schedules and flatten them exactly to specific dates/times
   const matchedSchedules = useMemo(() => {
     if (!selectedCity || !selectedBarangay) return null;
+    // Reconciled schedules when available; otherwise filter the notices here
+    if (barangaySchedules !== null) return barangaySchedules;
 
     const selectedCityObj = locations.find((l) => l.code === selectedCity);
     const selectedCityName = selectedCityObj?.name || '';
@@ -297,7 +446,7 @@ export default function App() {
     });
     
     return matches;
-  }, [notices, selectedCity, selectedBarangay, locations]);
+  }, [notices, selectedCity, selectedBarangay, locations, barangaySchedules]);
 
   const handleCityChange = (cityCode: string) => {
     setSelectedCity(cityCode);
@@ -534,6 +683,50 @@ export default function App() {
 
             {/* Form Section */}
             <div className="p-8 md:p-10 space-y-6">
+              {/* Purok / Landmark Search */}
+              {API_BASE_URL && (
+                <motion.div
+                  initial={{ opacity: 0, x: -20 }}
+                  animate={{ opacity: 1, x: 0 }}
+                  transition={{ delay: 0.25 }}
+                >
+                  <label htmlFor="location-search" className={`flex items-center gap-2 mb-3 font-medium ${isLightMode ? 'text-slate-700' : 'text-white/90'}`}>
+                    <Search className="w-4 h-4" />
+                    Know your purok or a landmark?
+                  </label>
+                  <input
+                    id="location-search"
+                    type="search"
+                    value={locationQuery}
+                    onChange={(e) => setLocationQuery(e.target.value)}
+                    placeholder="e.g. Prk. Greenleaves, Gaisano"
+                    autoComplete="off"
+                    className={`${fieldClass} cursor-text`}
+                  />
+                  {locationResults.length > 0 && (
+                    <ul className={`mt-2 rounded-2xl overflow-hidden border ${isLightMode ? 'border-amber-200 bg-white/90' : 'border-white/20 bg-gray-900/90'}`}>
+                      {locationResults.map((result) => (
+                        <li key={result.barangay.code}>
+                          <button
+                            type="button"
+                            onClick={() => pickLocationResult(result)}
+                            className={`w-full text-left px-5 py-3 transition-colors ${isLightMode ? 'text-slate-800 hover:bg-amber-100' : 'text-white hover:bg-white/10'}`}
+                          >
+                            <span className="font-medium">{result.barangay.name}</span>
+                            <span className={isLightMode ? 'text-slate-500' : 'text-white/60'}>, {result.municipality.name}</span>
+                            {result.matches.length > 0 && (
+                              <span className={`block text-xs ${isLightMode ? 'text-slate-500' : 'text-white/50'}`}>
+                                {result.matches.map((m) => m.name).join(' · ')}
+                              </span>
+                            )}
+                          </button>
+                        </li>
+                      ))}
+                    </ul>
+                  )}
+                </motion.div>
+              )}
+
               {/* City Selector */}
               <motion.div
                 initial={{ opacity: 0, x: -20 }}
@@ -599,6 +792,16 @@ export default function App() {
                 </div>
               </motion.div>
 
+              {outageReports && outageReports.last_60m > 0 && (
+                <div className={`mt-6 flex items-start gap-3 rounded-2xl p-4 ${isLightMode ? 'bg-orange-100 border border-orange-300/70' : 'bg-orange-500/15 border border-orange-400/30'}`}>
+                  <Zap className={`w-5 h-5 flex-shrink-0 ${isLightMode ? 'text-orange-600' : 'text-orange-300'}`} />
+                  <p className={`text-sm font-medium ${isLightMode ? 'text-orange-800' : 'text-orange-100'}`}>
+                    {outageReports.last_60m} resident report{outageReports.last_60m === 1 ? '' : 's'} of no power here in the last hour
+                    {outageReports.last_15m > 0 && ` (${outageReports.last_15m} in the last 15 minutes)`}.
+                  </p>
+                </div>
+              )}
+
               {/* Status or Results Section */}
               <AnimatePresence mode="wait">
                 {loading ? (
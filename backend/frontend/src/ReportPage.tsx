@@ -1,6 +1,6 @@
 import { useState, useMemo } from 'react';
 import { motion } from 'motion/react';
-import { MapPin, Building2, Home, Phone, MessageSquare, Send, CheckCircle2, AlertTriangle, Mail, Clock, MapPinned } from 'lucide-react';
+import { MapPin, Building2, Home, Phone, MessageSquare, Send, CheckCircle2, AlertTriangle, Mail, Clock, MapPinned, ZapOff } from 'lucide-react';
 import localLocations from './locations.json';
 
 type ThemeMode = 'light' | 'dark';
@@ -12,8 +12,27 @@ interface Location {
   barangays: { code: string; name: string }[];
 }
 
-const SUPABASE_URL = (import.meta.env.VITE_SUPABASE_URL || '').replace(/\/$/, '');
-const SUPABASE_ANON_KEY = import.meta.env.VITE_SUPABASE_ANON_KEY || '';
+const API_BASE_URL = (import.meta.env.VITE_API_BASE_URL || '').replace(/\/$/, '');
+
+// Lets the backend recognise repeat submissions from this browser (see report_ingest.py)
+const getDeviceId = () => {
+  let id = localStorage.getItem('deviceId');
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem('deviceId', id);
+  }
+  return id;
+};
+
+const postReport = (payload: Record<string, string>) =>
+  fetch(`${API_BASE_URL}/api/reports`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Device-Id': getDeviceId(),
+    },
+    body: JSON.stringify(payload),
+  });
 
 const normalizeLocations = (data: unknown): Location[] => {
   if (Array.isArray(data)) return data as Location[];
@@ -36,6 +55,9 @@ export default function ReportPage() {
   const [locationType, setLocationType] = useState<'purok' | 'landmark' | 'street' | 'establishment'>('purok');
   const [locationName, setLocationName] = useState('');
 
+  // Outage report state (shares the city/barangay selection)
+  const [outageMessage, setOutageMessage] = useState('');
+
   // Suggestion state
   const [suggestionText, setSuggestionText] = useState('');
 
@@ -81,18 +103,9 @@ export default function ReportPage() {
         barangay: selectedBarangayName,
         location_type: locationType,
         location_name: locationName.trim(),
-        created_at: new Date().toISOString(),
       };
-      const res = await fetch(`${SUPABASE_URL}/rest/v1/community_reports`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          apikey: SUPABASE_ANON_KEY,
-          Authorization: `Bearer ${SUPABASE_ANON_KEY}`,
-        },
-        body: JSON.stringify(payload),
-      });
-      if (res.ok || res.status === 201) {
+      const res = await postReport(payload);
+      if (res.ok) {
         setSubmitted(true);
         setLocationName('');
         setTimeout(() => setSubmitted(false), 3000);
@@ -104,6 +117,30 @@ export default function ReportPage() {
     }
   };
 
+  // Counted in the live outage heatmap (see report_heatmap.py); the message is optional
+  const handleSubmitOutage = async () => {
+    if (!selectedCity || !selectedBarangay) return;
+    setSubmitting(true);
+    try {
+      const payload: Record<string, string> = {
+        type: 'outage_report',
+        municipality: selectedCityName,
+        barangay: selectedBarangayName,
+      };
+      if (outageMessage.trim()) payload.message = outageMessage.trim();
+      const res = await postReport(payload);
+      if (res.ok) {
+        setSubmitted(true);
+        setOutageMessage('');
+        setTimeout(() => setSubmitted(false), 3000);
+      }
+    } catch {
+      // silently fail — user can retry
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
   const handleSubmitSuggestion = async () => {
     if (!suggestionText.trim()) return;
     setSubmitting(true);
@@ -111,18 +148,9 @@ export default function ReportPage() {
       const payload = {
         type: 'suggestion',
         message: suggestionText.trim(),
-        created_at: new Date().toISOString(),
       };
-      const res = await fetch(`${SUPABASE_URL}/rest/v1/community_reports`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-          apikey: SUPABASE_ANON_KEY,
-          Authorization: `Bearer ${SUPABASE_ANON_KEY}`,
-        },
-        body: JSON.stringify(payload),
-      });
-      if (res.ok || res.status === 201) {
+      const res = await postReport(payload);
+      if (res.ok) {
         setSubmitted(true);
         setSuggestionText('');
         setTimeout(() => setSubmitted(false), 3000);
@@ -298,7 +326,52 @@ export default function ReportPage() {
             {activeTab === 'issue' && (
               <div className="space-y-5">
                 <p className={`text-sm ${mutedTextClass}`}>
-                  Experiencing an unscheduled brownout or power issue? Contact ZANECO directly for fastest response.
+                  No power right now? Let your neighbors know. Reports show up live on the checker for your barangay.
+                </p>
+
+                <div className="grid grid-cols-1 sm:grid-cols-2 gap-3">
+                  <select value={selectedCity} onChange={(e) => handleCityChange(e.target.value)} className={fieldClass}>
+                    <option value="">Select a city</option>
+                    {locations.map((loc) => (
+                      <option key={loc.code} value={loc.code} className={isLightMode ? 'bg-white text-slate-800' : 'bg-gray-900'}>{loc.name}</option>
+                    ))}
+                  </select>
+                  <select
+                    value={selectedBarangay}
+                    onChange={(e) => setSelectedBarangay(e.target.value)}
+                    disabled={!selectedCity}
+                    className={`${fieldClass} disabled:opacity-50 disabled:cursor-not-allowed`}
+                  >
+                    <option value="">Select a barangay</option>
+                    {availableBarangays.map((b) => (
+                      <option key={b.code} value={b.code} className={isLightMode ? 'bg-white text-slate-800' : 'bg-gray-900'}>{b.name}</option>
+                    ))}
+                  </select>
+                </div>
+
+                <input
+                  type="text"
+                  value={outageMessage}
+                  onChange={(e) => setOutageMessage(e.target.value)}
+                  placeholder="Optional, e.g., No power since 8AM in Purok 3"
+                  className={fieldClass}
+                />
+
+                <button
+                  onClick={handleSubmitOutage}
+                  disabled={submitting || !selectedCity || !selectedBarangay}
+                  className={`w-full flex items-center justify-center gap-2 py-3 rounded-xl font-semibold text-sm transition-colors disabled:opacity-50 disabled:cursor-not-allowed ${
+                    isLightMode
+                      ? 'bg-cyan-500 hover:bg-cyan-600 text-white'
+                      : 'bg-yellow-400 hover:bg-yellow-300 text-black'
+                  }`}
+                >
+                  <ZapOff className="w-4 h-4" />
+                  {submitting ? 'Submitting...' : 'Report No Power'}
+                </button>
+
+                <p className={`text-sm ${mutedTextClass}`}>
+                  This does not notify ZANECO. Contact ZANECO directly for fastest response.
                 </p>
 
                 <div className={`rounded-xl p-5 space-y-4 ${isLightMode ? 'bg-amber-50 border border-amber-200' : 'bg-white/5 border border-white/10'}`}>
@@ -0,0 +1,199 @@
+"""
+Gemini token and request accounting, with a per-run budget.
+
+safe_generate() reports every successful call's usage metadata here,
+tagged with the model and the notice it was for. That gives per-model and
+per-notice totals for the run, and a budget level the scraper uses to
+degrade gracefully before the daily quota turns into 429s:
+
+    level      used / GEMINI_RUN_TOKEN_BUDGET   what changes
+    normal     < 60%                            nothing
+    compact    >= 60%                           no barangay-details context, images max 1280px
+    cheap      >= 80%                           also cheapest model first, images max 1024px
+    exhausted  >= 100%                          remaining (older) notices are deferred to the next run
+
+At the end of a run, finish_run() prints the report (cost per notice and
+per model) and persists the run summary: appended to GEMINI_USAGE_FILE
+(JSON lines) and inserted into the gemini_usage_runs table when it exists
+(migrations/002_gemini_usage_runs.sql).
+
+    python gemini_usage.py [gemini_usage.jsonl]   # history of persisted runs
+"""
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+RUN_TOKEN_BUDGET = int(os.getenv("GEMINI_RUN_TOKEN_BUDGET", "0"))  # 0 = unlimited
+USAGE_FILE = os.getenv("GEMINI_USAGE_FILE", "gemini_usage.jsonl")
+# Optional '{"model": [input USD per 1M tokens, output USD per 1M tokens], ...}' for cost estimates
+PRICES = json.loads(os.getenv("GEMINI_PRICES_PER_MTOK", "{}"))
+
+LEVELS = ((1.0, "exhausted"), (0.8, "cheap"), (0.6, "compact"))
+# Longest image side sent to the model per level (None = as downloaded)
+MAX_IMAGE_SIDE = {"normal": None, "compact": 1280, "cheap": 1024, "exhausted": 1024}
+
+_lock = threading.Lock()
+_run = None
+
+
+def _empty_bucket() -> dict:
+    return {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+def start_run():
+    """Reset the per-run counters (called at the start of a scrape run)."""
+    global _run
+    with _lock:
+        _run = {
+            "started_at": datetime.utcnow().isoformat(),
+            "budget": RUN_TOKEN_BUDGET,
+            "totals": _empty_bucket(),
+            "models": {},
+            "notices": {},
+            "degraded": {},
+            "deferred_notices": 0,
+        }
+
+
+def _add(bucket: dict, prompt: int, output: int, total: int):
+    bucket["calls"] += 1
+    bucket["prompt_tokens"] += prompt
+    bucket["output_tokens"] += output
+    bucket["total_tokens"] += total
+
+
+def record_call(model: str, usage, notice_url: str = None) -> dict:
+    """
+    Account one successful generate_content call. `usage` is the
+    response's usage_metadata (may be None). Returns the token counts.
+    """
+    prompt = getattr(usage, "prompt_token_count", None) or 0
+    output = getattr(usage, "candidates_token_count", None) or 0
+    total = getattr(usage, "total_token_count", None) or prompt + output
+    counts = {"prompt_tokens": prompt, "output_tokens": output, "total_tokens": total}
+    with _lock:
+        if _run is None:
+            return counts
+        _add(_run["totals"], prompt, output, total)
+        _add(_run["models"].setdefault(model, _empty_bucket()), prompt, output, total)
+        if notice_url:
+            _add(_run["notices"].setdefault(notice_url, _empty_bucket()), prompt, output, total)
+    return counts
+
+
+def budget_level() -> str:
+    """Current degradation level for this run (see module docstring)."""
+    with _lock:
+        if _run is None or RUN_TOKEN_BUDGET <= 0:
+            return "normal"
+        used = _run["totals"]["total_tokens"] / RUN_TOKEN_BUDGET
+    for threshold, level in LEVELS:
+        if used >= threshold:
+            return level
+    return "normal"
+
+
+def note_degraded(level: str):
+    """Count work done at a degraded level (shown in the report)."""
+    with _lock:
+        if _run is not None and level != "normal":
+            _run["degraded"][level] = _run["degraded"].get(level, 0) + 1
+
+
+def note_deferred():
+    with _lock:
+        if _run is not None:
+            _run["deferred_notices"] += 1
+
+
+def estimate_cost(model: str, bucket: dict):
+    """USD estimate from GEMINI_PRICES_PER_MTOK, or None if the model has no price."""
+    price = PRICES.get(model)
+    if not price:
+        return None
+    return round((bucket["prompt_tokens"] * price[0] + bucket["output_tokens"] * price[1]) / 1_000_000, 6)
+
+
+def summary() -> dict:
+    with _lock:
+        if _run is None:
+            return {}
+        run = json.loads(json.dumps(_run))
+    costs = [estimate_cost(m, b) for m, b in run["models"].items()]
+    run["estimated_cost_usd"] = round(sum(costs), 6) if costs and None not in costs else None
+    run["budget_used"] = round(run["totals"]["total_tokens"] / run["budget"], 3) if run["budget"] else None
+    return run
+
+
+def print_report(run: dict = None):
+    run = run or summary()
+    if not run or not run["totals"]["calls"]:
+        return
+    t = run["totals"]
+    budget = f" of {run['budget']} budget ({run['budget_used']:.0%})" if run["budget"] else ""
+    print(f"\nGemini usage: {t['calls']} calls, {t['total_tokens']} tokens{budget}")
+    print(f"  {'model':<32} {'calls':>6} {'prompt':>10} {'output':>9} {'total':>10} {'est. USD':>9}")
+    for model, b in run["models"].items():
+        cost = estimate_cost(model, b)
+        print(f"  {model:<32} {b['calls']:>6} {b['prompt_tokens']:>10} {b['output_tokens']:>9} "
+              f"{b['total_tokens']:>10} {cost if cost is not None else '-':>9}")
+    notices = run["notices"]
+    if notices:
+        per_notice = sorted(notices.items(), key=lambda kv: -kv[1]["total_tokens"])
+        avg = sum(b["total_tokens"] for b in notices.values()) / len(notices)
+        print(f"  Cost per notice: {avg:.0f} tokens on average over {len(notices)} notice(s); most expensive:")
+        for url, b in per_notice[:5]:
+            print(f"    {b['total_tokens']:>8} tokens, {b['calls']} call(s)  {url}")
+    if run["degraded"] or run["deferred_notices"]:
+        print(f"  Budget degradation: {run['degraded']}, {run['deferred_notices']} notice(s) deferred")
+
+
+def finish_run() -> dict:
+    """Print the report and persist the run summary. Returns it."""
+    run = summary()
+    if not run:
+        return run
+    run["finished_at"] = datetime.utcnow().isoformat()
+    print_report(run)
+    if not run["totals"]["calls"]:
+        return run
+
+    try:
+        with open(USAGE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+    except OSError as e:
+        print(f"  Note: Could not write {USAGE_FILE} ({e})")
+    try:
+        from supabase_client import run_query
+
+        row = {
+            "started_at": run["started_at"],
+            "finished_at": run["finished_at"],
+            "calls": run["totals"]["calls"],
+            "prompt_tokens": run["totals"]["prompt_tokens"],
+            "output_tokens": run["totals"]["output_tokens"],
+            "total_tokens": run["totals"]["total_tokens"],
+            "budget": run["budget"] or None,
+            "deferred_notices": run["deferred_notices"],
+            "details": {k: run[k] for k in ("models", "notices", "degraded", "estimated_cost_usd")},
+        }
+        run_query("gemini_usage_runs", "insert", lambda t: t.insert(row))
+    except Exception as e:
+        # Non-critical — the table may not exist yet
+        print(f"  Note: Could not save Gemini usage ({e})")
+    return run
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else USAGE_FILE
+    with open(path, "r", encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    print(f"{'started':<20} {'calls':>6} {'tokens':>10} {'budget':>7} {'notices':>8} {'tok/notice':>11} {'deferred':>9}")
+    for r in runs:
+        n = len(r["notices"])
+        per = r["totals"]["total_tokens"] / n if n else 0
+        used = f"{r['budget_used']:.0%}" if r.get("budget_used") is not None else "-"
+        print(f"{r['started_at'][:19]:<20} {r['totals']['calls']:>6} {r['totals']['total_tokens']:>10} "
+              f"{used:>7} {n:>8} {per:>11.0f} {r['deferred_notices']:>9}")
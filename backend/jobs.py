@@ -0,0 +1,346 @@
+"""
+Background scrape jobs.
+
+/api/notices used to run the whole scrape → save → cleanup pipeline inside
+the HTTP request, which regularly outlived gunicorn's worker timeout. Now
+the endpoint only enqueues a job here and a worker thread runs it.
+
+Jobs live in a small SQLite file so they survive a worker restart: a job
+left "running" by a dead process is put back in the queue once its
+heartbeat goes stale. The heartbeat is refreshed by its own thread while
+the job runs, so a quiet stage (Gemini backoff, a long cleanup) doesn't
+look like a dead process.
+
+Triggers are single-flight: while a scrape is queued or running, new
+requests share that job, and within the cooldown window after a finished
+run the caller gets the last run's summary instead of a new run. The same
+file also holds named trigger leases (used for the GitHub workflow
+dispatch) with the same in-progress/cooldown semantics.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+JOBS_DB_FILE = Path(os.getenv("SCRAPE_JOBS_DB", "scrape_jobs.sqlite3"))
+# A running job whose heartbeat is older than this is assumed orphaned
+JOB_STALE_SECONDS = int(os.getenv("SCRAPE_JOB_STALE_SECONDS", "900"))
+WORKER_POLL_SECONDS = float(os.getenv("SCRAPE_WORKER_POLL_SECONDS", "30"))
+# How often a running job's heartbeat is refreshed; well under JOB_STALE_SECONDS
+HEARTBEAT_SECONDS = float(os.getenv("SCRAPE_JOB_HEARTBEAT_SECONDS", str(min(60, JOB_STALE_SECONDS / 5))))
+# After a successful run, new triggers within this window reuse its summary
+SCRAPE_COOLDOWN_SECONDS = int(os.getenv("SCRAPE_COOLDOWN_SECONDS", "600"))
+
+_worker_thread = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+@contextmanager
+def _connect():
+    conn = sqlite3.connect(JOBS_DB_FILE, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat_at REAL,
+            progress TEXT NOT NULL DEFAULT '{}',
+            result TEXT,
+            error TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trigger_leases (
+            name TEXT PRIMARY KEY,
+            leased_until REAL NOT NULL DEFAULT 0,
+            last_run_at REAL,
+            summary TEXT
+        )
+        """
+    )
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _row_to_job(row) -> dict:
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+        "progress": json.loads(row["progress"] or "{}"),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+    }
+
+
+# ==============================
+# Queue operations
+# ==============================
+
+def enqueue_job(kind: str = "scrape", cooldown_seconds: int = None):
+    """
+    Single-flight enqueue. Returns (job, outcome) where outcome is:
+    - "queued": a new job was added and the worker woken
+    - "in_progress": a job of this kind is already queued/running; it is returned
+    - "cooldown": the last successful job finished within the cooldown window;
+      it is returned (with its result) instead of starting a new run
+    """
+    if cooldown_seconds is None:
+        cooldown_seconds = SCRAPE_COOLDOWN_SECONDS
+    with _connect() as conn:
+        # BEGIN IMMEDIATE takes the database write lock, so concurrent
+        # triggers (threads or gunicorn workers) serialize here.
+        conn.execute("BEGIN IMMEDIATE")
+        active = conn.execute(
+            "SELECT * FROM jobs WHERE kind = ? AND status IN ('queued', 'running') "
+            "AND (status = 'queued' OR heartbeat_at >= ?) ORDER BY created_at LIMIT 1",
+            (kind, time.time() - JOB_STALE_SECONDS),
+        ).fetchone()
+        if active:
+            conn.execute("COMMIT")
+            return _row_to_job(active), "in_progress"
+
+        if cooldown_seconds > 0:
+            cutoff = datetime.utcfromtimestamp(time.time() - cooldown_seconds).isoformat()
+            recent = conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = 'succeeded' AND finished_at >= ? "
+                "ORDER BY finished_at DESC LIMIT 1",
+                (kind, cutoff),
+            ).fetchone()
+            if recent:
+                conn.execute("COMMIT")
+                return _row_to_job(recent), "cooldown"
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, created_at) VALUES (?, ?, 'queued', ?)",
+            (job_id, kind, _now()),
+        )
+        conn.execute("COMMIT")
+    _wake.set()
+    return get_job(job_id), "queued"
+
+
+def get_job(job_id: str):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def update_progress(job_id: str, **counts):
+    """Merge counters into the job's progress and refresh its heartbeat."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        progress = json.loads(row["progress"] or "{}") if row else {}
+        progress.update(counts)
+        conn.execute(
+            "UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+            (json.dumps(progress), time.time(), job_id),
+        )
+        conn.execute("COMMIT")
+
+
+def _heartbeat(job_id: str, stop: threading.Event):
+    """Refresh the job's heartbeat every HEARTBEAT_SECONDS until `stop` is set."""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            with _connect() as conn:
+                conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+        except Exception as e:
+            # A missed beat is fine; JOB_STALE_SECONDS spans several
+            print(f"  Note: Could not refresh heartbeat for job {job_id} ({e})")
+
+
+def _claim_next_job():
+    """
+    Atomically move the oldest queued job to running. Stale running jobs
+    (process died mid-run) are requeued first. Safe across processes.
+    """
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND heartbeat_at < ?",
+            (time.time() - JOB_STALE_SECONDS,),
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?",
+            (_now(), time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    return get_job(row["id"])
+
+
+def _finish_job(job_id: str, result: dict = None, error: str = None):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?",
+            (
+                "failed" if error else "succeeded",
+                _now(),
+                json.dumps(result) if result is not None else None,
+                error,
+                job_id,
+            ),
+        )
+
+
+# ==============================
+# Trigger leases
+# ==============================
+
+def acquire_trigger(name: str, cooldown_seconds: int, lease_seconds: int = 60):
+    """
+    Single-flight guard for an external trigger (e.g. a workflow dispatch).
+    Returns (acquired, outcome, last_summary):
+    - (True, "acquired", None): caller should run it, then call release_trigger()
+    - (False, "in_progress", summary): another caller holds the lease
+    - (False, "cooldown", summary): it last ran within cooldown_seconds
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM trigger_leases WHERE name = ?", (name,)).fetchone()
+        summary = json.loads(row["summary"]) if row and row["summary"] else None
+        if row and row["leased_until"] > now:
+            conn.execute("COMMIT")
+            return False, "in_progress", summary
+        if row and row["last_run_at"] and now - row["last_run_at"] < cooldown_seconds:
+            conn.execute("COMMIT")
+            return False, "cooldown", summary
+        conn.execute(
+            "INSERT INTO trigger_leases (name, leased_until) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET leased_until = excluded.leased_until",
+            (name, now + lease_seconds),
+        )
+        conn.execute("COMMIT")
+    return True, "acquired", None
+
+
+def release_trigger(name: str, summary: dict = None):
+    """
+    Release a lease taken by acquire_trigger(). Pass the run's summary on
+    success to start the cooldown; pass None on failure so the next caller
+    may retry immediately.
+    """
+    with _connect() as conn:
+        if summary is None:
+            conn.execute("UPDATE trigger_leases SET leased_until = 0 WHERE name = ?", (name,))
+        else:
+            conn.execute(
+                "UPDATE trigger_leases SET leased_until = 0, last_run_at = ?, summary = ? WHERE name = ?",
+                (time.time(), json.dumps(summary), name),
+            )
+
+
+# ==============================
+# Pipeline
+# ==============================
+
+def run_scrape_pipeline(progress=None) -> dict:
+    """Scrape → save → notify → revalidate → cleanup → reconcile. `progress(**counts)` receives live counters."""
+    # Imported here so the API process only loads the scraper when a job runs
+    from logic import get_notices, revalidate_notices
+    from db import save_notices_to_supabase, delete_old_notices
+    import gemini_usage
+    import notify
+    import outage_index
+    import outage_stats
+    import reconcile
+
+    report = progress or (lambda **counts: None)
+    gemini_usage.start_run()
+    try:
+        notices = get_notices(progress=report)
+        result = save_notices_to_supabase(notices)
+        report(saved=result["inserted"])
+        notified = notify.fan_out(notices)
+        report(notified=notified.get("ok", 0))
+        revalidated = revalidate_notices(skip_urls={n["url"] for n in notices}, progress=report)
+        deleted = delete_old_notices()
+        report(deleted=deleted)
+        reconciled = reconcile.run()
+    finally:
+        usage = gemini_usage.finish_run()
+    # Point-in-time lookups should see the new/updated notices right away
+    outage_index.invalidate()
+    outage_stats.invalidate()
+    return {
+        "notices": len(notices),
+        "inserted": result["inserted"],
+        "revalidated": revalidated["updated"],
+        "notified": notified.get("ok", 0),
+        "deleted": deleted,
+        "schedules": reconciled.get("active", 0),
+        "gemini_tokens": usage["totals"]["total_tokens"],
+        "deferred": usage["deferred_notices"],
+    }
+
+
+def _run_job(job: dict):
+    job_id = job["id"]
+    print(f"Scrape job {job_id} started")
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), name="scrape-heartbeat", daemon=True).start()
+    try:
+        result = run_scrape_pipeline(progress=lambda **counts: update_progress(job_id, **counts))
+        _finish_job(job_id, result=result)
+        print(f"Scrape job {job_id} finished: {result}")
+    except Exception as e:
+        _finish_job(job_id, error=str(e))
+        print(f"Scrape job {job_id} failed: {e}")
+    finally:
+        stop.set()
+
+
+def _worker_loop():
+    while True:
+        try:
+            job = _claim_next_job()
+        except Exception as e:
+            print(f"Scrape worker could not read job queue: {e}")
+            job = None
+        if job:
+            _run_job(job)
+            continue
+        _wake.wait(WORKER_POLL_SECONDS)
+        _wake.clear()
+
+
+def start_worker():
+    """Start the background worker thread once per process."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_worker_loop, name="scrape-worker", daemon=True)
+            _worker_thread.start()
+    return _worker_thread
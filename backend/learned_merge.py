@@ -0,0 +1,294 @@
+"""
+Offline compiler: fold learned_locations into barangay_details.json.
+
+The scraper keeps saving purok/landmark → barangay mappings, and the same
+place piles up under several spellings ("Prk. Malayan", "Purok Malayan",
+"PRK MALAYAN"). This tool:
+
+1. groups learned rows (and the existing details entries) per
+   municipality, barangay and category,
+2. clusters near-duplicate names with a rapidfuzz similarity matrix
+   (process.cdist when numpy is installed, row-wise process.extract
+   otherwise),
+3. picks one canonical form per cluster — the existing details entry if
+   there is one, otherwise the most common learned spelling in the file's
+   "Prk. Name" style,
+4. adds clusters with at least one verified row to barangay_details.json,
+   in sorted order so reruns produce the same file.
+
+It prints a diff report and only writes with --write:
+
+    python learned_merge.py                    # dry run, report only
+    python learned_merge.py --write --diff     # merge and show the JSON diff
+    python learned_merge.py --input rows.json  # use an exported table instead of Supabase
+    python learned_merge.py --prune            # delete learned rows the deployed file already covers
+
+Run --prune only after the merged file is deployed: it removes
+learned_locations rows whose lookup key is already in the current file.
+"""
+import argparse
+import difflib
+import json
+import re
+import sys
+from collections import Counter
+
+import reference_index
+from reference_index import BARANGAY_DETAILS_FILE, SUB_LOCATION_CATEGORIES, normalize_key
+
+DEFAULT_THRESHOLD = 92
+
+CATEGORY_BY_TYPE = {
+    "purok": "puroks",
+    "landmark": "landmarks",
+    "street": "streets",
+    "establishment": "establishments",
+    "alias": "aliases",
+}
+
+_DIGITS_RE = re.compile(r'\d+')
+_PUROK_PREFIX_RE = re.compile(r'^\s*(?:purok|prk)\b\.?\s*', re.IGNORECASE)
+
+
+def fetch_learned_rows() -> list:
+    """All learned_locations rows (verified or not), paged past the PostgREST cap."""
+    from learned_sync import fetch_pages
+
+    return fetch_pages(
+        "learned_locations",
+        lambda t: t.select("id,municipality,barangay,location_type,location_name,verified").order("id"),
+    )
+
+
+def canonical_form(name: str, category: str) -> str:
+    """Display form for a new entry: trimmed, title-cased if shouting, "Prk. " for puroks."""
+    name = " ".join(name.split())
+    if category == "puroks":
+        name = _PUROK_PREFIX_RE.sub("", name)
+    if name.isupper() or name.islower():
+        name = name.title()
+    return f"Prk. {name}" if category == "puroks" else name
+
+
+def _similarity_pairs(keys: list, threshold: int):
+    """Yield (i, j) index pairs with similarity >= threshold."""
+    from rapidfuzz import fuzz, process
+
+    try:
+        matrix = process.cdist(keys, keys, scorer=fuzz.token_sort_ratio, score_cutoff=threshold, workers=-1)
+    except ImportError:
+        # rapidfuzz needs numpy for cdist; fall back to one row at a time
+        for i, key in enumerate(keys):
+            for _, _, j in process.extract(key, keys, scorer=fuzz.token_sort_ratio, score_cutoff=threshold, limit=None):
+                yield i, j
+        return
+    for i, j in zip(*matrix.nonzero()):
+        yield int(i), int(j)
+
+
+def cluster_names(keys: list, threshold: int = DEFAULT_THRESHOLD) -> list:
+    """
+    Group normalized keys into clusters of near-duplicates (union-find over
+    the similarity matrix). Keys with different numbers ("PRK 1" / "PRK 2")
+    never merge. Returns lists of indexes into `keys`, in a stable order.
+    """
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    digits = [_DIGITS_RE.findall(k) for k in keys]
+    for i, j in _similarity_pairs(keys, threshold):
+        if i != j and digits[i] == digits[j]:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+    clusters = {}
+    for i in range(len(keys)):
+        clusters.setdefault(find(i), []).append(i)
+    return [clusters[root] for root in sorted(clusters)]
+
+
+def _group_rows(rows: list, index: dict) -> tuple:
+    """{(muni, bgy, category): [row, ...]} for rows that name a known barangay, plus the rest."""
+    groups = {}
+    unknown = []
+    for r in rows:
+        muni = (r.get("municipality") or "").strip().upper()
+        bgy = (r.get("barangay") or "").strip().upper()
+        name = (r.get("location_name") or "").strip()
+        if not normalize_key(name):
+            continue
+        if bgy not in index["barangays_by_upper_name"].get(muni, {}):
+            unknown.append(r)
+            continue
+        category = CATEGORY_BY_TYPE.get(r.get("location_type"), "landmarks")
+        groups.setdefault((muni, bgy, category), []).append(r)
+    return groups, unknown
+
+
+def plan_merge(rows: list, details: dict, index: dict, threshold: int = DEFAULT_THRESHOLD) -> dict:
+    """
+    Work out what merging `rows` into `details` would change, without
+    touching either. Returns {"additions", "pending", "covered", "unknown"}.
+    """
+    groups, unknown = _group_rows(rows, index)
+    additions, pending, covered = [], [], []
+
+    for (muni, bgy, category) in sorted(groups):
+        existing = details.get(muni, {}).get(bgy, {}).get(category, [])
+
+        # One node per distinct key; existing entries first so they win ties
+        members = {}
+        for name in existing:
+            members.setdefault(normalize_key(name), {"existing": [], "rows": []})["existing"].append(name)
+        for r in groups[(muni, bgy, category)]:
+            members.setdefault(normalize_key(r["location_name"]), {"existing": [], "rows": []})["rows"].append(r)
+        keys = sorted(members, key=lambda k: (not members[k]["existing"], k))
+
+        for cluster in cluster_names(keys, threshold):
+            cluster_existing = [n for i in cluster for n in members[keys[i]]["existing"]]
+            cluster_rows = [r for i in cluster for r in members[keys[i]]["rows"]]
+            if not cluster_rows:
+                continue
+            spellings = Counter(" ".join(r["location_name"].split()) for r in cluster_rows)
+            entry = {
+                "municipality": muni,
+                "barangay": bgy,
+                "category": category,
+                "variants": sorted(spellings.items(), key=lambda kv: (-kv[1], kv[0])),
+                "row_ids": sorted(r["id"] for r in cluster_rows if r.get("id") is not None),
+            }
+            if cluster_existing:
+                existing_keys = {normalize_key(n) for n in cluster_existing}
+                entry["canonical"] = cluster_existing[0]
+                entry["exact_row_ids"] = sorted(
+                    r["id"] for r in cluster_rows
+                    if r.get("id") is not None and normalize_key(r["location_name"]) in existing_keys
+                )
+                covered.append(entry)
+            elif any(r.get("verified") for r in cluster_rows):
+                # Most common key, then its most common spelling (mixed case over all-caps)
+                key_counts = Counter(normalize_key(s) for s in spellings.elements())
+                best_key = min(key_counts, key=lambda k: (-key_counts[k], k))
+                best = min(
+                    (s for s in spellings if normalize_key(s) == best_key),
+                    key=lambda s: (-spellings[s], s.isupper(), s),
+                )
+                entry["canonical"] = canonical_form(best, category)
+                additions.append(entry)
+            else:
+                entry["canonical"] = canonical_form(entry["variants"][0][0], category)
+                pending.append(entry)
+
+    return {"additions": additions, "pending": pending, "covered": covered, "unknown": unknown}
+
+
+def apply_merge(details: dict, additions: list) -> dict:
+    """Copy of `details` with the planned additions appended (sorted) to their lists."""
+    merged = json.loads(json.dumps(details))
+    new_names = {}
+    for a in additions:
+        new_names.setdefault((a["municipality"], a["barangay"], a["category"]), set()).add(a["canonical"])
+    for (muni, bgy, category), names in sorted(new_names.items()):
+        bgy_entry = merged.setdefault(muni, {}).setdefault(bgy, {c: [] for c in SUB_LOCATION_CATEGORIES})
+        bgy_entry.setdefault(category, []).extend(sorted(names))
+    return merged
+
+
+def prune_covered(covered: list) -> int:
+    """Delete learned rows whose lookup key the current details file already has."""
+    from db import bump_learned_locations_version
+    from supabase_client import run_query
+
+    ids = sorted(i for c in covered for i in c["exact_row_ids"])
+    for start in range(0, len(ids), 200):
+        batch = ids[start:start + 200]
+        run_query("learned_locations", "delete", lambda t: t.delete().in_("id", batch))
+    if ids:
+        bump_learned_locations_version()
+    return len(ids)
+
+
+def print_report(plan: dict, rows: list):
+    print(f"Learned rows: {len(rows)}")
+    print(f"  New entries to merge (verified): {len(plan['additions'])}")
+    print(f"  Already covered by barangay_details.json: {len(plan['covered'])}")
+    print(f"  Pending verification: {len(plan['pending'])}")
+    print(f"  Unknown municipality/barangay: {len(plan['unknown'])}")
+
+    for title, entries in (("Merge", plan["additions"]), ("Pending", plan["pending"])):
+        if not entries:
+            continue
+        print(f"\n{title}:")
+        for e in entries:
+            variants = ", ".join(f"{v} x{n}" if n > 1 else v for v, n in e["variants"])
+            print(f"  + {e['municipality']} / {e['barangay']} / {e['category']}: {e['canonical']}  <- {variants}")
+    fuzzy = [c for c in plan["covered"] if len(c["exact_row_ids"]) < len(c["row_ids"])]
+    if fuzzy:
+        print("\nNear-duplicates of existing entries (review these learned rows):")
+        for c in fuzzy:
+            variants = ", ".join(v for v, _ in c["variants"])
+            print(f"  ~ {c['municipality']} / {c['barangay']} / {c['category']}: {c['canonical']}  ~ {variants}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="JSON list of learned_locations rows instead of querying Supabase")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD, help="similarity (0-100) to treat names as one place")
+    parser.add_argument("--write", action="store_true", help="write the merged barangay_details.json")
+    parser.add_argument("--diff", action="store_true", help="print a unified diff of barangay_details.json")
+    parser.add_argument("--report", help="also write the plan as JSON to this file")
+    parser.add_argument("--prune", action="store_true", help="delete learned rows already covered by the current file")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        rows = fetch_learned_rows()
+
+    index = reference_index.load_index()
+    details = index["barangay_details"]
+    plan = plan_merge(rows, details, index, args.threshold)
+    print_report(plan, rows)
+
+    before = json.dumps(details, indent=2, ensure_ascii=False)
+    after = json.dumps(apply_merge(details, plan["additions"]), indent=2, ensure_ascii=False)
+    if args.diff and before != after:
+        print()
+        sys.stdout.writelines(difflib.unified_diff(
+            before.splitlines(keepends=True), after.splitlines(keepends=True),
+            fromfile=f"a/{BARANGAY_DETAILS_FILE}", tofile=f"b/{BARANGAY_DETAILS_FILE}",
+        ))
+        print()
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2, ensure_ascii=False)
+        print(f"\nPlan written to {args.report}")
+
+    if args.write:
+        if before == after:
+            print(f"\n{BARANGAY_DETAILS_FILE} unchanged")
+        else:
+            with open(BARANGAY_DETAILS_FILE, "w", encoding="utf-8") as f:
+                f.write(after)
+            reference_index.compile_artifact()
+            print(f"\nMerged {len(plan['additions'])} entries into {BARANGAY_DETAILS_FILE}")
+    elif plan["additions"]:
+        print("\nDry run; pass --write to update barangay_details.json")
+
+    if args.prune:
+        print(f"\nPruned {prune_covered(plan['covered'])} learned rows already covered by {BARANGAY_DETAILS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
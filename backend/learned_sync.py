@@ -0,0 +1,146 @@
+"""
+Incremental sync of verified learned_locations.
+
+Instead of downloading every verified row on each refresh, keep a local
+snapshot ({id: row} plus an updated_at watermark) and ask Supabase only
+for what changed since the watermark:
+
+- rows with updated_at >= watermark: upserted into the snapshot when
+  verified, removed when unverified
+- learned_location_tombstones with deleted_at >= watermark: removed
+
+The snapshot is persisted to LEARNED_SNAPSHOT_FILE so a restart resumes
+from the watermark. Needs migrations/001_learned_locations_delta_sync.sql;
+until that is applied, sync() falls back to a full (paginated) reload.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from supabase_client import run_query
+
+SNAPSHOT_FILE = Path(os.getenv("LEARNED_SNAPSHOT_FILE", "learned_locations_snapshot.json"))
+# Re-read this much history before the watermark to cover rows whose
+# transaction committed after a later one was already seen.
+WATERMARK_OVERLAP = timedelta(seconds=int(os.getenv("LEARNED_SYNC_OVERLAP_SECONDS", "120")))
+PAGE_SIZE = 1000
+
+COLUMNS = "id,municipality,barangay,location_type,location_name,verified,updated_at"
+
+_lock = threading.Lock()
+_state = None  # {"watermark": iso str | None, "rows": {id: row}}
+_delta_supported = True
+
+
+def _load_snapshot() -> dict:
+    if SNAPSHOT_FILE.exists():
+        try:
+            with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {"watermark": data.get("watermark"), "rows": {int(k): v for k, v in data.get("rows", {}).items()}}
+        except Exception as e:
+            print(f"  Note: Ignoring unreadable learned locations snapshot ({e})")
+    return {"watermark": None, "rows": {}}
+
+
+def _save_snapshot(state: dict):
+    try:
+        tmp = SNAPSHOT_FILE.with_suffix(SNAPSHOT_FILE.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, SNAPSHOT_FILE)
+    except OSError as e:
+        print(f"  Note: Could not write learned locations snapshot ({e})")
+
+
+def fetch_pages(table: str, build) -> list:
+    """Fetch all rows for a query, PAGE_SIZE at a time (PostgREST caps responses)."""
+    rows = []
+    start = 0
+    while True:
+        res = run_query(table, "select", lambda t: build(t).range(start, start + PAGE_SIZE - 1))
+        page = res.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _full_reload() -> dict:
+    columns = COLUMNS if _delta_supported else COLUMNS.replace(",updated_at", "")
+    # With no verified rows there is no updated_at to take; the sync start
+    # (WATERMARK_OVERLAP absorbs clock skew) keeps the next sync a delta.
+    started = datetime.now(timezone.utc).isoformat() if _delta_supported else None
+    rows = fetch_pages(
+        "learned_locations",
+        lambda t: t.select(columns).eq("verified", True).order("id"),
+    )
+    watermark = max((r["updated_at"] for r in rows if r.get("updated_at")), default=started)
+    return {"watermark": watermark, "rows": {r["id"]: r for r in rows}}
+
+
+def _apply_delta(state: dict) -> int:
+    """Patch `state` in place with changes since its watermark. Returns rows changed."""
+    since = (datetime.fromisoformat(state["watermark"].replace("Z", "+00:00")) - WATERMARK_OVERLAP).isoformat()
+    changed = fetch_pages(
+        "learned_locations",
+        lambda t: t.select(COLUMNS).gte("updated_at", since).order("updated_at").order("id"),
+    )
+    tombstones = fetch_pages(
+        "learned_location_tombstones",
+        lambda t: t.select("learned_location_id,deleted_at").gte("deleted_at", since).order("deleted_at"),
+    )
+
+    rows = state["rows"]
+    watermark = state["watermark"]
+    n = 0
+    for r in changed:
+        if r.get("verified"):
+            if rows.get(r["id"]) != r:
+                rows[r["id"]] = r
+                n += 1
+        elif rows.pop(r["id"], None) is not None:
+            n += 1
+        watermark = max(watermark, r["updated_at"])
+    for t in tombstones:
+        if rows.pop(t["learned_location_id"], None) is not None:
+            n += 1
+        watermark = max(watermark, t["deleted_at"])
+    state["watermark"] = watermark
+    return n
+
+
+def sync() -> list:
+    """
+    Bring the verified-locations snapshot up to date and return its rows.
+    Cheap when nothing changed: two small delta queries.
+    """
+    global _state, _delta_supported
+    with _lock:
+        if _state is None:
+            _state = _load_snapshot()
+
+        try:
+            if _delta_supported and _state["watermark"]:
+                n = _apply_delta(_state)
+                if n:
+                    print(f"  Learned locations delta: {n} change(s), {len(_state['rows'])} verified")
+                    _save_snapshot(_state)
+            else:
+                _state = _full_reload()
+                _save_snapshot(_state)
+        except Exception as e:
+            if _delta_supported and ("updated_at" in str(e) or "tombstones" in str(e)):
+                # Migration not applied yet: fall back to full reloads for this process
+                print("  Note: learned_locations delta sync unavailable (run migrations/001); using full reloads")
+                _delta_supported = False
+                try:
+                    _state = _full_reload()
+                except Exception as e2:
+                    print(f"  Note: Could not fetch learned locations ({e2})")
+            else:
+                print(f"  Note: Could not sync learned locations ({e})")
+
+        return list(_state["rows"].values())
@@ -0,0 +1,243 @@
+"""
+Sub-location search: puroks, landmarks, streets and barangay names to
+(municipality, barangay) candidates.
+
+Residents often know their purok or a landmark ("Prk. Greenleaves",
+"Gaisano") but not the official barangay. The searchable names are
+every barangay, every sub-location in barangay_details.json, and every
+verified learned_location. They are kept in an in-memory trigram index,
+{trigram: {doc id}}, built from normalize_key() forms with each word
+padded ("  GAISANO "), so a query's word starts line up with the
+document's.
+
+search() works in three steps:
+
+1. Candidates: collect the documents sharing trigrams with the query and
+   keep the SEARCH_CANDIDATES with the most shared trigrams. The last
+   query word is treated as a prefix (no trailing-space trigram), so
+   "gais" finds "Gaisano" as the user types.
+2. Refinement: re-score those candidates with rapidfuzz, taking the best
+   of a full and a prefix comparison, plus a bonus when a word starts
+   with the query.
+3. Grouping: group per barangay, keeping the best score and the names
+   that matched.
+
+The reference part of the index is rebuilt when reference_data reloads
+the compiled index. Verified learned locations are applied as a diff
+against the last version seen, so verifying or removing one location
+only touches that location's postings.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+import reference_data
+from reference_index import SUB_LOCATION_CATEGORIES, normalize_key
+
+SEARCH_CANDIDATES = int(os.getenv("LOCATION_SEARCH_CANDIDATES", "60"))
+MIN_QUERY_LENGTH = 2
+MIN_SCORE = 55
+
+_lock = threading.Lock()
+_state = {
+    "docs": {},          # doc id -> {"key", "name", "kind", "municipality", "barangay"}
+    "postings": {},      # trigram -> set of doc ids
+    "next_id": 0,
+    "reference": None,   # compiled reference index the reference docs came from
+    "reference_ids": set(),
+    "learned": {},       # learned_locations id -> (signature, doc id)
+    "verified": None,    # verified rows list the learned docs were diffed against
+}
+
+
+def trigrams(key: str, prefix: bool = False) -> set:
+    """Trigrams of a normalized key, each word padded; with prefix=True the last word stays open-ended."""
+    grams = set()
+    words = key.split()
+    for i, word in enumerate(words):
+        padded = f"  {word}" if prefix and i == len(words) - 1 else f"  {word} "
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+def _add(doc: dict) -> int:
+    doc_id = _state["next_id"]
+    _state["next_id"] += 1
+    _state["docs"][doc_id] = doc
+    for gram in trigrams(doc["key"]):
+        _state["postings"].setdefault(gram, set()).add(doc_id)
+    return doc_id
+
+
+def _remove(doc_id: int):
+    doc = _state["docs"].pop(doc_id, None)
+    if doc is None:
+        return
+    for gram in trigrams(doc["key"]):
+        ids = _state["postings"].get(gram)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del _state["postings"][gram]
+
+
+def _reference_docs(index: dict):
+    for muni in index["reference_json"]:
+        for bgy in muni["barangays"]:
+            yield {"name": bgy["name"], "kind": "barangay", "municipality": muni, "barangay": bgy}
+    for muni_name, bgys in index["barangay_details"].items():
+        muni = index["municipalities"].get(muni_name)
+        if muni is None or not isinstance(bgys, dict):
+            continue
+        by_name = index["barangays_by_upper_name"][muni_name]
+        for bgy_name, details in bgys.items():
+            bgy = by_name.get(bgy_name.upper())
+            if bgy is None:
+                continue
+            for category in SUB_LOCATION_CATEGORIES:
+                for name in details.get(category, []):
+                    yield {"name": name, "kind": category.rstrip("s") if category != "aliases" else "alias",
+                           "municipality": muni, "barangay": bgy}
+
+
+def _learned_doc(row: dict, index: dict, muni_names: dict):
+    muni_name = muni_names.get((row.get("municipality") or "").strip().upper())
+    if muni_name is None:
+        return None
+    bgy = index["barangays_by_upper_name"][muni_name].get((row.get("barangay") or "").strip().upper())
+    if bgy is None or not row.get("location_name"):
+        return None
+    return {"name": row["location_name"], "kind": row.get("location_type") or "location",
+            "municipality": index["municipalities"][muni_name], "barangay": bgy}
+
+
+def refresh(index: dict = None, verified: list = None):
+    """Bring the index up to date with the reference data and verified learned locations."""
+    index = index if index is not None else reference_data.get_index()
+    if verified is None:
+        try:
+            verified = reference_data.get_verified_locations()
+        except Exception as e:
+            # Search still works on the reference data alone
+            print(f"  Note: Could not load verified locations for search ({e})")
+            verified = _state["verified"]
+    if _state["reference"] is index and _state["verified"] is verified:
+        return
+    with _lock:
+        if _state["reference"] is not index:
+            for doc_id in _state["reference_ids"]:
+                _remove(doc_id)
+            _state["reference_ids"] = set()
+            for doc in _reference_docs(index):
+                doc["key"] = normalize_key(doc["name"])
+                if doc["key"]:
+                    _state["reference_ids"].add(_add(doc))
+            # Learned docs resolve names against the reference; rebuild them too
+            for _, doc_id in _state["learned"].values():
+                _remove(doc_id)
+            _state["learned"] = {}
+            _state["reference"] = index
+
+        muni_names = {name.upper(): name for name in index["municipality_names"]}
+        seen = set()
+        for row in verified or []:
+            seen.add(row["id"])
+            signature = (row.get("municipality"), row.get("barangay"), row.get("location_type"), row.get("location_name"))
+            current = _state["learned"].get(row["id"])
+            if current is not None and current[0] == signature:
+                continue
+            if current is not None:
+                _remove(current[1])
+                del _state["learned"][row["id"]]
+            doc = _learned_doc(row, index, muni_names)
+            if doc is not None:
+                doc["key"] = normalize_key(doc["name"])
+                if doc["key"]:
+                    _state["learned"][row["id"]] = (signature, _add(doc))
+        for learned_id in [i for i in _state["learned"] if i not in seen]:
+            _remove(_state["learned"].pop(learned_id)[1])
+        _state["verified"] = verified
+
+
+def _refine(query: str, key: str) -> float:
+    from rapidfuzz import fuzz
+
+    # "PRK" alone makes every purok look similar; compare the names after it
+    if query.startswith("PRK ") and key.startswith("PRK "):
+        query, key = query[4:], key[4:]
+    score = max(fuzz.ratio(query, key), fuzz.partial_ratio(query, key) * 0.9)
+    if key.startswith(query) or f" {query}" in key:
+        score = max(score, 90 + 10 * len(query) / len(key))
+    return score
+
+
+def search(query: str, limit: int = 10, municipality: str = None) -> list:
+    """
+    Ranked [{"municipality": {"code", "name"}, "barangay": {"code", "name"}, "score", "matches": [{"name", "kind"}]}].
+    `municipality` (name or PSGC code) restricts the results.
+    """
+    key = normalize_key(query or "")
+    if len(key.replace(" ", "")) < MIN_QUERY_LENGTH:
+        return []
+    refresh()
+    grams = trigrams(key, prefix=True)
+    wanted = municipality.strip().upper() if municipality else None
+    with _lock:
+        docs = _state["docs"]
+        shared = Counter()
+        for gram in grams:
+            for doc_id in _state["postings"].get(gram, ()):
+                shared[doc_id] += 1
+        candidates = []
+        for doc_id, _ in shared.most_common():
+            doc = docs[doc_id]
+            if wanted and wanted not in (doc["municipality"]["code"], doc["municipality"]["name"].upper()):
+                continue
+            candidates.append(doc)
+            if len(candidates) >= SEARCH_CANDIDATES:
+                break
+
+    by_barangay = {}
+    for doc in candidates:
+        score = _refine(key, doc["key"])
+        if score < MIN_SCORE:
+            continue
+        group = by_barangay.setdefault(doc["barangay"]["code"], {
+            "municipality": {"code": doc["municipality"]["code"], "name": doc["municipality"]["name"]},
+            "barangay": {"code": doc["barangay"]["code"], "name": doc["barangay"]["name"]},
+            "score": 0.0,
+            "matches": [],
+        })
+        group["score"] = max(group["score"], round(score, 1))
+        if all(m["name"] != doc["name"] for m in group["matches"]):
+            group["matches"].append({"name": doc["name"], "kind": doc["kind"], "score": round(score, 1)})
+
+    results = sorted(by_barangay.values(), key=lambda g: (-g["score"], g["municipality"]["name"], g["barangay"]["name"]))
+    for group in results[:limit]:
+        # Only the names that explain the match, not every purok sharing "PRK"
+        group["matches"] = sorted(
+            (m for m in group["matches"] if m["score"] >= group["score"] - 10), key=lambda m: -m["score"]
+        )[:3]
+    return results[:limit]
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {
+            "documents": len(_state["docs"]),
+            "trigrams": len(_state["postings"]),
+            "learned": len(_state["learned"]),
+        }
+
+
+if __name__ == "__main__":
+    import sys
+
+    for q in sys.argv[1:] or ["Gaisano"]:
+        start = time.perf_counter()
+        found = search(q)
+        print(f"{q!r}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        for r in found:
+            print(f"  {r['score']:5.1f}  {r['barangay']['name']}, {r['municipality']['name']}  "
+                  + "; ".join(f"{m['name']} ({m['kind']})" for m in r["matches"]))
@@ -1,22 +1,32 @@
-from google import genai
+import hashlib
 import json
 import re
+import threading
 import requests
 from io import BytesIO
-from PIL import Image
-from rapidfuzz import process
 from pathlib import Path
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin 
 import time
-from google.genai import errors as genai_errors
+from collections import Counter
 from datetime import datetime, date, timedelta
 import os
 from dotenv import load_dotenv
-from db import get_processed_urls, save_learned_locations, get_verified_learned_locations
+from db import get_active_notices, get_processed_urls, save_learned_locations, update_notice
+from tracing import span, record
+import reference_index
+import reference_data
+import text_extract
+import gemini_usage
+import outage_index
+from notice_schema import NOTICE_RESPONSE_SCHEMA, parse_notices
+from reference_index import normalize_key
 
 load_dotenv()  # load .env file here too (for GEMINI_API_KEY)
 
+# Heavy dependencies (google.genai, PIL, BeautifulSoup, rapidfuzz) and the
+# reference JSON files are loaded on first use, not at import, so processes
+# that only need a few helpers (API workers, admin endpoints) start fast.
+
 # ==============================
 # Your scraper + OCR + Gemini code
 # ==============================
@@ -24,19 +34,25 @@ load_dotenv()  # load .env file here too (for GEMINI_API_KEY)
 USER_AGENT = "ZNBrownoutChecker-Bot/1.0 (contact: dinopol.ianjay@gmail.com)"
 REQUEST_HEADERS = {"User-Agent": USER_AGENT}
 
-ZANECO_BASE = "https://zaneco.ph"
+# Overridable so the replay harness (benchmarks/replay_pipeline.py) can point at a local site
+ZANECO_BASE = os.getenv("ZANECO_BASE_URL", "https://zaneco.ph").rstrip("/")
 CATEGORY_URL = f"{ZANECO_BASE}/category/power-interruption-update/"
 
+# Re-check already-saved active notices for edits (title, images, text) on each run
+REVALIDATE_NOTICES = os.getenv("SCRAPER_REVALIDATE_NOTICES", "true").lower() == "true"
 
-def extract_notice_date_from_text(text: str):
+# Parse schedules from post text when possible instead of sending every image to Gemini
+TEXT_FAST_PATH = os.getenv("SCRAPER_TEXT_FAST_PATH", "true").lower() == "true"
+
+
+def extract_notice_dates_from_text(text: str) -> set:
     """
-    Extract the LATEST schedule date from title/URL text such as:
+    Every schedule date in title/URL text such as:
     - APRIL-10-2026
     - April 10, 2026
     - April 15 & 16, 2026
     - april-15-16-2026
     - april_10_2026
-    Returns a date or None when no reliable date is found.
     """
     month_names = (
         "january|february|march|april|may|june|july|august|"
@@ -44,7 +60,7 @@ def extract_notice_date_from_text(text: str):
     )
     normalized = text.lower().replace("_", "-")
 
-    latest = None
+    found = set()
 
     # Match: month + one or more days (separated by &, commas, dashes) + 4-digit year
     # Handles "April 15 & 16, 2026", "april-15-16-2026", "April 10, 2026", etc.
@@ -59,13 +75,16 @@ def extract_notice_date_from_text(text: str):
         for day_str in days:
             day = int(day_str)
             try:
-                d = datetime.strptime(f"{month_name} {day} {year}", "%B %d %Y").date()
-                if latest is None or d > latest:
-                    latest = d
+                found.add(datetime.strptime(f"{month_name} {day} {year}", "%B %d %Y").date())
             except Exception:
                 continue
 
-    return latest
+    return found
+
+
+def extract_notice_date_from_text(text: str):
+    """The LATEST schedule date in title/URL text, or None when no reliable date is found."""
+    return max(extract_notice_dates_from_text(text), default=None)
 
 def parse_notice_date(soup):
     time_tag = soup.select_one("time.entry-date")
@@ -77,6 +96,8 @@ def parse_notice_date(soup):
     return date.today()
 
 def scrape_notice_image_urls(limit=None):
+    from bs4 import BeautifulSoup
+
     notices = []
 
     # Get previously processed URLs to save rate limits
@@ -95,8 +116,9 @@ def scrape_notice_image_urls(limit=None):
         page_url = CATEGORY_URL if page == 1 else f"{CATEGORY_URL}page/{page}/"
         print(f"Scanning category page {page}/{max_pages}: {page_url}")
 
-        resp = requests.get(page_url, headers=REQUEST_HEADERS)
-        resp.raise_for_status()
+        with span("category_page_fetch", page=page):
+            resp = requests.get(page_url, headers=REQUEST_HEADERS)
+            resp.raise_for_status()
         soup = BeautifulSoup(resp.text, "html.parser")
 
         articles = soup.select("article h2 a")
@@ -138,30 +160,25 @@ def scrape_notice_image_urls(limit=None):
             else:
                 status = "active"  # default for non-cancelled notices
 
-            post_resp = requests.get(post_url, headers=REQUEST_HEADERS)
-            post_resp.raise_for_status()
+            with span("post_fetch", url=post_url):
+                post_resp = requests.get(post_url, headers=REQUEST_HEADERS)
+                post_resp.raise_for_status()
             post_soup = BeautifulSoup(post_resp.text, "html.parser")
 
             notice_date = parse_notice_date(post_soup)
 
             page_has_recent_posts = True
 
-            imgs = []
-            content_div = post_soup.select_one("div.entry-content")
-            if content_div:
-                seen = set()
-                for img in content_div.select("img"):
-                    real = pick_real_image_url(img)
-                    if real and real not in seen:
-                        seen.add(real)
-                        imgs.append(real)
+            imgs, text = parse_post_content(post_soup)
 
             notices.append({
                 "title": title,
                 "url": post_url,
                 "status": status,
                 "images": imgs,
-                "publish_date": notice_date.isoformat()
+                "text": text,
+                "publish_date": notice_date.isoformat(),
+                "revalidation": revalidation_meta(post_resp, post_soup, title, imgs, text),
             })
 
             if limit and len(notices) >= limit:
@@ -187,6 +204,42 @@ def scrape_notice_image_urls(limit=None):
 
     return notices
 
+def parse_post_content(post_soup) -> tuple:
+    """(image URLs, body text) from a post page's div.entry-content."""
+    imgs = []
+    text = ""
+    content_div = post_soup.select_one("div.entry-content")
+    if content_div:
+        # Post body text, for notices that spell the schedule out (text_extract.py)
+        text = content_div.get_text("\n", strip=True)
+        seen = set()
+        for img in content_div.select("img"):
+            real = pick_real_image_url(img)
+            if real and real not in seen:
+                seen.add(real)
+                imgs.append(real)
+    return imgs, text
+
+def notice_fingerprint(title: str, images: list, text: str) -> str:
+    """Hash of what the notice was extracted from; changes when the post is edited."""
+    h = hashlib.sha256()
+    for part in (title, *images, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def revalidation_meta(resp, post_soup, fallback_title: str, images: list, text: str) -> dict:
+    """Validators + fingerprint stored with a notice so later runs can revalidate it cheaply."""
+    title_tag = post_soup.select_one("h1.entry-title")
+    title = title_tag.get_text(strip=True) if title_tag else fallback_title
+    return {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "title": title,
+        "fingerprint": notice_fingerprint(title, images, text),
+        "checked_at": datetime.utcnow().isoformat(),
+    }
+
 def pick_real_image_url(img_tag):
     candidates = []
     for attr in ("data-lazy-src", "data-src", "data-orig-file", "src"):
@@ -260,28 +313,53 @@ def fetch_and_cache_locations(force_refresh=False):
 
     return locations
 
-reference_json = fetch_and_cache_locations()
-
-if not reference_json or not isinstance(reference_json[0], dict):
-    raise RuntimeError("❌ Reference JSON corrupted, expected list of dicts but got something else.")
-
 # ==============================
 # Barangay Details & Adjacency
 # ==============================
 
-BARANGAY_DETAILS_FILE = Path("barangay_details.json")
-BARANGAY_ADJACENCY_FILE = Path("barangay_adjacency.json")
+BARANGAY_DETAILS_FILE = reference_index.BARANGAY_DETAILS_FILE
+BARANGAY_ADJACENCY_FILE = reference_index.BARANGAY_ADJACENCY_FILE
 
-def _load_json_file(filepath: Path) -> dict:
-    if filepath.exists():
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+_reference_lock = threading.Lock()
 
-barangay_details = _load_json_file(BARANGAY_DETAILS_FILE)
-barangay_adjacency = _load_json_file(BARANGAY_ADJACENCY_FILE)
-
-def expand_route_barangays(muni_name: str, barangays_list: list, muni_ref: dict) -> list:
+def get_reference_index() -> dict:
+    """
+    Compiled reference data (see reference_index.py): the raw reference
+    JSON, barangay details and adjacency plus the prebuilt lookup tables
+    used during normalization. Loaded on first use and hot-reloaded when
+    the source files change (see reference_data.py).
+    """
+    if not CACHE_FILE.exists():
+        with _reference_lock:
+            if not CACHE_FILE.exists():
+                fetch_and_cache_locations()
+    return reference_data.get_index()
+
+def get_reference_json() -> list:
+    """Municipalities + barangays reference."""
+    return get_reference_index()["reference_json"]
+
+def get_barangay_details() -> dict:
+    return get_reference_index()["barangay_details"]
+
+def get_barangay_adjacency() -> dict:
+    return get_reference_index()["barangay_adjacency"]
+
+_LAZY_GLOBALS = {
+    "reference_json": get_reference_json,
+    "barangay_details": get_barangay_details,
+    "barangay_adjacency": get_barangay_adjacency,
+}
+
+def __getattr__(name):
+    # Keep `logic.reference_json` etc. working for callers outside this module
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    if name == "client":
+        return get_gemini_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def expand_route_barangays(muni_name: str, barangays_list: list, muni_ref: dict, index: dict = None) -> list:
     """
     Post-processing: if a location has route-style affected_area (detected by
     keywords like 'from', 'to', 'near', or multiple Prk./puroks),
@@ -289,8 +367,10 @@ def expand_route_barangays(muni_name: str, barangays_list: list, muni_ref: dict)
     adjacency map. Added barangays get affected_area=null since no specific
     sub-locations were mentioned for them.
     Note: 'portion of' is NOT a route keyword — it means "part of a place".
+    Pass `index` to use a specific reference snapshot (default: current).
     """
-    adjacency = barangay_adjacency.get(muni_name, {})
+    index = index or get_reference_index()
+    adjacency = index["barangay_adjacency"].get(muni_name, {})
     if not adjacency:
         return barangays_list
 
@@ -338,7 +418,9 @@ def expand_route_barangays(muni_name: str, barangays_list: list, muni_ref: dict)
         route_text = route_entries[0].get("affected_area", "")
 
     # Add missing intermediate barangays (no specific sub-locations, so affected_area=null)
-    ref_bgys = {b["name"]: b for b in muni_ref.get("barangays", [])}
+    ref_bgys = index["barangays_by_name"].get(muni_ref.get("name"))
+    if ref_bgys is None:
+        ref_bgys = {b["name"]: b for b in muni_ref.get("barangays", [])}
     added = []
     for neighbor_name in neighbors:
         if neighbor_name.upper() not in existing_names:
@@ -353,7 +435,7 @@ def expand_route_barangays(muni_name: str, barangays_list: list, muni_ref: dict)
     return barangays_list + added
 
 
-def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_ref: dict = None, verified_locations: list = None) -> list:
+def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_ref: dict = None, verified_locations: list = None, index: dict = None) -> list:
     """
     Post-processing safety net: cross-reference each barangay's affected_area
     against barangay_details.json AND verified learned_locations. If affected_area
@@ -361,28 +443,23 @@ def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_
     relocate them to the correct barangay. Items not found in any reference data
     are kept (could be new/unmapped places).
     """
-    muni_details = barangay_details.get(muni_name, {})
-    if not muni_details:
+    index = index or get_reference_index()
+    if not index["barangay_details"].get(muni_name):
         return barangays_list
 
-    # Build a lookup: normalized sub-location -> set of barangay names that own it
-    location_to_bgys = {}
-    for bgy_name, details in muni_details.items():
-        for category in ("puroks", "landmarks", "streets", "establishments", "aliases"):
-            for loc in details.get(category, []):
-                key = re.sub(r'[^A-Za-z0-9\s]', '', loc).strip().upper()
-                if key:
-                    location_to_bgys.setdefault(key, set()).add(bgy_name.upper())
+    # Prebuilt lookup: normalized sub-location -> set of barangay names that own it
+    location_to_bgys = index["location_to_barangays"].get(muni_name, {})
 
-    # Merge verified learned_locations into the lookup
+    # Merge verified learned_locations into (a copy of) the lookup
     if verified_locations:
+        location_to_bgys = dict(location_to_bgys)
         for vl in verified_locations:
             if (vl.get("municipality") or "").upper() == muni_name.upper():
                 loc_name = vl.get("location_name", "")
                 bgy = vl.get("barangay", "")
-                key = re.sub(r'[^A-Za-z0-9\s]', '', loc_name).strip().upper()
+                key = normalize_key(loc_name)
                 if key and bgy:
-                    location_to_bgys.setdefault(key, set()).add(bgy.upper())
+                    location_to_bgys[key] = location_to_bgys.get(key, frozenset()) | {bgy.upper()}
 
     # Common prefixes to strip when looking up affected_area segments
     PREFIX_RE = re.compile(
@@ -410,10 +487,9 @@ def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_
             if not seg:
                 continue
             # Normalize for lookup
-            seg_key = re.sub(r'[^A-Za-z0-9\s]', '', seg).strip().upper()
+            seg_key = normalize_key(seg)
             # Also try with common prefixes stripped
-            seg_key_stripped = PREFIX_RE.sub('', seg)
-            seg_key_stripped = re.sub(r'[^A-Za-z0-9\s]', '', seg_key_stripped).strip().upper()
+            seg_key_stripped = normalize_key(PREFIX_RE.sub('', seg))
 
             # Check if this segment is a known sub-location (with or without prefix)
             owners = location_to_bgys.get(seg_key) or location_to_bgys.get(seg_key_stripped)
@@ -434,7 +510,9 @@ def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_
     # Relocate misplaced items to their correct barangays
     if relocations and muni_ref:
         existing_names = {b["name"].upper(): i for i, b in enumerate(result)}
-        ref_bgys = {b["name"].upper(): b for b in muni_ref.get("barangays", [])}
+        ref_bgys = index["barangays_by_upper_name"].get(muni_ref.get("name"))
+        if ref_bgys is None:
+            ref_bgys = {b["name"].upper(): b for b in muni_ref.get("barangays", [])}
 
         for correct_bgy_upper, segments in relocations.items():
             relocated_aa = ", ".join(segments)
@@ -460,47 +538,128 @@ def filter_affected_area_by_barangay(muni_name: str, barangays_list: list, muni_
 
 
 def snap_to_reference(name, choices):
-    match, score, _ = process.extractOne(name.upper(), [c.upper() for c in choices])
+    return _snap_upper(name, [c.upper() for c in choices])
+
+def _snap_upper(name, upper_choices):
+    # Same as snap_to_reference, for choice lists that are already uppercase
+    # (the prebuilt arrays in the reference index)
+    from rapidfuzz import process
+
+    match, score, _ = process.extractOne(name.upper(), upper_choices)
     return match if score > 80 else name
 
 # ==============================
 # Gemini client
 # ==============================
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+_client = None
+
+def get_gemini_client():
+    """Create the Gemini client on first use (imports google.genai lazily)."""
+    global _client
+    if _client is None:
+        from google import genai
+        # GEMINI_BASE_URL points the client at a local stub (replay harness)
+        base_url = os.getenv("GEMINI_BASE_URL")
+        _client = genai.Client(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            http_options={"base_url": base_url} if base_url else None,
+        )
+    return _client
 
 def load_image_from_url(url):
-    resp = requests.get(url, headers=REQUEST_HEADERS, stream=True)
-    resp.raise_for_status()
-    # load directly into PIL memory safely
-    img = Image.open(BytesIO(resp.content))
+    from PIL import Image
+
+    with span("image_download", url=url) as attrs:
+        resp = requests.get(url, headers=REQUEST_HEADERS, stream=True)
+        resp.raise_for_status()
+        # load directly into PIL memory safely
+        img = Image.open(BytesIO(resp.content))
+        attrs["bytes"] = len(resp.content)
     return img
 
-def extract_json(text: str):
+# Model output quality per run: responses, invalid (failed validation), repaired, dropped
+model_output_stats = Counter()
+
+REPAIR_PROMPT = """Your previous answer for the attached ZANECO power interruption notice did not match the required JSON schema:
+{errors}
+
+Previous answer (may be cut off):
+{previous}
+
+Read the image again and return the complete answer as JSON matching the schema exactly."""
+
+def parse_model_response(response_text: str, img, img_url: str, notice_url: str = None) -> dict:
+    """
+    Validate a schema-constrained response. A malformed one gets a single
+    compact repair call for the same image (no reference JSON in the prompt;
+    names are snapped to the reference afterwards anyway). Returns {} only
+    when the repair fails too.
+    """
+    model_output_stats["responses"] += 1
+    result, errors = parse_notices(response_text)
+    if not errors:
+        return result
+
+    model_output_stats["invalid"] += 1
+    record("gemini_invalid_response", 0.0, image=img_url, errors=errors[:3])
+    print(f"    >> Invalid model output ({'; '.join(errors[:3])}), asking for a repair...")
+    repair_prompt = REPAIR_PROMPT.format(errors="\n".join(errors), previous=(response_text or "")[:2000])
     try:
-        match = re.search(r"```json(.*?)```", text, re.DOTALL)
-        if match:
-            return json.loads(match.group(1).strip())
-        match = re.search(r"({.*})", text, re.DOTALL)
-        if match:
-            return json.loads(match.group(1).strip())
-        return json.loads(text)
-    except Exception as e:
-        print("⚠️ JSON parsing failed:", e)
-        return {}
+        repaired_text = safe_generate([repair_prompt, img], response_schema=NOTICE_RESPONSE_SCHEMA, notice_url=notice_url)
+    except RuntimeError as e:
+        print(f"    >> Repair call failed: {e}")
+        repaired_text = ""
+    result, errors = parse_notices(repaired_text)
+    if not errors:
+        model_output_stats["repaired"] += 1
+        return result
+
+    model_output_stats["dropped"] += 1
+    print(f"    >> Repair still invalid ({'; '.join(errors[:3])}); skipping {img_url}")
+    return {}
 
-def safe_generate(prompt, retries=5, backoff=30):
-    models = ["gemini-3.1-flash-lite-preview", "gemini-3-flash-preview", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
+GEMINI_RETRY_BACKOFF = int(os.getenv("GEMINI_RETRY_BACKOFF_SECONDS", "30"))
+# Added to the server-suggested "retry in Ns" delay on 429s
+GEMINI_RETRY_BUFFER = int(os.getenv("GEMINI_RETRY_BUFFER_SECONDS", "2"))
+
+GEMINI_MODELS = ["gemini-3.1-flash-lite-preview", "gemini-3-flash-preview", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
+# Order used once the run's token budget is nearly spent (gemini_usage.py)
+GEMINI_MODELS_CHEAP_FIRST = ["gemini-2.5-flash-lite", "gemini-3.1-flash-lite-preview", "gemini-2.5-flash", "gemini-3-flash-preview"]
+
+def safe_generate(prompt, retries=5, backoff=GEMINI_RETRY_BACKOFF, response_schema=None, notice_url=None):
+    """
+    Generate with model fallback and rate-limit retries. With
+    `response_schema`, the model is asked for bare JSON matching it.
+    Token usage of the successful call is accounted to `notice_url`.
+    """
+    from google.genai import errors as genai_errors
+    from google.genai import types as genai_types
+
+    client = get_gemini_client()
+    config = None
+    if response_schema is not None:
+        config = genai_types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=response_schema,
+        )
+    if gemini_usage.budget_level() in ("cheap", "exhausted"):
+        models = GEMINI_MODELS_CHEAP_FIRST
+    else:
+        models = GEMINI_MODELS
     last_error = None
 
     for model in models:
         for attempt in range(retries):
             try:
                 print(f"    >> Trying {model} (attempt {attempt+1}/{retries})...")
-                response = client.models.generate_content(
-                    model=model,
-                    contents=prompt
-                )
+                with span("gemini_attempt", model=model, attempt=attempt + 1) as attrs:
+                    response = client.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=config
+                    )
+                    attrs.update(gemini_usage.record_call(model, response.usage_metadata, notice_url))
                 print(f"    >> {model} SUCCESS")
                 return response.text
             except genai_errors.ClientError as e:
@@ -514,9 +673,10 @@ def safe_generate(prompt, retries=5, backoff=30):
                     import re as _re
                     delay_match = _re.search(r'retry in (\d+)', error_str)
                     if delay_match:
-                        wait_time = int(delay_match.group(1)) + 2  # add small buffer
+                        wait_time = int(delay_match.group(1)) + GEMINI_RETRY_BUFFER  # add small buffer
                     print(f"    >> {model} rate limited (attempt {attempt+1}/{retries}), waiting {wait_time}s...")
-                    time.sleep(wait_time)
+                    with span("gemini_backoff", model=model, reason="rate_limited"):
+                        time.sleep(wait_time)
                     continue  # retry same model
                 else:
                     # Other client errors (invalid key, location, etc.) — skip to next model
@@ -527,7 +687,8 @@ def safe_generate(prompt, retries=5, backoff=30):
                 if "UNAVAILABLE" in str(e) or "overloaded" in str(e).lower():
                     wait_time = backoff
                     print(f"    >> {model} overloaded (attempt {attempt+1}/{retries}), retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+                    with span("gemini_backoff", model=model, reason="overloaded"):
+                        time.sleep(wait_time)
                 else:
                     print(f"    >> {model} ServerError: {e}. Trying next model...")
                     break
@@ -581,347 +742,567 @@ def is_filename_date_past(url: str) -> bool:
 
     return False
 
+def normalize_schedules(result_json: dict, index: dict, verified_locations: list) -> list:
+    """
+    Normalize the schedules in a {"notices": [...]} extraction result: drop
+    past dates, snap municipality/barangay names to the reference, expand
+    routes and relocate affected areas. Returns the schedules to keep.
+    """
+    today = date.today()
+    valid_schedules = []
+    for sched in result_json.get("notices", []):
+        dates = sched.get("dates", [])
+                
+        # Filter dates: keep only today or future dates.
+        # Handle cases where Gemini returns combined date strings like "April 15 & 16, 2026"
+        # by splitting on common separators before parsing.
+        valid_dates = []
+        for d in dates:
+            # Split combined date strings (e.g. "April 15 & 16, 2026") into individual dates
+            sub_dates = re.split(r'\s*[&,]\s*', d)
+            # Reconstruct full dates: if a sub-part is just a number (day), inherit month/year from context
+            parsed_any = False
+            for sd in sub_dates:
+                sd = sd.strip()
+                if not sd:
+                    continue
+                try:
+                    from dateutil import parser as dateutil_parser
+                    parsed = dateutil_parser.parse(sd, fuzzy=True).date()
+                    if parsed >= today:
+                        if not parsed_any:
+                            valid_dates.append(d)  # Keep the original combined string
+                            parsed_any = True
+                except Exception:
+                    # If a sub-part like "16" can't parse alone, try combining with the original string context
+                    if re.match(r'^\d{1,2}$', sd):
+                        try:
+                            # Extract month and year from the full string for context
+                            ref_parsed = dateutil_parser.parse(d.replace('&', ','), fuzzy=True)
+                            reconstructed = f"{ref_parsed.strftime('%B')} {sd}, {ref_parsed.year}"
+                            parsed = dateutil_parser.parse(reconstructed).date()
+                            if parsed >= today:
+                                if not parsed_any:
+                                    valid_dates.append(d)
+                                    parsed_any = True
+                        except Exception:
+                            pass
+                    else:
+                        # Can't parse at all — keep the date to avoid over-filtering
+                        if not parsed_any:
+                            valid_dates.append(d)
+                            parsed_any = True
+
+        if not valid_dates and dates:
+            # ALL dates were confidently parsed as past — skip this schedule
+            continue
+
+        # Replace dates with only valid ones (or keep originals if none could be parsed)
+        sched["dates"] = valid_dates if valid_dates else dates
+
+        # ✅ Normalize municipality + barangay with PSGC reference
+        new_locs = []
+        for loc in sched.get("locations", []):
+            muni_name = loc.get("municipality", "").upper()
+            # Fuzzy-match municipality name against reference
+            matched_muni_name = _snap_upper(muni_name, index["municipality_names_upper"])
+            muni = index["municipalities"].get(matched_muni_name)
+
+            if muni:
+                muni_code = muni["code"]
+
+                # Handle "all_barangays" flag — expand to every barangay in the municipality
+                if loc.get("all_barangays", False):
+                    barangays = [
+                        {"code": b["code"], "name": b["name"], "affected_area": None}
+                        for b in muni["barangays"]
+                    ]
+                else:
+                    barangays = []
+                    raw_barangays = loc.get("barangays", [])
+                    for bentry in raw_barangays:
+                        # Support both old format (string) and new format (object with name + affected_area)
+                        if isinstance(bentry, dict):
+                            bname = bentry.get("name", "")
+                            affected_area = bentry.get("affected_area", None)
+                        else:
+                            bname = str(bentry)
+                            affected_area = None
+
+                        # Fuzzy-match barangay name against this municipality's barangays
+                        ref_bgy_names = index["barangay_names_upper"][muni["name"]]
+                        matched_bname = _snap_upper(bname, ref_bgy_names) if ref_bgy_names else bname.upper()
+
+                        b = index["barangays_by_name"][muni["name"]].get(matched_bname)
+
+                        # Clean up redundant affected_area that just repeats the barangay name
+                        if affected_area and b:
+                            clean = normalize_key(affected_area)
+                            ref_clean = normalize_key(b["name"])
+                            if clean == ref_clean:
+                                affected_area = None
+
+                        if b:
+                            barangays.append({"code": b["code"], "name": b["name"], "affected_area": affected_area})
+                        else:
+                            barangays.append({"code": None, "name": bname, "affected_area": affected_area})
+
+                # Route expansion: add intermediate barangays from adjacency map
+                barangays = expand_route_barangays(muni["name"], barangays, muni, index)
+
+                # Safety net: filter affected_area per barangay using barangay_details reference
+                barangays = filter_affected_area_by_barangay(muni["name"], barangays, muni, verified_locations, index)
+
+                new_locs.append({
+                    "municipality": {"code": muni_code, "name": muni["name"]},
+                    "barangays": barangays
+                })
+            else:
+                # fallback if no municipality match found
+                raw_barangays = loc.get("barangays", [])
+                fallback_bgys = []
+                for bentry in raw_barangays:
+                    if isinstance(bentry, dict):
+                        fallback_bgys.append({
+                            "code": None,
+                            "name": bentry.get("name", ""),
+                            "affected_area": bentry.get("affected_area", None)
+                        })
+                    else:
+                        fallback_bgys.append({"code": None, "name": str(bentry), "affected_area": None})
+                new_locs.append({
+                    "municipality": {"code": None, "name": muni_name},
+                    "barangays": fallback_bgys
+                })
+        sched["locations"] = new_locs
+        # Parsed [start, end) times for point-in-time lookups (see outage_index.py)
+        sched["intervals"] = outage_index.schedule_intervals(sched)
+        valid_schedules.append(sched)
+    return valid_schedules
+
+def eligible_image_urls(title: str, url: str, images: list) -> list:
+    """The notice images worth sending to Gemini (not obviously in the past)."""
+    # Check if notice covers today/future based on title/URL
+    # to avoid skipping images whose filenames only mention an earlier date
+    notice_latest_date = extract_notice_date_from_text(f"{title} {url}")
+    notice_covers_future = (
+        notice_latest_date is not None and notice_latest_date >= date.today()
+    )
+
+    image_urls = []
+    for img_url in images:
+        # Rapid-skip if URL specifies a fully past date,
+        # but only when the notice itself doesn't cover today/future dates
+        if not notice_covers_future and is_filename_date_past(img_url):
+            print(f"Skipping past schedule image based on filename: {img_url}")
+            continue
+        image_urls.append(img_url)
+    return image_urls
+
+def process_image(img_url: str, notice: dict, index: dict, verified_locations: list) -> dict:
+    """
+    Run one notice image through Gemini and normalize the result. Returns
+    the processed_images entry; learned locations are saved as a side effect.
+    """
+    print(f"Processing image: {img_url}")
+    img = load_image_from_url(img_url)
+
+    # Near the run's token budget: smaller image, no barangay-details context
+    level = gemini_usage.budget_level()
+    gemini_usage.note_degraded(level)
+    max_side = gemini_usage.MAX_IMAGE_SIDE[level]
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    details_context = ""
+    if level == "normal":
+        details_context = f"""
+    IMPORTANT — Detailed barangay-level reference (puroks, landmarks, streets, establishments, aliases).
+    Use this to determine which barangay a purok, landmark, street, or establishment belongs to.
+    If a place from the image matches an entry below, map it to that barangay:
+    {index["barangay_details_text"]}
+    """
+
+    prompt_start = time.perf_counter()
+    image_prompt = f"""
+    The attached image is a power interruption schedule/notice from ZANECO (Zamboanga del Norte Electric Cooperative) in Zamboanga del Norte, Philippines.
+    Carefully read the text and details natively from the image.
+    For context, the image was extracted from this URL filename: {img_url.split('/')[-1]}
+    Use the date/year in the filename to infer the exact date if it's missing from the visual text.
+
+    Correct errors and map municipality + barangay names strictly using the provided location reference JSON.
+
+    Return JSON matching the response schema: one "notices" entry per schedule, with
+    dates like "April 14, 2026", times like "8:30AM - 5:00PM", duration_hours, locations
+    (municipality, all_barangays, barangays as {{"name", "affected_area"}}) and a cleaned reason.
+
+    CRITICAL RULES for location identification:
+
+    1. "ALL BARANGAYS" HANDLING:
+       When the image says "All barangays" (or similar like "all brgys", "lahat ng barangay") for a municipality,
+       set "all_barangays": true and leave "barangays" as an empty array [].
+       The backend will expand it to every barangay in that municipality.
+       Example: "PINAN: All barangays" → {{"municipality": "PINAN", "all_barangays": true, "barangays": []}}
+
+    2. LANDMARKS, STREETS, SITIOS, PUROKS & ESTABLISHMENTS:
+       When the affected area lists landmarks, streets, sitios, puroks (Prk.), establishments, resorts,
+       pharmacies, eateries, hotels, function halls, covered courts, or any named places instead of
+       (or mixed with) barangay names:
+       - Determine which barangay each landmark/place/purok/sitio/street belongs to based on your
+         knowledge of the municipality geography. For example, "Dawo Covered Court" in Dapitan
+         belongs to barangay "DAWO (POB.)".
+       - Group landmarks under their correct barangay.
+       - Put the raw landmark/establishment/purok/street details in the "affected_area" field.
+       - If a place has multiple branches in a city and only one is in the affected zone, use context
+         clues (nearby landmarks, the route described) to determine the correct barangay.
+       Example: "DAPITAN: Dawo Covered Court, Dapitan City Fire Station" →
+       {{"name": "DAWO (POB.)", "affected_area": "Dawo Covered Court, Dapitan City Fire Station"}}
+
+    3. TYPO CORRECTION:
+       If a location name in the image has a typo or misspelling, match it to the closest valid name
+       from the reference JSON for that municipality.
+       Example: "Pobalcion Noth" under PINAN → "POBLACION NORTH" (if it exists in reference)
+       Example: "Sta. Isabel" → "SANTA ISABEL"
+
+    4. ROUTE-BASED DESCRIPTIONS:
+       When the image describes a route like "From X to Y", with puroks, landmarks, or establishments
+       listed along the way:
+       - Identify the START barangay and END barangay from the description.
+       - Then identify ALL barangays that the route geographically passes through between start and end.
+         Include adjacent/neighboring barangays along the route even if not explicitly named.
+       - IMPORTANT: Do NOT paste the full route description into every barangay. Instead, SPLIT the
+         route description and assign ONLY the specific puroks, landmarks, streets, and establishments
+         that belong to each barangay. Use the detailed barangay-level reference below to determine
+         which sub-locations belong to which barangay.
+       - If a barangay is along the route but NO specific sub-locations from the description belong
+         to it, set its "affected_area" to null.
+       - This applies to ALL municipalities and cities.
+       - It is BETTER to include more barangays (even if uncertain) than to miss them. A resident
+         in any barangay along the route needs to see this alert.
+       - WORKED EXAMPLE: "From Anahaw Galas near ZANECO Motorpool to Aleson Vanyard, Prk. Greenleaves,
+         One Heart, Prk. Malayan, Prk. Bayanihan, Prk. Bougainvilla & Portion of Prk. Kalambuan
+         and Prk. Uno, Sta. Isabel" in Dipolog City should produce:
+         * {{"name": "GALAS", "affected_area": "Anahaw Galas, near ZANECO Motorpool, Aleson Vanyard"}}
+           (Anahaw, ZANECO Motorpool, Aleson Vanyard are landmarks/puroks in GALAS)
+         * {{"name": "MIPUTAK (POB.)", "affected_area": "Prk. Greenleaves, Prk. Malayan, Prk. Bayanihan"}}
+           (these puroks belong to MIPUTAK per the reference)
+         * {{"name": "CENTRAL (POB.)", "affected_area": "One Heart"}}
+           (One Heart is a purok in CENTRAL per the reference)
+         * {{"name": "BIASONG (POB.)", "affected_area": "Prk. Bougainvilla"}}
+           (Prk. Bougainvilla belongs to BIASONG per the reference)
+         * {{"name": "SANTA ISABEL", "affected_area": "Portion of Prk. Kalambuan and Prk. Uno"}}
+           (Prk. Kalambuan and Prk. Uno belong to SANTA ISABEL per the reference)
+         * {{"name": "ESTACA (POB.)", "affected_area": null}}
+           (on the route but no specific sub-locations from the description belong to it)
+
+    5. MIXED LANDMARKS & ESTABLISHMENTS (non-route):
+       When the affected area lists landmarks, establishments, or places that are NOT part of a
+       continuous route description (just a comma-separated list of places):
+       - Map each place to its correct barangay individually.
+       - Group places under their correct barangay and put them in "affected_area".
+       - If you cannot confidently determine which barangay a place belongs to, assign it to the
+         nearest/most likely barangay and include neighboring barangays with the same affected_area.
+
+    6. BARANGAY "affected_area" FIELD:
+       - When a barangay is listed by name only (no extra details), set "affected_area" to null.
+       - When there are specific puroks, sitios, streets, landmarks, or establishments mentioned
+         for that barangay, put them in "affected_area" as a descriptive string.
+       - Do NOT set "affected_area" to just the barangay name itself (e.g., don't put "Sta. Isabel"
+         as affected_area for SANTA ISABEL). That is redundant — use null instead.
+       - The "affected_area" should only contain SUB-LOCATIONS within that barangay (puroks,
+         streets, landmarks, establishments), not the barangay name.
+
+    Other rules:
+    - There may be multiple schedules inside this ONE image. Extract ALL of them.
+    - Each schedule must be a separate object inside the "notices" array.
+    - Always use the provided reference JSON for municipalities and barangays. Use EXACT names from the reference.
+    - Each barangay in the output must be an object with "name" and "affected_area" keys.
+    - Return valid JSON only. No markdown, no explanation.
+
+    Location reference (municipalities + barangays):
+    {index["reference_json_text"]}
+    {details_context}"""
+    record("prompt_build", time.perf_counter() - prompt_start, chars=len(image_prompt))
+
+    # Pass both the text prompt and the raw PIL image natively to Gemini!
+    response_text = safe_generate([image_prompt, img], response_schema=NOTICE_RESPONSE_SCHEMA, notice_url=notice["url"])
+    result_json = parse_model_response(response_text, img, img_url, notice["url"])
+
+    normalize_start = time.perf_counter()
+    valid_schedules = normalize_schedules(result_json, index, verified_locations)
+
+    record("normalize", time.perf_counter() - normalize_start, image=img_url, schedules=len(valid_schedules))
+
+    processed = {
+        "image_url": img_url,
+        "ocr_text": "Processed directly via Gemini Multimodal Vision",
+        "structured": valid_schedules
+    }
+
+    # Auto-learn: extract affected_area → barangay mappings for enrichment
+    learned = []
+    for sched in valid_schedules:
+        for loc in sched.get("locations", []):
+            muni_obj = loc.get("municipality", {})
+            muni_display = muni_obj.get("name", "") if isinstance(muni_obj, dict) else str(muni_obj)
+            for b in loc.get("barangays", []):
+                aa = b.get("affected_area")
+                if aa and b.get("name"):
+                    # Split comma-separated items into individual entries
+                    for item in re.split(r',\s*(?:and|&)?\s*', aa):
+                        item = item.strip()
+                        if not item or len(item) < 3:
+                            continue
+                        # Classify the location type
+                        item_lower = item.lower()
+                        if any(k in item_lower for k in ['prk.', 'prk ', 'purok']):
+                            loc_type = 'purok'
+                        elif any(k in item_lower for k in ['street', 'st.', 'avenue', 'ave.', 'road', 'rd.']):
+                            loc_type = 'street'
+                        elif any(k in item_lower for k in ['pharmacy', 'hotel', 'resort', 'mall', 'restaurant', 'eatery', 'inn', 'clinic', 'hospital', 'jollibee', 'mcdonalds', 'gaisano']):
+                            loc_type = 'establishment'
+                        else:
+                            loc_type = 'landmark'
+                        learned.append({
+                            "municipality": muni_display,
+                            "barangay": b["name"],
+                            "location_type": loc_type,
+                            "location_name": item,
+                            "source_url": notice["url"]
+                        })
+    if learned:
+        save_learned_locations(learned)
+
+    return processed
+
+def process_text(notice: dict, index: dict, verified_locations: list):
+    """
+    Fast path: parse a schedule spelled out in the post text, without Gemini.
+    Returns a processed_images entry, or None unless every date/time/area in
+    the text was read with confidence.
+    """
+    if not TEXT_FAST_PATH or not notice.get("text"):
+        return None
+    with span("text_parse", url=notice["url"]) as attrs:
+        text_result = text_extract.parse_notice_text(notice["text"], index)
+        attrs["confident"] = text_result is not None
+    if text_result is None:
+        return None
+    return {
+        "image_url": notice["url"],
+        "ocr_text": "Parsed from post text (rule-based, no Gemini call)",
+        "structured": normalize_schedules(text_result, index, verified_locations)
+    }
+
+def text_covers_notice(notice: dict, image_urls: list, text_entry: dict) -> bool:
+    """
+    Whether a text parse can stand in for the notice's images: there are
+    none, or every upcoming date in the title is one the text schedules
+    cover. A post may carry only a summary in its text and the rest of the
+    schedule in images; then the images still have to be read.
+    """
+    if not image_urls:
+        return True
+    wanted = {d for d in extract_notice_dates_from_text(notice["title"]) if d >= date.today()}
+    if not wanted:
+        return False
+    parsed = set()
+    for sched in text_entry["structured"]:
+        parsed |= extract_notice_dates_from_text(" ".join(sched.get("dates", [])))
+    return wanted <= parsed
+
 # ==============================
 # Main function
 # ==============================
 
-def get_notices():
+def get_notices(progress=None):
+    """
+    Scrape new notices and run each image through Gemini, unless the
+    post text parses and covers the whole notice (see text_extract.py
+    and text_covers_notice()).
+    `progress(**counts)`, when given, receives running counters
+    (notices_found, images_processed, notices_from_text, llm_calls_avoided)
+    for job status reporting.
+    """
     notices = scrape_notice_image_urls()  
     final_results = []
 
-    # Fetch verified learned_locations once for the entire scrape run
-    verified_locations = get_verified_learned_locations()
+    images_processed = 0
+    notices_from_text = 0
+    llm_calls_avoided = 0
+    model_output_stats.clear()
+    if progress:
+        progress(notices_found=len(notices), images_processed=0)
+
+    # One reference snapshot (index + verified learned_locations) for the
+    # entire scrape run, so a hot reload mid-run can't mix versions
+    snapshot = reference_data.get_snapshot()
+    index = snapshot["index"]
+    verified_locations = snapshot["verified_locations"]
 
     for notice in notices:
+        # Out of token budget: parse what the text fast path can, defer the rest
+        # (newest first from the category pages, so the older notices wait)
+        budget_exhausted = gemini_usage.budget_level() == "exhausted"
+
         notice_result = {
             "title": notice["title"],
             "url": notice["url"],
-            "processed_images": []
+            "status": notice["status"],
+            "publish_date": notice["publish_date"],
+            "processed_images": [],
+            "revalidation": notice["revalidation"],
         }
 
-        # Check if notice covers today/future based on title/URL
-        # to avoid skipping images whose filenames only mention an earlier date
-        notice_latest_date = extract_notice_date_from_text(
-            f"{notice['title']} {notice['url']}"
-        )
-        notice_covers_future = (
-            notice_latest_date is not None and notice_latest_date >= date.today()
-        )
-
-        for img_url in notice["images"]:
-            # Rapid-skip if URL specifies a fully past date,
-            # but only when the notice itself doesn't cover today/future dates
-            if not notice_covers_future and is_filename_date_past(img_url):
-                print(f"Skipping past schedule image based on filename: {img_url}")
-                continue
-                
-            print(f"Processing image: {img_url}")
-            img = load_image_from_url(img_url)
-
-            image_prompt = f"""
-            The attached image is a power interruption schedule/notice from ZANECO (Zamboanga del Norte Electric Cooperative) in Zamboanga del Norte, Philippines.
-            Carefully read the text and details natively from the image.
-            For context, the image was extracted from this URL filename: {img_url.split('/')[-1]}
-            Use the date/year in the filename to infer the exact date if it's missing from the visual text.
-
-            Correct errors and map municipality + barangay names strictly using the provided location reference JSON.
-
-            Return a JSON with this structure:
-            {{
-              "notices": [
-                {{
-                  "dates": ["April 14, 2026"],
-                  "times": ["8:30AM - 5:00PM"],
-                  "duration_hours": 8.5,
-                  "locations": [
-                    {{
-                      "municipality": "POLANCO",
-                      "all_barangays": false,
-                      "barangays": [
-                        {{
-                          "name": "POBLACION NORTH",
-                          "affected_area": "Prk. Greenleaves, One Heart, Prk. Malayan"
-                        }},
-                        {{
-                          "name": "GUINLES",
-                          "affected_area": null
-                        }}
-                      ]
-                    }}
-                  ],
-                  "reason": "Cleaned reason text here"
-                }}
-              ]
-            }}
-
-            CRITICAL RULES for location identification:
-
-            1. "ALL BARANGAYS" HANDLING:
-               When the image says "All barangays" (or similar like "all brgys", "lahat ng barangay") for a municipality,
-               set "all_barangays": true and leave "barangays" as an empty array [].
-               The backend will expand it to every barangay in that municipality.
-               Example: "PINAN: All barangays" → {{"municipality": "PINAN", "all_barangays": true, "barangays": []}}
-
-            2. LANDMARKS, STREETS, SITIOS, PUROKS & ESTABLISHMENTS:
-               When the affected area lists landmarks, streets, sitios, puroks (Prk.), establishments, resorts,
-               pharmacies, eateries, hotels, function halls, covered courts, or any named places instead of
-               (or mixed with) barangay names:
-               - Determine which barangay each landmark/place/purok/sitio/street belongs to based on your
-                 knowledge of the municipality geography. For example, "Dawo Covered Court" in Dapitan
-                 belongs to barangay "DAWO (POB.)".
-               - Group landmarks under their correct barangay.
-               - Put the raw landmark/establishment/purok/street details in the "affected_area" field.
-               - If a place has multiple branches in a city and only one is in the affected zone, use context
-                 clues (nearby landmarks, the route described) to determine the correct barangay.
-               Example: "DAPITAN: Dawo Covered Court, Dapitan City Fire Station" →
-               {{"name": "DAWO (POB.)", "affected_area": "Dawo Covered Court, Dapitan City Fire Station"}}
-
-            3. TYPO CORRECTION:
-               If a location name in the image has a typo or misspelling, match it to the closest valid name
-               from the reference JSON for that municipality.
-               Example: "Pobalcion Noth" under PINAN → "POBLACION NORTH" (if it exists in reference)
-               Example: "Sta. Isabel" → "SANTA ISABEL"
-
-            4. ROUTE-BASED DESCRIPTIONS:
-               When the image describes a route like "From X to Y", with puroks, landmarks, or establishments
-               listed along the way:
-               - Identify the START barangay and END barangay from the description.
-               - Then identify ALL barangays that the route geographically passes through between start and end.
-                 Include adjacent/neighboring barangays along the route even if not explicitly named.
-               - IMPORTANT: Do NOT paste the full route description into every barangay. Instead, SPLIT the
-                 route description and assign ONLY the specific puroks, landmarks, streets, and establishments
-                 that belong to each barangay. Use the detailed barangay-level reference below to determine
-                 which sub-locations belong to which barangay.
-               - If a barangay is along the route but NO specific sub-locations from the description belong
-                 to it, set its "affected_area" to null.
-               - This applies to ALL municipalities and cities.
-               - It is BETTER to include more barangays (even if uncertain) than to miss them. A resident
-                 in any barangay along the route needs to see this alert.
-               - WORKED EXAMPLE: "From Anahaw Galas near ZANECO Motorpool to Aleson Vanyard, Prk. Greenleaves,
-                 One Heart, Prk. Malayan, Prk. Bayanihan, Prk. Bougainvilla & Portion of Prk. Kalambuan
-                 and Prk. Uno, Sta. Isabel" in Dipolog City should produce:
-                 * {{"name": "GALAS", "affected_area": "Anahaw Galas, near ZANECO Motorpool, Aleson Vanyard"}}
-                   (Anahaw, ZANECO Motorpool, Aleson Vanyard are landmarks/puroks in GALAS)
-                 * {{"name": "MIPUTAK (POB.)", "affected_area": "Prk. Greenleaves, Prk. Malayan, Prk. Bayanihan"}}
-                   (these puroks belong to MIPUTAK per the reference)
-                 * {{"name": "CENTRAL (POB.)", "affected_area": "One Heart"}}
-                   (One Heart is a purok in CENTRAL per the reference)
-                 * {{"name": "BIASONG (POB.)", "affected_area": "Prk. Bougainvilla"}}
-                   (Prk. Bougainvilla belongs to BIASONG per the reference)
-                 * {{"name": "SANTA ISABEL", "affected_area": "Portion of Prk. Kalambuan and Prk. Uno"}}
-                   (Prk. Kalambuan and Prk. Uno belong to SANTA ISABEL per the reference)
-                 * {{"name": "ESTACA (POB.)", "affected_area": null}}
-                   (on the route but no specific sub-locations from the description belong to it)
-
-            5. MIXED LANDMARKS & ESTABLISHMENTS (non-route):
-               When the affected area lists landmarks, establishments, or places that are NOT part of a
-               continuous route description (just a comma-separated list of places):
-               - Map each place to its correct barangay individually.
-               - Group places under their correct barangay and put them in "affected_area".
-               - If you cannot confidently determine which barangay a place belongs to, assign it to the
-                 nearest/most likely barangay and include neighboring barangays with the same affected_area.
-
-            6. BARANGAY "affected_area" FIELD:
-               - When a barangay is listed by name only (no extra details), set "affected_area" to null.
-               - When there are specific puroks, sitios, streets, landmarks, or establishments mentioned
-                 for that barangay, put them in "affected_area" as a descriptive string.
-               - Do NOT set "affected_area" to just the barangay name itself (e.g., don't put "Sta. Isabel"
-                 as affected_area for SANTA ISABEL). That is redundant — use null instead.
-               - The "affected_area" should only contain SUB-LOCATIONS within that barangay (puroks,
-                 streets, landmarks, establishments), not the barangay name.
-
-            Other rules:
-            - There may be multiple schedules inside this ONE image. Extract ALL of them.
-            - Each schedule must be a separate object inside the "notices" array.
-            - Always use the provided reference JSON for municipalities and barangays. Use EXACT names from the reference.
-            - Each barangay in the output must be an object with "name" and "affected_area" keys.
-            - Return valid JSON only. No markdown, no explanation.
-
-            Location reference (municipalities + barangays):
-            {json.dumps(reference_json, ensure_ascii=False)}
-
-            IMPORTANT — Detailed barangay-level reference (puroks, landmarks, streets, establishments, aliases).
-            Use this to determine which barangay a purok, landmark, street, or establishment belongs to.
-            If a place from the image matches an entry below, map it to that barangay:
-            {json.dumps({k: v for k, v in barangay_details.items() if k != '_README'}, ensure_ascii=False)}
-            """
-
-            # Pass both the text prompt and the raw PIL image natively to Gemini!
-            response_text = safe_generate([image_prompt, img])
-            result_json = extract_json(response_text)
-
-            today = date.today()
-            valid_schedules = []
-            for sched in result_json.get("notices", []):
-                dates = sched.get("dates", [])
-                
-                # Filter dates: keep only today or future dates.
-                # Handle cases where Gemini returns combined date strings like "April 15 & 16, 2026"
-                # by splitting on common separators before parsing.
-                valid_dates = []
-                for d in dates:
-                    # Split combined date strings (e.g. "April 15 & 16, 2026") into individual dates
-                    sub_dates = re.split(r'\s*[&,]\s*', d)
-                    # Reconstruct full dates: if a sub-part is just a number (day), inherit month/year from context
-                    parsed_any = False
-                    for sd in sub_dates:
-                        sd = sd.strip()
-                        if not sd:
-                            continue
-                        try:
-                            from dateutil import parser as dateutil_parser
-                            parsed = dateutil_parser.parse(sd, fuzzy=True).date()
-                            if parsed >= today:
-                                if not parsed_any:
-                                    valid_dates.append(d)  # Keep the original combined string
-                                    parsed_any = True
-                        except Exception:
-                            # If a sub-part like "16" can't parse alone, try combining with the original string context
-                            if re.match(r'^\d{1,2}$', sd):
-                                try:
-                                    # Extract month and year from the full string for context
-                                    ref_parsed = dateutil_parser.parse(d.replace('&', ','), fuzzy=True)
-                                    reconstructed = f"{ref_parsed.strftime('%B')} {sd}, {ref_parsed.year}"
-                                    parsed = dateutil_parser.parse(reconstructed).date()
-                                    if parsed >= today:
-                                        if not parsed_any:
-                                            valid_dates.append(d)
-                                            parsed_any = True
-                                except Exception:
-                                    pass
-                            else:
-                                # Can't parse at all — keep the date to avoid over-filtering
-                                if not parsed_any:
-                                    valid_dates.append(d)
-                                    parsed_any = True
-
-                if not valid_dates and dates:
-                    # ALL dates were confidently parsed as past — skip this schedule
-                    continue
+        image_urls = eligible_image_urls(notice["title"], notice["url"], notice["images"])
 
-                # Replace dates with only valid ones (or keep originals if none could be parsed)
-                sched["dates"] = valid_dates if valid_dates else dates
-
-                # ✅ Normalize municipality + barangay with PSGC reference
-                new_locs = []
-                for loc in sched.get("locations", []):
-                    muni_name = loc.get("municipality", "").upper()
-                    # Fuzzy-match municipality name against reference
-                    muni_names = [m["name"] for m in reference_json]
-                    matched_muni_name = snap_to_reference(muni_name, muni_names)
-                    muni = next((m for m in reference_json if m["name"] == matched_muni_name), None)
-
-                    if muni:
-                        muni_code = muni["code"]
-
-                        # Handle "all_barangays" flag — expand to every barangay in the municipality
-                        if loc.get("all_barangays", False):
-                            barangays = [
-                                {"code": b["code"], "name": b["name"], "affected_area": None}
-                                for b in muni["barangays"]
-                            ]
-                        else:
-                            barangays = []
-                            raw_barangays = loc.get("barangays", [])
-                            for bentry in raw_barangays:
-                                # Support both old format (string) and new format (object with name + affected_area)
-                                if isinstance(bentry, dict):
-                                    bname = bentry.get("name", "")
-                                    affected_area = bentry.get("affected_area", None)
-                                else:
-                                    bname = str(bentry)
-                                    affected_area = None
-
-                                # Fuzzy-match barangay name against this municipality's barangays
-                                ref_bgy_names = [b["name"] for b in muni["barangays"]]
-                                matched_bname = snap_to_reference(bname, ref_bgy_names) if ref_bgy_names else bname.upper()
-
-                                b = next((b for b in muni["barangays"] if b["name"] == matched_bname), None)
-
-                                # Clean up redundant affected_area that just repeats the barangay name
-                                if affected_area and b:
-                                    clean = re.sub(r'[^A-Za-z0-9\s]', '', affected_area).strip().upper()
-                                    ref_clean = re.sub(r'[^A-Za-z0-9\s]', '', b["name"]).strip().upper()
-                                    if clean == ref_clean:
-                                        affected_area = None
-
-                                if b:
-                                    barangays.append({"code": b["code"], "name": b["name"], "affected_area": affected_area})
-                                else:
-                                    barangays.append({"code": None, "name": bname, "affected_area": affected_area})
-
-                        # Route expansion: add intermediate barangays from adjacency map
-                        barangays = expand_route_barangays(muni["name"], barangays, muni)
-
-                        # Safety net: filter affected_area per barangay using barangay_details reference
-                        barangays = filter_affected_area_by_barangay(muni["name"], barangays, muni, verified_locations)
-
-                        new_locs.append({
-                            "municipality": {"code": muni_code, "name": muni["name"]},
-                            "barangays": barangays
-                        })
-                    else:
-                        # fallback if no municipality match found
-                        raw_barangays = loc.get("barangays", [])
-                        fallback_bgys = []
-                        for bentry in raw_barangays:
-                            if isinstance(bentry, dict):
-                                fallback_bgys.append({
-                                    "code": None,
-                                    "name": bentry.get("name", ""),
-                                    "affected_area": bentry.get("affected_area", None)
-                                })
-                            else:
-                                fallback_bgys.append({"code": None, "name": str(bentry), "affected_area": None})
-                        new_locs.append({
-                            "municipality": {"code": None, "name": muni_name},
-                            "barangays": fallback_bgys
-                        })
-                sched["locations"] = new_locs
-                valid_schedules.append(sched)
-
-            notice_result["processed_images"].append({
-                "image_url": img_url,
-                "ocr_text": "Processed directly via Gemini Multimodal Vision",
-                "structured": valid_schedules
-            })
+        text_entry = process_text(notice, index, verified_locations)
+        covered = text_entry is not None and text_covers_notice(notice, image_urls, text_entry)
+        if not covered and budget_exhausted and image_urls:
+            print(f"Token budget spent; deferring {notice['url']} to the next run")
+            gemini_usage.note_deferred()
+            continue
+        if text_entry is not None:
+            notice_result["processed_images"].append(text_entry)
+            notices_from_text += 1
+            if covered:
+                print(f"Parsed schedule from post text, skipping {len(image_urls)} image(s): {notice['url']}")
+                llm_calls_avoided += len(image_urls)
+                image_urls = []
+            else:
+                # The images may hold schedules the text leaves out; read them too
+                print(f"Parsed part of the schedule from post text, still reading {len(image_urls)} image(s): {notice['url']}")
+            if progress:
+                progress(notices_from_text=notices_from_text, llm_calls_avoided=llm_calls_avoided)
 
-            # Auto-learn: extract affected_area → barangay mappings for enrichment
-            learned = []
-            for sched in valid_schedules:
-                for loc in sched.get("locations", []):
-                    muni_obj = loc.get("municipality", {})
-                    muni_display = muni_obj.get("name", "") if isinstance(muni_obj, dict) else str(muni_obj)
-                    for b in loc.get("barangays", []):
-                        aa = b.get("affected_area")
-                        if aa and b.get("name"):
-                            # Split comma-separated items into individual entries
-                            for item in re.split(r',\s*(?:and|&)?\s*', aa):
-                                item = item.strip()
-                                if not item or len(item) < 3:
-                                    continue
-                                # Classify the location type
-                                item_lower = item.lower()
-                                if any(k in item_lower for k in ['prk.', 'prk ', 'purok']):
-                                    loc_type = 'purok'
-                                elif any(k in item_lower for k in ['street', 'st.', 'avenue', 'ave.', 'road', 'rd.']):
-                                    loc_type = 'street'
-                                elif any(k in item_lower for k in ['pharmacy', 'hotel', 'resort', 'mall', 'restaurant', 'eatery', 'inn', 'clinic', 'hospital', 'jollibee', 'mcdonalds', 'gaisano']):
-                                    loc_type = 'establishment'
-                                else:
-                                    loc_type = 'landmark'
-                                learned.append({
-                                    "municipality": muni_display,
-                                    "barangay": b["name"],
-                                    "location_type": loc_type,
-                                    "location_name": item,
-                                    "source_url": notice["url"]
-                                })
-            if learned:
-                save_learned_locations(learned)
+        for img_url in image_urls:
+            notice_result["processed_images"].append(process_image(img_url, notice, index, verified_locations))
+            images_processed += 1
+            if progress:
+                progress(images_processed=images_processed, invalid_responses=model_output_stats["invalid"])
 
         # Skip placeholder notices that ended up with no valid future/today schedules.
         if notice_result["processed_images"]:
             final_results.append(notice_result)
 
+    print(f"Gemini calls: {images_processed} made, {llm_calls_avoided} avoided "
+          f"({notices_from_text} notice(s) parsed from post text)")
+    if model_output_stats["invalid"]:
+        print(f"Invalid model output: {model_output_stats['invalid']} of {model_output_stats['responses']} "
+              f"({model_output_stats['repaired']} repaired, {model_output_stats['dropped']} dropped)")
     return final_results
+
+# ==============================
+# Revalidation of saved notices
+# ==============================
+
+def revalidate_notices(skip_urls=(), progress=None) -> dict:
+    """
+    Look at already-saved active notices again, cheaply:
+    - conditional GET (If-None-Match / If-Modified-Since); 304 → done
+    - otherwise compare a fingerprint of title + image list + text; same → done
+    - on a real change, update status from the title and only send images
+      that weren't processed before to Gemini; removed images are dropped
+    Rows are updated in place. Returns counters.
+    """
+    from bs4 import BeautifulSoup
+
+    counts = {"checked": 0, "not_modified": 0, "unchanged": 0, "updated": 0, "cancelled": 0, "images_reprocessed": 0}
+    if not REVALIDATE_NOTICES:
+        return counts
+    try:
+        rows = [r for r in get_active_notices() if r["url"] not in skip_urls]
+    except Exception as e:
+        print(f"Could not load notices for revalidation: {e}")
+        return counts
+    snapshot = None
+
+    for row in rows:
+        data = row.get("data") or {}
+        meta = data.get("revalidation") or {}
+        headers = dict(REQUEST_HEADERS)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with span("post_revalidate", url=row["url"]) as attrs:
+                resp = requests.get(row["url"], headers=headers, timeout=30)
+                attrs["status"] = resp.status_code
+        except requests.RequestException as e:
+            print(f"  Could not revalidate {row['url']}: {e}")
+            continue
+        counts["checked"] += 1
+        if resp.status_code == 304:
+            counts["not_modified"] += 1
+            continue
+        if resp.status_code != 200:
+            print(f"  Revalidation of {row['url']} returned {resp.status_code}; leaving it as is")
+            continue
+
+        post_soup = BeautifulSoup(resp.text, "html.parser")
+        images, text = parse_post_content(post_soup)
+        new_meta = revalidation_meta(resp, post_soup, row["title"], images, text)
+        if new_meta["fingerprint"] == meta.get("fingerprint"):
+            counts["unchanged"] += 1
+            if (new_meta["etag"], new_meta["last_modified"]) != (meta.get("etag"), meta.get("last_modified")):
+                # Store the new validators so the next pass can get a 304
+                update_notice(row["id"], {"data": {**data, "revalidation": new_meta}})
+            continue
+
+        # The saved title comes from the category listing; follow the post's own title once it moves
+        title = new_meta["title"] if meta.get("title") and new_meta["title"] != meta["title"] else row["title"]
+        status = "cancelled" if "cancelled" in title.lower() else "active"
+
+        if snapshot is None:
+            snapshot = reference_data.get_snapshot()
+        index, verified_locations = snapshot["index"], snapshot["verified_locations"]
+        notice = {"title": title, "url": row["url"], "images": images, "text": text}
+
+        old_processed = data.get("processed_images", [])
+        by_url = {p["image_url"]: p for p in old_processed}
+        # Keep Gemini results for notices that weren't parsed from text before
+        text_entry = None
+        if row["url"] in by_url or not old_processed:
+            text_entry = process_text(notice, index, verified_locations)
+        image_urls = eligible_image_urls(title, row["url"], images)
+        covered = text_entry is not None and text_covers_notice(notice, image_urls, text_entry)
+        if (not covered and gemini_usage.budget_level() == "exhausted"
+                and any(u not in by_url for u in image_urls)):
+            # Leave the stored fingerprint alone so the next run picks this up again
+            print(f"  Token budget spent; deferring {row['url']} to the next run")
+            gemini_usage.note_deferred()
+            continue
+        if covered:
+            processed = [text_entry]
+        else:
+            processed = [text_entry] if text_entry is not None else []
+            for img_url in image_urls:
+                if img_url not in by_url:
+                    by_url[img_url] = process_image(img_url, notice, index, verified_locations)
+                    counts["images_reprocessed"] += 1
+                processed.append(by_url[img_url])
+
+        if processed == old_processed and (title, status) == (row["title"], row["status"]):
+            # e.g. an edit to a past-dated image, or the first check of a notice saved before revalidation existed
+            counts["unchanged"] += 1
+            update_notice(row["id"], {"data": {**data, "revalidation": new_meta}})
+            continue
+
+        print(f"  Notice changed: {row['url']} (status {status})")
+        update_notice(row["id"], {
+            "title": title,
+            "status": status,
+            "data": {**data, "processed_images": processed, "revalidation": new_meta},
+        })
+        counts["updated"] += 1
+        counts["cancelled"] += status == "cancelled"
+        if progress:
+            progress(revalidated=counts["updated"], images_reprocessed=counts["images_reprocessed"])
+
+    print(
+        f"Revalidated {counts['checked']} notice(s): {counts['not_modified']} not modified, "
+        f"{counts['unchanged']} unchanged, {counts['updated']} updated ({counts['cancelled']} cancelled), "
+        f"{counts['images_reprocessed']} image(s) sent to Gemini"
+    )
+    return counts
@@ -0,0 +1,50 @@
+-- Delta sync support for learned_locations (see backend/learned_sync.py).
+-- Run once in the Supabase SQL editor for each environment.
+
+-- 1. updated_at watermark, maintained by trigger on every insert/update
+alter table learned_locations
+  add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists learned_locations_updated_at_idx
+  on learned_locations (updated_at);
+
+create or replace function learned_locations_touch_updated_at()
+returns trigger language plpgsql as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists learned_locations_touch_updated_at on learned_locations;
+create trigger learned_locations_touch_updated_at
+  before insert or update on learned_locations
+  for each row execute function learned_locations_touch_updated_at();
+
+-- 2. Tombstones so deletions (API or dashboard) reach incremental readers
+create table if not exists learned_location_tombstones (
+  learned_location_id bigint primary key,
+  deleted_at timestamptz not null default now()
+);
+
+create index if not exists learned_location_tombstones_deleted_at_idx
+  on learned_location_tombstones (deleted_at);
+
+create or replace function learned_locations_record_tombstone()
+returns trigger language plpgsql as $$
+begin
+  insert into learned_location_tombstones (learned_location_id, deleted_at)
+  values (old.id, now())
+  on conflict (learned_location_id) do update set deleted_at = excluded.deleted_at;
+  return old;
+end;
+$$;
+
+drop trigger if exists learned_locations_record_tombstone on learned_locations;
+create trigger learned_locations_record_tombstone
+  after delete on learned_locations
+  for each row execute function learned_locations_record_tombstone();
+
+-- 3. Tombstones remove verified locations from every worker: no anon
+-- policies, so only the service-role key and the trigger above write them
+alter table learned_location_tombstones enable row level security;
@@ -0,0 +1,22 @@
+-- Per-run Gemini token usage (see backend/gemini_usage.py).
+-- Run once in the Supabase SQL editor for each environment.
+
+create table if not exists gemini_usage_runs (
+  id bigint generated always as identity primary key,
+  started_at timestamptz not null,
+  finished_at timestamptz not null,
+  calls integer not null,
+  prompt_tokens bigint not null,
+  output_tokens bigint not null,
+  total_tokens bigint not null,
+  budget bigint,
+  deferred_notices integer not null default 0,
+  -- per-model and per-notice breakdown, degradation counts, cost estimate
+  details jsonb not null default '{}'::jsonb
+);
+
+create index if not exists gemini_usage_runs_started_at_idx
+  on gemini_usage_runs (started_at);
+
+-- Internal accounting: no anon policies, only the backend's service-role key reads and writes it
+alter table gemini_usage_runs enable row level security;
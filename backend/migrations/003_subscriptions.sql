@@ -0,0 +1,28 @@
+-- Subscriptions for new-schedule notifications (see backend/notify.py).
+-- Run once in the Supabase SQL editor for each environment.
+
+create table if not exists subscriptions (
+  id bigint generated always as identity primary key,
+  barangay_code text not null,
+  -- 'webhook': endpoint is an https URL; 'webpush': endpoint is the browser's PushSubscription JSON
+  kind text not null default 'webhook' check (kind in ('webhook', 'webpush')),
+  endpoint text not null,
+  -- HMAC key for webhook signatures; also what the subscriber presents to unsubscribe
+  secret text not null,
+  active boolean not null default true,
+  created_at timestamptz not null default now()
+);
+
+-- The fan-out loads active rows into an inverted index once per run
+create index if not exists subscriptions_active_barangay_idx
+  on subscriptions (barangay_code) where active;
+
+create index if not exists subscriptions_secret_idx
+  on subscriptions (secret);
+
+create unique index if not exists subscriptions_endpoint_barangay_key
+  on subscriptions (kind, endpoint, barangay_code);
+
+-- Secrets and endpoints are private: no anon policies, so only the
+-- backend's service-role key (which bypasses RLS) can read or write rows
+alter table subscriptions enable row level security;
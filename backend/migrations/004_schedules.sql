@@ -0,0 +1,36 @@
+-- Canonical schedules reconciled across notices (see backend/reconcile.py).
+-- One row per (barangay, interval) however many posts announced it;
+-- cancellation posts flip the matching rows to 'cancelled'.
+-- Run once in the Supabase SQL editor for each environment.
+
+create table if not exists schedules (
+  -- "<barangay code>|<start>|<end>", or the schedule's date/time text when it could not be parsed
+  schedule_key text primary key,
+  barangay_code text,
+  barangay text not null,
+  municipality_code text,
+  municipality text,
+  -- Philippine local time, as in notices.data intervals
+  start_at timestamp,
+  end_at timestamp,
+  all_day boolean not null default false,
+  date_text text,
+  time_text text,
+  affected_area text,
+  reason text,
+  status text not null default 'active' check (status in ('active', 'cancelled')),
+  -- newest announcement of this schedule, and every post that announced it
+  notice_url text not null,
+  source_urls jsonb not null default '[]'::jsonb,
+  cancelled_by text,
+  updated_at timestamptz not null default now()
+);
+
+create index if not exists schedules_barangay_start_idx
+  on schedules (barangay_code, start_at) where status = 'active';
+
+-- The public page reads this table with the anon key, like notices
+alter table schedules enable row level security;
+
+drop policy if exists "schedules are public" on schedules;
+create policy "schedules are public" on schedules for select using (true);
@@ -0,0 +1,12 @@
+-- Idempotent report batches (see backend/report_ingest.py).
+-- The API gives every buffered report a submission_id and writes batches
+-- as upserts ignoring duplicates on it, so a retried batch that had
+-- already been committed is not stored twice.
+-- Run once in the Supabase SQL editor for each environment.
+
+alter table community_reports
+  add column if not exists submission_id uuid;
+
+-- Older rows keep a null submission_id; nulls never conflict
+create unique index if not exists community_reports_submission_id_idx
+  on community_reports (submission_id);
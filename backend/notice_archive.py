@@ -0,0 +1,320 @@
+"""
+Archive of expired notices, flattened to one row per barangay and interval.
+
+delete_old_notices() used to drop expired notices outright, so outage
+history was lost. It now hands them to archive_notices() first, which
+flattens each notice into schedule rows (ARCHIVE_COLUMNS: notice,
+municipality/barangay codes and names, interval start/end, reason, ...)
+and appends them as a new part to month partitions keyed by the
+interval's start:
+
+    notice_archive/month=2026-04/part-20260501T004312-1a2b3c4d.parquet
+    notice_archive/month=2026-04/part-20260502T004108-5e6f7a8b/<column>.json.gz
+
+Parts are Parquet (zstd) when pyarrow is installed. Otherwise each part
+is a directory with one gzipped JSON array per column, so a reader still
+opens only the columns it asks for. Parts are never rewritten; each
+archive run adds new ones.
+
+Parts go to NOTICE_ARCHIVE_DIR, or to the NOTICE_ARCHIVE_BUCKET
+Supabase Storage bucket when that is set. The bucket is required in
+production: the scraper runs on short-lived CI machines, so on CI
+(CI=true) without a bucket archive_notices() refuses to write a local
+archive that would vanish with the runner, and delete_old_notices()
+keeps the expired notices. read_archive() lists only the month partitions
+in the requested range and reads only the requested columns:
+
+    python notice_archive.py --from 2026-01 --to 2026-03 --columns barangay,start,end
+    python notice_archive.py --partitions
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from outage_index import schedule_intervals
+
+load_dotenv()
+
+ARCHIVE_ENABLED = os.getenv("NOTICE_ARCHIVE_ENABLED", "true").lower() == "true"
+ARCHIVE_DIR = Path(os.getenv("NOTICE_ARCHIVE_DIR", "notice_archive"))
+ARCHIVE_BUCKET = os.getenv("NOTICE_ARCHIVE_BUCKET", "")
+# CI runners are discarded after the run; a local archive there is lost
+EPHEMERAL_HOST = os.getenv("CI", "").lower() == "true"
+# auto: Parquet when pyarrow is installed, gzipped JSON columns otherwise
+ARCHIVE_FORMAT = os.getenv("NOTICE_ARCHIVE_FORMAT", "auto")
+
+ARCHIVE_COLUMNS = (
+    "notice_id", "notice_url", "notice_title", "notice_created_at",
+    "municipality_code", "municipality", "barangay_code", "barangay", "affected_area",
+    "start", "end", "all_day", "duration_hours", "reason", "dates", "times", "archived_at",
+)
+# A notice archived twice (archive written, delete failed) reads back once
+DEDUPE_COLUMNS = ("notice_url", "barangay_code", "start", "end")
+
+
+# ==============================
+# Flattening
+# ==============================
+
+def flatten_notice(row: dict, archived_at: str) -> list:
+    """Schedule rows for one notice row (id, title, url, created_at, data)."""
+    rows = []
+    seen = set()
+    for processed in (row.get("data") or {}).get("processed_images", []):
+        for sched in processed.get("structured") or []:
+            intervals = sched.get("intervals")
+            if intervals is None:
+                intervals = schedule_intervals(sched)
+            base = {
+                "notice_id": row.get("id"),
+                "notice_url": row.get("url"),
+                "notice_title": row.get("title"),
+                "notice_created_at": row.get("created_at"),
+                "reason": sched.get("reason"),
+                "dates": "; ".join(sched.get("dates", [])),
+                "times": "; ".join(sched.get("times", [])),
+                "archived_at": archived_at,
+            }
+            for loc in sched.get("locations", []):
+                muni = loc.get("municipality") or {}
+                for bgy in loc.get("barangays", []):
+                    place = {
+                        "municipality_code": muni.get("code"),
+                        "municipality": muni.get("name"),
+                        "barangay_code": bgy.get("code"),
+                        "barangay": bgy.get("name"),
+                        "affected_area": bgy.get("affected_area"),
+                    }
+                    # Unparsed dates still keep the row, without an interval
+                    for iv in intervals or [None]:
+                        key = (bgy.get("code") or bgy.get("name"), iv and iv["start"], iv and iv["end"])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        duration = None
+                        if iv:
+                            delta = datetime.fromisoformat(iv["end"]) - datetime.fromisoformat(iv["start"])
+                            duration = round(delta.total_seconds() / 3600, 2)
+                        rows.append({
+                            **base,
+                            **place,
+                            "start": iv and iv["start"],
+                            "end": iv and iv["end"],
+                            "all_day": iv.get("all_day", False) if iv else None,
+                            "duration_hours": duration,
+                        })
+    return rows
+
+
+def _month_of(row: dict) -> str:
+    return (row["start"] or row["notice_created_at"] or row["archived_at"])[:7]
+
+
+# ==============================
+# Storage (local directory or Supabase Storage bucket)
+# ==============================
+
+def _bucket():
+    from supabase_client import get_client
+
+    return get_client().storage.from_(ARCHIVE_BUCKET)
+
+
+def _put(path: str, payload: bytes):
+    if ARCHIVE_BUCKET:
+        _bucket().upload(path, payload, {"content-type": "application/octet-stream"})
+        return
+    target = ARCHIVE_DIR / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(f".{target.name}.tmp")
+    staging.write_bytes(payload)
+    os.replace(staging, target)
+
+
+def _get(path: str) -> bytes:
+    if ARCHIVE_BUCKET:
+        return _bucket().download(path)
+    return (ARCHIVE_DIR / path).read_bytes()
+
+
+def _list(prefix: str = "") -> list:
+    """Names directly under `prefix` (files and directories)."""
+    if ARCHIVE_BUCKET:
+        return sorted(e["name"] for e in _bucket().list(prefix or None, {"limit": 10000}))
+    folder = ARCHIVE_DIR / prefix
+    return sorted(p.name for p in folder.iterdir()) if folder.is_dir() else []
+
+
+def _use_parquet() -> bool:
+    if ARCHIVE_FORMAT != "auto":
+        return ARCHIVE_FORMAT == "parquet"
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _write_part(month: str, rows: list, stamp: str) -> str:
+    part = f"month={month}/part-{stamp}-{uuid.uuid4().hex[:8]}"
+    columns = {c: [r[c] for r in rows] for c in ARCHIVE_COLUMNS}
+    if _use_parquet():
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buf = io.BytesIO()
+        pq.write_table(pa.Table.from_pydict(columns), buf, compression="zstd")
+        _put(f"{part}.parquet", buf.getvalue())
+        return f"{part}.parquet"
+
+    if ARCHIVE_BUCKET:
+        for column, values in columns.items():
+            _put(f"{part}/{column}.json.gz", gzip.compress(json.dumps(values).encode("utf-8")))
+        return part
+    # Locally, build the part under a temp name so readers never see half of it
+    staging = ARCHIVE_DIR / f"month={month}" / f".{Path(part).name}.tmp"
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        for column, values in columns.items():
+            (staging / f"{column}.json.gz").write_bytes(gzip.compress(json.dumps(values).encode("utf-8")))
+        staging.rename(ARCHIVE_DIR / part)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return part
+
+
+def archive_notices(rows: list) -> int:
+    """Append the schedule rows of expired notice rows to the archive. Returns rows written; raises on failure."""
+    if EPHEMERAL_HOST and not ARCHIVE_BUCKET:
+        raise RuntimeError("NOTICE_ARCHIVE_BUCKET is not set; a local archive on a CI runner would be lost")
+    now = datetime.now(timezone.utc)
+    archived_at = now.isoformat()
+    by_month = {}
+    for row in rows:
+        for flat in flatten_notice(row, archived_at):
+            by_month.setdefault(_month_of(flat), []).append(flat)
+
+    stamp = now.strftime("%Y%m%dT%H%M%S")
+    written = 0
+    for month, month_rows in sorted(by_month.items()):
+        month_rows.sort(key=lambda r: (r["barangay_code"] or "", r["start"] or ""))
+        _write_part(month, month_rows, stamp)
+        written += len(month_rows)
+    if written:
+        where = f"bucket {ARCHIVE_BUCKET}" if ARCHIVE_BUCKET else str(ARCHIVE_DIR)
+        print(f"Archive: {written} schedule rows from {len(rows)} notices in {len(by_month)} month partition(s) ({where})")
+    return written
+
+
+# ==============================
+# Reading
+# ==============================
+
+def partitions() -> list:
+    """Archived months ("YYYY-MM"), oldest first."""
+    return [name.split("=", 1)[1] for name in _list() if name.startswith("month=")]
+
+
+def list_parts(start_month: str = None, end_month: str = None) -> list:
+    """[(month, part name)] for months start_month..end_month ("YYYY-MM", inclusive, open-ended when omitted)."""
+    parts = []
+    for month in partitions():
+        if (start_month and month < start_month) or (end_month and month > end_month):
+            continue
+        parts.extend((month, name) for name in _list(f"month={month}") if name.startswith("part-"))
+    return parts
+
+
+def read_part(month: str, name: str, columns: list) -> dict:
+    """{column: [values]} for the given columns of one part."""
+    path = f"month={month}/{name}"
+    if name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(io.BytesIO(_get(path)), columns=columns).to_pydict()
+    return {c: json.loads(gzip.decompress(_get(f"{path}/{c}.json.gz"))) for c in columns}
+
+
+def read_archive(start_month: str = None, end_month: str = None, columns=None,
+                 where: dict = None, dedupe: bool = True) -> list:
+    """
+    Archived rows for months start_month..end_month, projected to
+    `columns` (all by default). `where` maps a column to a value, or a
+    set/list of values, to keep. Only the matching partitions, and in
+    each part only the needed columns, are read.
+    """
+    columns = list(columns or ARCHIVE_COLUMNS)
+    unknown = [c for c in columns + list(where or {}) if c not in ARCHIVE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown archive column(s): {', '.join(unknown)}")
+    filters = {
+        c: set(v) if isinstance(v, (set, list, tuple, frozenset)) else {v}
+        for c, v in (where or {}).items()
+    }
+    needed = list(dict.fromkeys(columns + list(filters) + (list(DEDUPE_COLUMNS) if dedupe else [])))
+
+    result = []
+    seen = set()
+    for month, name in list_parts(start_month, end_month):
+        try:
+            data = read_part(month, name, needed)
+        except Exception as e:
+            # A part an interrupted upload left incomplete; the rest of the archive is fine
+            print(f"  Note: Skipping archive part {month}/{name} ({e})", file=sys.stderr)
+            continue
+        for i in range(len(data[needed[0]])):
+            if any(data[c][i] not in allowed for c, allowed in filters.items()):
+                continue
+            if dedupe:
+                key = tuple(data[c][i] for c in DEDUPE_COLUMNS)
+                if key in seen:
+                    continue
+                seen.add(key)
+            result.append({c: data[c][i] for c in columns})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start_month", help="first month, YYYY-MM")
+    parser.add_argument("--to", dest="end_month", help="last month, YYYY-MM")
+    parser.add_argument("--columns", help=f"comma-separated; default all of: {','.join(ARCHIVE_COLUMNS)}")
+    parser.add_argument("--municipality-code")
+    parser.add_argument("--barangay-code")
+    parser.add_argument("--csv", action="store_true", help="CSV instead of JSON lines")
+    parser.add_argument("--partitions", action="store_true", help="list archived months and exit")
+    args = parser.parse_args()
+
+    if args.partitions:
+        for month in partitions():
+            print(month)
+        return
+    where = {}
+    if args.municipality_code:
+        where["municipality_code"] = args.municipality_code
+    if args.barangay_code:
+        where["barangay_code"] = args.barangay_code
+    columns = args.columns.split(",") if args.columns else list(ARCHIVE_COLUMNS)
+    rows = read_archive(args.start_month, args.end_month, columns, where)
+    if args.csv:
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Response schema for Gemini notice extraction, and a validator for it.
+
+safe_generate() passes NOTICE_RESPONSE_SCHEMA as the response schema so
+the model returns bare JSON in the notices → locations → barangays shape
+instead of prose with a JSON block somewhere inside. validate_notices()
+double-checks what comes back (hand-written, no jsonschema dependency)
+and reports where it is wrong, so a malformed response can be repaired
+instead of silently dropping the image.
+"""
+import json
+
+NOTICE_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "notices": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "dates": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "times": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "duration_hours": {"type": "NUMBER", "nullable": True},
+                    "locations": {
+                        "type": "ARRAY",
+                        "items": {
+                            "type": "OBJECT",
+                            "properties": {
+                                "municipality": {"type": "STRING"},
+                                "all_barangays": {"type": "BOOLEAN"},
+                                "barangays": {
+                                    "type": "ARRAY",
+                                    "items": {
+                                        "type": "OBJECT",
+                                        "properties": {
+                                            "name": {"type": "STRING"},
+                                            "affected_area": {"type": "STRING", "nullable": True},
+                                        },
+                                        "required": ["name", "affected_area"],
+                                    },
+                                },
+                            },
+                            "required": ["municipality", "all_barangays", "barangays"],
+                        },
+                    },
+                    "reason": {"type": "STRING", "nullable": True},
+                },
+                "required": ["dates", "times", "locations"],
+            },
+        },
+    },
+    "required": ["notices"],
+}
+
+_PY_TYPES = {
+    "OBJECT": dict,
+    "ARRAY": list,
+    "STRING": str,
+    "NUMBER": (int, float),
+    "BOOLEAN": bool,
+}
+
+# Stop collecting after this many problems; the repair prompt only needs a few
+MAX_ERRORS = 10
+
+
+def _validate(value, schema: dict, path: str, errors: list):
+    if len(errors) >= MAX_ERRORS:
+        return
+    if value is None:
+        if not schema.get("nullable"):
+            errors.append(f"{path}: must not be null")
+        return
+    expected = _PY_TYPES[schema["type"]]
+    # bool is an int subclass; don't accept true/false as a number
+    if not isinstance(value, expected) or (schema["type"] == "NUMBER" and isinstance(value, bool)):
+        errors.append(f"{path}: expected {schema['type'].lower()}, got {type(value).__name__}")
+        return
+    if schema["type"] == "OBJECT":
+        for key in schema.get("required", ()):
+            if key not in value:
+                errors.append(f"{path}.{key}: missing")
+        for key, sub in schema["properties"].items():
+            if key in value:
+                _validate(value[key], sub, f"{path}.{key}", errors)
+    elif schema["type"] == "ARRAY":
+        for i, item in enumerate(value):
+            _validate(item, schema["items"], f"{path}[{i}]", errors)
+
+
+def validate_notices(obj, schema: dict = NOTICE_RESPONSE_SCHEMA) -> list:
+    """Problems with `obj` against the schema, as "$.path: message" strings (empty if valid)."""
+    errors = []
+    _validate(obj, schema, "$", errors)
+    return errors
+
+
+def parse_notices(text: str) -> tuple:
+    """
+    Parse and validate a model response. Returns (result, errors): the
+    decoded object when it is valid, otherwise ({}, [problems]).
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        # Fenced despite JSON mode; take what's inside
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        obj = json.loads(text)
+    except (TypeError, ValueError) as e:
+        return {}, [f"$: not valid JSON ({e})"]
+    errors = validate_notices(obj)
+    return (obj, []) if not errors else ({}, errors)
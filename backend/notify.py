@@ -0,0 +1,309 @@
+"""
+Fan-out of new schedules to subscribers.
+
+Residents (or services acting for them) subscribe an endpoint to one or
+more barangay codes in the subscriptions table
+(migrations/003_subscriptions.sql). After a scrape saves new notices,
+fan_out():
+
+1. loads the active subscriptions into an inverted index,
+   {barangay code: [subscription, ...]}, with one paged scan per run,
+2. turns each new schedule into events, one per affected barangay, and
+   resolves its subscribers with a dict lookup per barangay (no scan of
+   the subscribers per notice),
+3. groups the events per endpoint (kind, endpoint, secret). A
+   subscriber following several barangays gets one request per batch
+   of up to NOTIFY_BATCH_SIZE events, not one per barangay,
+4. delivers through a pool of NOTIFY_WORKERS threads with at most
+   NOTIFY_ENDPOINT_CONCURRENCY requests in flight per endpoint. Timeouts,
+   429s and 5xx responses go back on a retry queue with exponential
+   backoff, up to NOTIFY_MAX_ATTEMPTS. 404/410 deactivate the subscription.
+
+Webhooks are POSTed as JSON, signed with HMAC-SHA256 of the body using
+the subscription's secret (X-Signature: sha256=<hex>). A new webhook
+endpoint must first echo a verification challenge (verify_webhook()). Web push
+subscriptions are delivered with pywebpush when it is installed and
+VAPID keys are configured; otherwise they are skipped and counted.
+
+    python benchmarks/bench_fanout.py --subscribers 20000   # against a local webhook sink
+"""
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from tracing import span
+
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "true").lower() == "true"
+WORKERS = int(os.getenv("NOTIFY_WORKERS", "32"))
+ENDPOINT_CONCURRENCY = int(os.getenv("NOTIFY_ENDPOINT_CONCURRENCY", "2"))
+BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "4"))
+RETRY_BACKOFF = float(os.getenv("NOTIFY_RETRY_BACKOFF_SECONDS", "2"))
+TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT_SECONDS", "10"))
+VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
+VAPID_SUBJECT = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com")
+
+SUBSCRIPTION_COLUMNS = "id,barangay_code,kind,endpoint,secret"
+
+_local = threading.local()
+
+
+# ==============================
+# Subscribers and events
+# ==============================
+
+def build_subscriber_index(rows: list) -> dict:
+    """{barangay code: [subscription row, ...]} for active subscription rows."""
+    index = {}
+    for row in rows:
+        if row.get("barangay_code") and row.get("endpoint"):
+            index.setdefault(row["barangay_code"], []).append(row)
+    return index
+
+
+def load_subscriber_index() -> dict:
+    from learned_sync import fetch_pages
+
+    rows = fetch_pages(
+        "subscriptions",
+        lambda t: t.select(SUBSCRIPTION_COLUMNS).eq("active", True).order("id"),
+    )
+    return build_subscriber_index(rows)
+
+
+def notice_events(notice: dict):
+    """Yield (barangay code, event) for every barangay named in a processed notice."""
+    for processed in notice.get("processed_images", []):
+        for sched in processed.get("structured") or []:
+            for loc in sched.get("locations", []):
+                muni = loc.get("municipality") or {}
+                for bgy in loc.get("barangays", []):
+                    if not bgy.get("code"):
+                        continue
+                    yield bgy["code"], {
+                        "notice": {"title": notice.get("title"), "url": notice.get("url")},
+                        "municipality": muni.get("name"),
+                        "barangay": {"code": bgy["code"], "name": bgy.get("name")},
+                        "affected_area": bgy.get("affected_area"),
+                        "dates": sched.get("dates", []),
+                        "times": sched.get("times", []),
+                        "intervals": sched.get("intervals", []),
+                        "reason": sched.get("reason"),
+                    }
+
+
+def plan_deliveries(notices: list, subscriber_index: dict) -> list:
+    """
+    Group the events for `notices` per endpoint and split them into
+    batches. Returns [{"kind", "endpoint", "secret", "subscription_ids", "events"}].
+    """
+    by_endpoint = {}
+    seen = set()
+    for notice in notices:
+        for code, event in notice_events(notice):
+            for sub in subscriber_index.get(code, ()):
+                key = (sub.get("kind") or "webhook", sub["endpoint"], sub.get("secret"))
+                # A barangay listed on several images of one notice is one event
+                dedupe = (key, code, notice.get("url"), json.dumps(event["intervals"]))
+                if dedupe in seen:
+                    continue
+                seen.add(dedupe)
+                group = by_endpoint.setdefault(key, {"subscription_ids": set(), "events": []})
+                group["subscription_ids"].add(sub["id"])
+                group["events"].append(event)
+
+    deliveries = []
+    for (kind, endpoint, secret), group in by_endpoint.items():
+        for start in range(0, len(group["events"]), BATCH_SIZE):
+            deliveries.append({
+                "kind": kind,
+                "endpoint": endpoint,
+                "secret": secret,
+                "subscription_ids": sorted(group["subscription_ids"]),
+                "events": group["events"][start:start + BATCH_SIZE],
+            })
+    return deliveries
+
+
+# ==============================
+# Delivery
+# ==============================
+
+def _session() -> requests.Session:
+    # One keep-alive session per worker thread
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _send_webhook(delivery: dict) -> int:
+    body = json.dumps({"type": "brownout.schedules", "events": delivery["events"]}, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if delivery["secret"]:
+        digest = hmac.new(delivery["secret"].encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Signature"] = f"sha256={digest}"
+    return _session().post(delivery["endpoint"], data=body, headers=headers, timeout=TIMEOUT).status_code
+
+
+def verify_webhook(endpoint: str, secret: str) -> bool:
+    """
+    Subscription handshake for a new webhook endpoint: POST a signed
+    {"type": "brownout.verify", "challenge": ...} and expect the challenge
+    echoed back as {"challenge": ...}, so only the endpoint's owner can
+    subscribe it.
+    """
+    challenge = secrets.token_urlsafe(16)
+    body = json.dumps({"type": "brownout.verify", "challenge": challenge}, separators=(",", ":")).encode()
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    headers = {"Content-Type": "application/json", "X-Signature": f"sha256={digest}"}
+    try:
+        resp = requests.post(endpoint, data=body, headers=headers, timeout=TIMEOUT, allow_redirects=False)
+        return 200 <= resp.status_code < 300 and resp.json().get("challenge") == challenge
+    except (requests.RequestException, ValueError, AttributeError):
+        return False
+
+
+def _send_webpush(delivery: dict):
+    """Status code of the push, or None when web push isn't available here."""
+    try:
+        from pywebpush import WebPushException, webpush
+    except ImportError:
+        return None
+    if not VAPID_PRIVATE_KEY:
+        return None
+    # Push payloads are capped at ~4 KB: a short summary, the app fetches details
+    first = delivery["events"][0]
+    payload = {
+        "title": "Scheduled brownout",
+        "body": f"{len(delivery['events'])} new schedule(s) for {first['barangay']['name']}, {first['municipality']}",
+        "url": first["notice"]["url"],
+    }
+    try:
+        resp = webpush(
+            subscription_info=json.loads(delivery["endpoint"]),
+            data=json.dumps(payload),
+            vapid_private_key=VAPID_PRIVATE_KEY,
+            vapid_claims={"sub": VAPID_SUBJECT},
+            timeout=TIMEOUT,
+        )
+        return resp.status_code
+    except WebPushException as e:
+        return e.response.status_code if e.response is not None else 599
+
+
+def _attempt(delivery: dict):
+    """One delivery attempt: "ok", "retry", "gone", "failed" or "skipped"."""
+    try:
+        status = _send_webpush(delivery) if delivery["kind"] == "webpush" else _send_webhook(delivery)
+    except requests.RequestException:
+        return "retry"
+    if status is None:
+        return "skipped"
+    if 200 <= status < 300:
+        return "ok"
+    if status in (404, 410):
+        return "gone"
+    if status == 429 or status >= 500:
+        return "retry"
+    return "failed"
+
+
+def deliver(deliveries: list) -> dict:
+    """
+    Deliver with per-endpoint concurrency limits and a retry queue.
+    Returns counters plus "gone_subscription_ids".
+    """
+    counts = Counter()
+    gone = set()
+    # Retry queue ordered by due time; seq keeps heap comparisons off the dicts
+    queue = [(0.0, seq, 1, d) for seq, d in enumerate(deliveries)]
+    heapq.heapify(queue)
+    seq = len(deliveries)
+    in_flight = Counter()
+    waiting = {}  # future -> (delivery, attempt)
+
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="notify") as pool:
+        while queue or waiting:
+            now = time.monotonic()
+            deferred = []
+            while queue and queue[0][0] <= now and len(waiting) < WORKERS * 2:
+                item = heapq.heappop(queue)
+                d = item[3]
+                if in_flight[d["endpoint"]] >= ENDPOINT_CONCURRENCY:
+                    deferred.append(item)
+                    continue
+                in_flight[d["endpoint"]] += 1
+                waiting[pool.submit(_attempt, d)] = (d, item[2])
+            for item in deferred:
+                heapq.heappush(queue, item)
+
+            if not waiting:
+                time.sleep(max(0.0, queue[0][0] - time.monotonic()))
+                continue
+            # Wake for the next due retry, unless only a completion can free a slot
+            saturated = deferred or len(waiting) >= WORKERS * 2
+            timeout = max(0.0, queue[0][0] - time.monotonic()) if queue and not saturated else None
+            done, _ = wait(list(waiting), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                d, attempt = waiting.pop(future)
+                in_flight[d["endpoint"]] -= 1
+                outcome = future.result()
+                if outcome == "retry" and attempt < MAX_ATTEMPTS:
+                    counts["retries"] += 1
+                    due = time.monotonic() + RETRY_BACKOFF * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                    heapq.heappush(queue, (due, seq, attempt + 1, d))
+                    seq += 1
+                    continue
+                counts["failed" if outcome == "retry" else outcome] += 1
+                counts["events_delivered"] += len(d["events"]) if outcome == "ok" else 0
+                if outcome == "gone":
+                    gone.update(d["subscription_ids"])
+    return {**counts, "gone_subscription_ids": sorted(gone)}
+
+
+def _deactivate(subscription_ids: list):
+    from supabase_client import run_query
+
+    for start in range(0, len(subscription_ids), 200):
+        batch = subscription_ids[start:start + 200]
+        run_query("subscriptions", "update", lambda t: t.update({"active": False}).in_("id", batch))
+
+
+def fan_out(notices: list) -> dict:
+    """Notify subscribers of the barangays in newly saved `notices`. Never raises."""
+    if not NOTIFY_ENABLED or not notices:
+        return {}
+    try:
+        with span("notify_index") as attrs:
+            subscriber_index = load_subscriber_index()
+            attrs["barangays"] = len(subscriber_index)
+        deliveries = plan_deliveries(notices, subscriber_index)
+        if not deliveries:
+            return {"deliveries": 0}
+        with span("notify_deliver", deliveries=len(deliveries)) as attrs:
+            result = deliver(deliveries)
+            attrs.update({k: v for k, v in result.items() if k != "gone_subscription_ids"})
+        if result["gone_subscription_ids"]:
+            _deactivate(result["gone_subscription_ids"])
+        result["deliveries"] = len(deliveries)
+        print(
+            f"Notified {result.get('ok', 0)} of {len(deliveries)} endpoint batch(es) "
+            f"({result.get('events_delivered', 0)} events, {result.get('retries', 0)} retries, "
+            f"{result.get('failed', 0)} failed, {len(result['gone_subscription_ids'])} unsubscribed, "
+            f"{result.get('skipped', 0)} skipped)"
+        )
+        return result
+    except Exception as e:
+        # Non-critical — the notices are saved either way
+        print(f"  Note: Subscriber fan-out failed ({e})")
+        return {"error": str(e)}
@@ -0,0 +1,260 @@
+"""
+Time-interval index of scheduled outages, per barangay code.
+
+Notices store their schedules as free text ("April 15 & 16, 2026",
+"8:30AM - 5:00PM"). normalize_schedules() now also stores them parsed, as
+"intervals" on each schedule (see schedule_intervals()): one
+[start, end) per date and time range, in Philippine time, with
+overnight ranges ending the next day and date-only schedules covering
+the whole day.
+
+build_index() turns the active notices into, per barangay code, a list
+of intervals sorted by start plus a running maximum of their ends. A
+point or range query is then a bisect on the starts followed by a short
+walk back that stops as soon as no earlier interval can still be
+running, so it doesn't scan every notice. The API keeps one index,
+rebuilt from the database every OUTAGE_INDEX_TTL_SECONDS (and right
+after a scrape job saves notices).
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+
+from text_extract import TIME_RANGE_RE, parse_clock
+
+# Schedules are posted in Philippine time (UTC+8, no DST)
+MANILA = timezone(timedelta(hours=8))
+INDEX_TTL = float(os.getenv("OUTAGE_INDEX_TTL_SECONDS", "60"))
+
+_MONTHS = (
+    "january|february|march|april|may|june|july|august|"
+    "september|october|november|december|"
+    "jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec"
+)
+# "April 14, 2026", "April 15 & 16, 2026", "Apr. 15-17 2026", "April 30" (year from a later date)
+_DATE_GROUP_RE = re.compile(
+    rf"\b({_MONTHS})\.?\s+(\d{{1,2}}\b(?:\s*(?:&|,|and|-|–|to)\s*\d{{1,2}}\b)*)(?:,?\s+(\d{{4}}))?",
+    re.IGNORECASE,
+)
+_DAY_RANGE_RE = re.compile(r"^(\d{1,2})\s*(?:-|–|to)\s*(\d{1,2})$", re.IGNORECASE)
+_DAY_SPLIT_RE = re.compile(r"\s*(?:&|,|\band\b)\s*", re.IGNORECASE)
+
+
+def parse_dates(text: str, default_year: int = None) -> list:
+    """Every calendar date in a schedule's date string, in order."""
+    groups = []
+    for m in _DATE_GROUP_RE.finditer(text or ""):
+        month = datetime.strptime(m.group(1)[:3].title(), "%b").month
+        days = []
+        for part in _DAY_SPLIT_RE.split(m.group(2)):
+            span = _DAY_RANGE_RE.match(part.strip())
+            if span:
+                days.extend(range(int(span.group(1)), int(span.group(2)) + 1))
+            elif part.strip().isdigit():
+                days.append(int(part))
+        groups.append([month, days, int(m.group(3)) if m.group(3) else None])
+
+    if not groups:
+        # Anything else dateutil can read ("2026-04-14", "14 April 2026")
+        try:
+            from dateutil import parser as dateutil_parser
+
+            return [dateutil_parser.parse(text, fuzzy=True).date()] if text and re.search(r"\d", text) else []
+        except (ValueError, OverflowError):
+            return []
+
+    # "April 30 & May 1, 2026": a group without a year takes the next one's
+    year = default_year or date.today().year
+    for group in reversed(groups):
+        if group[2] is None:
+            group[2] = year
+        year = group[2]
+
+    dates = []
+    for month, days, year in groups:
+        for day in days:
+            try:
+                d = date(year, month, day)
+            except ValueError:
+                continue
+            if d not in dates:
+                dates.append(d)
+    return dates
+
+
+def schedule_intervals(sched: dict) -> list:
+    """
+    [{"start", "end", "all_day"}] (ISO local times) for one normalized
+    schedule: every date crossed with every time range.
+    """
+    dates = []
+    for text in sched.get("dates", []):
+        dates.extend(d for d in parse_dates(text) if d not in dates)
+
+    ranges = []
+    for text in sched.get("times", []):
+        for start, end in TIME_RANGE_RE.findall(text or ""):
+            a, b = parse_clock(start), parse_clock(end)
+            if a is not None and b is not None:
+                ranges.append((a.time(), b.time()))
+
+    intervals = []
+    for d in sorted(dates):
+        if not ranges:
+            start = datetime.combine(d, datetime.min.time())
+            intervals.append({"start": start.isoformat(), "end": (start + timedelta(days=1)).isoformat(), "all_day": True})
+            continue
+        for a, b in ranges:
+            start, end = datetime.combine(d, a), datetime.combine(d, b)
+            if end <= start:
+                # "10:00PM - 2:00AM" runs into the next day
+                end += timedelta(days=1)
+            intervals.append({"start": start.isoformat(), "end": end.isoformat(), "all_day": False})
+    return intervals
+
+
+def parse_time(value: str = None) -> datetime:
+    """Query time as naive Philippine time: ISO string (any offset) or now. Raises ValueError."""
+    if not value:
+        return datetime.now(MANILA).replace(tzinfo=None)
+    t = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return t.astimezone(MANILA).replace(tzinfo=None) if t.tzinfo else t
+
+
+# ==============================
+# Index
+# ==============================
+
+def build_index(rows: list) -> dict:
+    """
+    Index notice rows (id, title, url, data) by barangay code:
+    {"barangays": {code: {"starts", "max_ends", "entries"}}, "municipalities": {code: {barangay codes}}}.
+    """
+    by_code = {}
+    municipalities = {}
+    seen = set()
+    for row in rows:
+        notice = {"id": row.get("id"), "title": row.get("title"), "url": row.get("url")}
+        for processed in (row.get("data") or {}).get("processed_images", []):
+            for sched in processed.get("structured") or []:
+                # Rows saved before intervals were stored are parsed here
+                intervals = sched.get("intervals")
+                if intervals is None:
+                    intervals = schedule_intervals(sched)
+                for loc in sched.get("locations", []):
+                    muni = loc.get("municipality") or {}
+                    for bgy in loc.get("barangays", []):
+                        code = bgy.get("code")
+                        if not code:
+                            continue
+                        if muni.get("code"):
+                            municipalities.setdefault(muni["code"], set()).add(code)
+                        for iv in intervals:
+                            key = (code, iv["start"], iv["end"], notice["url"])
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            by_code.setdefault(code, []).append({
+                                "start": datetime.fromisoformat(iv["start"]),
+                                "end": datetime.fromisoformat(iv["end"]),
+                                "all_day": iv.get("all_day", False),
+                                "barangay": bgy.get("name"),
+                                "municipality": muni.get("name"),
+                                "affected_area": bgy.get("affected_area"),
+                                "reason": sched.get("reason"),
+                                "notice": notice,
+                            })
+
+    barangays = {}
+    for code, entries in by_code.items():
+        entries.sort(key=lambda e: (e["start"], e["end"]))
+        max_ends = []
+        running = datetime.min
+        for e in entries:
+            running = max(running, e["end"])
+            max_ends.append(running)
+        barangays[code] = {"starts": [e["start"] for e in entries], "max_ends": max_ends, "entries": entries}
+    return {"barangays": barangays, "municipalities": municipalities, "built_at": time.time()}
+
+
+def _overlapping(slot: dict, start: datetime, end: datetime) -> list:
+    """Entries with entry.start < end and entry.end > start, in start order."""
+    found = []
+    i = bisect_left(slot["starts"], end) - 1
+    # max_ends is non-decreasing, so once it is <= start nothing earlier overlaps
+    while i >= 0 and slot["max_ends"][i] > start:
+        if slot["entries"][i]["end"] > start:
+            found.append(slot["entries"][i])
+        i -= 1
+    found.reverse()
+    return found
+
+
+def outages_at(index: dict, barangay_code: str, at: datetime) -> list:
+    """Outages in effect for a barangay at one moment."""
+    return outages_between(index, barangay_code, at, at + timedelta(microseconds=1))
+
+
+def outages_between(index: dict, barangay_code: str, start: datetime, end: datetime) -> list:
+    """Outages for a barangay overlapping [start, end)."""
+    slot = index["barangays"].get(barangay_code)
+    return _overlapping(slot, start, end) if slot else []
+
+
+def affected_in_municipality(index: dict, municipality_code: str, at: datetime) -> list:
+    """[{"code", "name", "outages"}] for the municipality's barangays without power at `at`."""
+    affected = []
+    for code in sorted(index["municipalities"].get(municipality_code, ())):
+        outages = outages_at(index, code, at)
+        if outages:
+            affected.append({"code": code, "name": outages[0]["barangay"], "outages": outages})
+    return affected
+
+
+def serialize(entry: dict) -> dict:
+    return {
+        "start": entry["start"].isoformat(),
+        "end": entry["end"].isoformat(),
+        "all_day": entry["all_day"],
+        "affected_area": entry["affected_area"],
+        "reason": entry["reason"],
+        "notice": entry["notice"],
+    }
+
+
+# ==============================
+# Shared instance for the API
+# ==============================
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index(force: bool = False) -> dict:
+    """The current index, rebuilt from the active notices when older than OUTAGE_INDEX_TTL_SECONDS."""
+    global _index
+    current = _index
+    if current is not None and not force and time.time() - current["built_at"] < INDEX_TTL:
+        return current
+    # One thread rebuilds; the others keep answering from the current index
+    if not _lock.acquire(blocking=current is None or force):
+        return current
+    try:
+        if _index is not None and not force and time.time() - _index["built_at"] < INDEX_TTL:
+            return _index
+        from db import get_active_notices
+
+        _index = build_index(get_active_notices())
+        return _index
+    finally:
+        _lock.release()
+
+
+def invalidate():
+    """Force a rebuild on the next query (called after notices are saved)."""
+    global _index
+    if _index is not None:
+        _index = {**_index, "built_at": 0.0}
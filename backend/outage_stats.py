@@ -0,0 +1,368 @@
+"""
+Reliability statistics over scheduled outages, per barangay and municipality.
+
+The inputs are the flattened schedule rows of notice_archive.py: the
+archived (expired) notices plus the active ones, flattened the same
+way. They are held as one column-oriented frame of NumPy arrays:
+interval start/end (datetime64[m]), hours, an all-day flag, and integer
+barangay/municipality ids into label tables. Every statistic is then a
+vectorized group-by (np.bincount over the ids, or over id * width +
+month/weekday), not a walk over the nested notices.data JSON:
+
+- outage count and hours per barangay, per municipality and per month,
+- the most interrupted barangays and municipalities,
+- weekday and start-hour distributions, and each barangay's typical
+  weekday and start hour.
+
+The frame is refreshed incrementally. Archive parts already loaded are
+kept as array chunks and only new parts are read; active notices are
+re-flattened, since that table is small. Refreshes happen every
+OUTAGE_STATS_TTL_SECONDS, or on the next query after a scrape job saves
+notices. Results are cached per query until the next refresh.
+
+    python outage_stats.py --from 2025-01 --to 2025-12 --municipality 097201000
+    python benchmarks/bench_outage_stats.py --years 5
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import notice_archive
+
+STATS_TTL = float(os.getenv("OUTAGE_STATS_TTL_SECONDS", "900"))
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+LOAD_COLUMNS = (
+    "notice_url", "municipality_code", "municipality", "barangay_code", "barangay",
+    "start", "end", "all_day", "duration_hours",
+)
+_MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+# ==============================
+# Frame
+# ==============================
+
+def new_labels() -> dict:
+    """Label tables shared by every chunk of one frame: code -> id, plus names per id."""
+    return {"barangay_ids": {}, "barangays": [], "municipality_ids": {}, "municipalities": []}
+
+
+def _label(ids: dict, names: list, code, name, extra: tuple = ()) -> int:
+    i = ids.get(code)
+    if i is None:
+        i = ids[code] = len(names)
+        names.append((code, name) + extra)
+    return i
+
+
+def make_chunk(columns: dict, labels: dict, skip_keys: set = None, keys: set = None) -> dict:
+    """
+    Arrays for flattened rows given as {column: [values]}. Rows without an
+    interval or a barangay code are dropped, as are rows whose
+    (notice_url, barangay_code, start, end) is in `skip_keys`; the keys of
+    the rows kept are added to `keys`.
+    """
+    starts, ends, hours, all_day, bgy, muni = [], [], [], [], [], []
+    codes = columns["barangay_code"]
+    for i in range(len(codes)):
+        start, end = columns["start"][i], columns["end"][i]
+        if not start or not end or not codes[i]:
+            continue
+        key = (columns["notice_url"][i], codes[i], start, end)
+        if skip_keys is not None and key in skip_keys:
+            continue
+        if keys is not None:
+            keys.add(key)
+        m = _label(labels["municipality_ids"], labels["municipalities"],
+                   columns["municipality_code"][i] or columns["municipality"][i], columns["municipality"][i])
+        bgy.append(_label(labels["barangay_ids"], labels["barangays"], codes[i], columns["barangay"][i], (m,)))
+        muni.append(m)
+        starts.append(start)
+        ends.append(end)
+        duration = columns["duration_hours"][i]
+        hours.append(duration if duration is not None else np.nan)
+        all_day.append(bool(columns["all_day"][i]))
+
+    chunk = {
+        "start": np.array(starts, dtype="datetime64[m]"),
+        "end": np.array(ends, dtype="datetime64[m]"),
+        "hours": np.array(hours, dtype=np.float64),
+        "all_day": np.array(all_day, dtype=bool),
+        "bgy": np.array(bgy, dtype=np.int32),
+        "muni": np.array(muni, dtype=np.int32),
+    }
+    missing = np.isnan(chunk["hours"])
+    if missing.any():
+        chunk["hours"][missing] = (chunk["end"][missing] - chunk["start"][missing]).astype(np.float64) / 60
+    return chunk
+
+
+def combine(chunks: list, labels: dict) -> dict:
+    """One frame from a list of chunks built with the same labels."""
+    frame = {
+        name: np.concatenate([c[name] for c in chunks]) if chunks else np.array([], dtype=dtype)
+        for name, dtype in (
+            ("start", "datetime64[m]"), ("end", "datetime64[m]"), ("hours", np.float64),
+            ("all_day", bool), ("bgy", np.int32), ("muni", np.int32),
+        )
+    }
+    frame["labels"] = {k: (dict(v) if isinstance(v, dict) else list(v)) for k, v in labels.items()}
+    frame["built_at"] = time.time()
+    return frame
+
+
+def _columns(rows: list) -> dict:
+    return {c: [r[c] for r in rows] for c in LOAD_COLUMNS}
+
+
+# ==============================
+# Statistics
+# ==============================
+
+def _parse_month(value: str):
+    if value is None:
+        return None
+    if not _MONTH_RE.match(value):
+        raise ValueError("Months must be YYYY-MM")
+    return np.datetime64(value, "M")
+
+
+def compute(frame: dict, start_month: str = None, end_month: str = None,
+            municipality_code: str = None, barangay_code: str = None, top: int = 10) -> dict:
+    """Aggregates for the outages starting in start_month..end_month (YYYY-MM, inclusive), optionally scoped."""
+    first, last = _parse_month(start_month), _parse_month(end_month)
+    labels = frame["labels"]
+    n_bgy, n_muni = len(labels["barangays"]), len(labels["municipalities"])
+
+    month = frame["start"].astype("datetime64[M]")
+    mask = np.ones(month.shape, dtype=bool)
+    if first is not None:
+        mask &= month >= first
+    if last is not None:
+        mask &= month <= last
+    if municipality_code is not None:
+        m = labels["municipality_ids"].get(municipality_code, -1)
+        mask &= frame["muni"] == m
+    if barangay_code is not None:
+        b = labels["barangay_ids"].get(barangay_code, -1)
+        mask &= frame["bgy"] == b
+
+    start, hours, all_day = frame["start"][mask], frame["hours"][mask], frame["all_day"][mask]
+    bgy, muni, month = frame["bgy"][mask], frame["muni"][mask], month[mask]
+    days = start.astype("datetime64[D]")
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    start_hour = (start - days).astype("timedelta64[h]").astype(np.int64)
+
+    body = {
+        "range": {"from": start_month, "to": end_month},
+        "scope": {"municipality": municipality_code, "barangay": barangay_code},
+        "totals": {
+            "outages": int(mask.sum()),
+            "hours": round(float(hours.sum()), 1),
+            "barangays": int(np.unique(bgy).size),
+            "municipalities": int(np.unique(muni).size),
+        },
+        "by_weekday": [
+            {"weekday": WEEKDAYS[d], "outages": int(c), "hours": round(float(h), 1)}
+            for d, (c, h) in enumerate(zip(
+                np.bincount(weekday, minlength=7), np.bincount(weekday, weights=hours, minlength=7)
+            ))
+        ],
+        # All-day schedules have no real start time
+        "by_start_hour": np.bincount(start_hour[~all_day], minlength=24).tolist(),
+        "monthly": [],
+        "barangays": [],
+        "municipalities": [],
+    }
+    if not mask.any():
+        return body
+
+    # Months as offsets from the first one present
+    month_base = month.min()
+    month_idx = (month - month_base).astype(np.int64)
+    n_months = int(month_idx.max()) + 1
+    monthly_count = np.bincount(month_idx, minlength=n_months)
+    monthly_hours = np.bincount(month_idx, weights=hours, minlength=n_months)
+    body["monthly"] = [
+        {"month": str(month_base + i), "outages": int(monthly_count[i]), "hours": round(float(monthly_hours[i]), 1)}
+        for i in np.flatnonzero(monthly_count)
+    ]
+
+    bgy_count = np.bincount(bgy, minlength=n_bgy)
+    bgy_hours = np.bincount(bgy, weights=hours, minlength=n_bgy)
+    typical_day = np.bincount(bgy * 7 + weekday, minlength=n_bgy * 7).reshape(n_bgy, 7).argmax(axis=1)
+    timed = ~all_day
+    by_hour = np.bincount(bgy[timed] * 24 + start_hour[timed], minlength=n_bgy * 24).reshape(n_bgy, 24)
+    typical_hour = np.where(by_hour.any(axis=1), by_hour.argmax(axis=1), -1)
+    # Barangay x month hours, only for the barangays listed
+    bgy_month = np.bincount(bgy * n_months + month_idx, weights=hours, minlength=n_bgy * n_months)
+    bgy_month = bgy_month.reshape(n_bgy, n_months)
+
+    ranked = np.lexsort((-bgy_count, -bgy_hours))
+    ranked = ranked[bgy_count[ranked] > 0]
+    if barangay_code is None and municipality_code is None:
+        ranked = ranked[:top]
+    for i in ranked:
+        code, name, m = labels["barangays"][i]
+        body["barangays"].append({
+            "code": code,
+            "name": name,
+            "municipality": labels["municipalities"][m][1],
+            "outages": int(bgy_count[i]),
+            "hours": round(float(bgy_hours[i]), 1),
+            "typical_weekday": WEEKDAYS[typical_day[i]],
+            "typical_start_hour": int(typical_hour[i]) if typical_hour[i] >= 0 else None,
+            "monthly_hours": {
+                str(month_base + j): round(float(bgy_month[i, j]), 1) for j in np.flatnonzero(bgy_month[i])
+            },
+        })
+
+    muni_count = np.bincount(muni, minlength=n_muni)
+    muni_hours = np.bincount(muni, weights=hours, minlength=n_muni)
+    # Distinct barangays hit per municipality: unique (municipality, barangay) pairs
+    pairs = np.unique(muni.astype(np.int64) * max(n_bgy, 1) + bgy)
+    muni_barangays = np.bincount(pairs // max(n_bgy, 1), minlength=n_muni)
+    ranked = np.lexsort((-muni_count, -muni_hours))
+    ranked = ranked[muni_count[ranked] > 0][:top]
+    body["municipalities"] = [
+        {
+            "code": labels["municipalities"][i][0],
+            "name": labels["municipalities"][i][1],
+            "outages": int(muni_count[i]),
+            "hours": round(float(muni_hours[i]), 1),
+            "barangays": int(muni_barangays[i]),
+        }
+        for i in ranked
+    ]
+    return body
+
+
+# ==============================
+# Shared instance for the API
+# ==============================
+
+_lock = threading.Lock()
+_state = {
+    "labels": new_labels(),
+    "archive_parts": set(),
+    "archive_chunks": [],
+    "archive_keys": set(),
+    "frame": None,
+    "results": {},
+}
+
+
+def refresh():
+    """Load archive parts not seen yet and re-flatten the active notices. Caller holds _lock."""
+    from db import get_active_notices
+
+    labels = _state["labels"]
+    new_parts = [p for p in notice_archive.list_parts() if p not in _state["archive_parts"]]
+    for month, name in new_parts:
+        try:
+            data = notice_archive.read_part(month, name, list(LOAD_COLUMNS))
+        except Exception as e:
+            print(f"  Note: Skipping archive part {month}/{name} ({e})")
+            continue
+        keys = _state["archive_keys"]
+        _state["archive_chunks"].append(make_chunk(data, labels, skip_keys=keys, keys=keys))
+        _state["archive_parts"].add((month, name))
+
+    archived_at = datetime.now(timezone.utc).isoformat()
+    active_rows = [r for notice in get_active_notices() for r in notice_archive.flatten_notice(notice, archived_at)]
+    # A notice archived mid-run may still be in the table; count it once
+    active = make_chunk(_columns(active_rows), labels, skip_keys=_state["archive_keys"])
+    _state["frame"] = combine(_state["archive_chunks"] + [active], labels)
+    _state["results"] = {}
+    return len(new_parts)
+
+
+def get_stats(start_month: str = None, end_month: str = None, municipality_code: str = None,
+              barangay_code: str = None, top: int = 10) -> dict:
+    """compute() over the shared frame, refreshed when older than OUTAGE_STATS_TTL_SECONDS."""
+    # Validate before touching the frame
+    _parse_month(start_month)
+    _parse_month(end_month)
+    key = (start_month, end_month, municipality_code, barangay_code, top)
+    with _lock:
+        frame = _state["frame"]
+        if frame is None or time.time() - frame["built_at"] >= STATS_TTL:
+            try:
+                refresh()
+            except Exception as e:
+                if frame is None:
+                    raise
+                # Keep answering from the last frame; retried on the next query
+                print(f"  Note: Outage stats refresh failed ({e})")
+            frame = _state["frame"]
+        cached = _state["results"].get(key)
+        if cached is not None:
+            return cached
+    body = compute(frame, start_month, end_month, municipality_code, barangay_code, top)
+    body["generated_at"] = datetime.fromtimestamp(frame["built_at"], timezone.utc).isoformat()
+    body["rows"] = int(frame["start"].size)
+    with _lock:
+        if _state["frame"] is frame:
+            _state["results"][key] = body
+    return body
+
+
+def invalidate():
+    """Refresh on the next query (called after notices are saved)."""
+    with _lock:
+        if _state["frame"] is not None:
+            _state["frame"] = {**_state["frame"], "built_at": 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start_month", help="first month, YYYY-MM")
+    parser.add_argument("--to", dest="end_month", help="last month, YYYY-MM")
+    parser.add_argument("--municipality", help="municipality PSGC code")
+    parser.add_argument("--barangay", help="barangay PSGC code")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--archive-only", action="store_true", help="skip the active notices (no database access)")
+    parser.add_argument("--json", action="store_true", help="print the full result as JSON")
+    args = parser.parse_args()
+
+    try:
+        if args.archive_only:
+            labels = new_labels()
+            keys = set()
+            chunks = [
+                make_chunk(notice_archive.read_part(month, name, list(LOAD_COLUMNS)), labels, skip_keys=keys, keys=keys)
+                for month, name in notice_archive.list_parts(args.start_month, args.end_month)
+            ]
+            stats = compute(combine(chunks, labels), args.start_month, args.end_month,
+                            args.municipality, args.barangay, args.top)
+        else:
+            stats = get_stats(args.start_month, args.end_month, args.municipality, args.barangay, args.top)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if args.json:
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        return
+    t = stats["totals"]
+    print(f"{t['outages']} scheduled outages, {t['hours']} hours, "
+          f"{t['barangays']} barangays in {t['municipalities']} municipalities")
+    print("\nMost interrupted barangays (hours, outages, typical day/start):")
+    for b in stats["barangays"]:
+        hour = f"{b['typical_start_hour']:02d}:00" if b["typical_start_hour"] is not None else "all day"
+        print(f"  {b['name']}, {b['municipality']}: {b['hours']}h, {b['outages']}x, {b['typical_weekday']} {hour}")
+    print("\nMunicipalities:")
+    for m in stats["municipalities"]:
+        print(f"  {m['name']}: {m['hours']}h, {m['outages']}x, {m['barangays']} barangays")
+    print("\nBy weekday: " + ", ".join(f"{d['weekday']} {d['outages']}" for d in stats["by_weekday"]))
+    print("By start hour: " + " ".join(str(n) for n in stats["by_start_hour"]))
+
+
+if __name__ == "__main__":
+    main()
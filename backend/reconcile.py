@@ -0,0 +1,219 @@
+"""
+Cross-post schedule reconciliation.
+
+ZANECO often announces one interruption in several posts: the original,
+a "rescheduled" repost, a "CANCELLED" post. Each post is its own
+notices row, and only the cancelled post's own status reflects the
+cancellation, so readers saw duplicates and schedules that had been
+called off.
+
+reconcile() keys every schedule by (barangay code, interval start,
+interval end); see outage_index.schedule_intervals(). It then replays
+the notices oldest first, by publish date, falling back to created_at:
+
+- an active post adds its keys, or merges into keys already present.
+  The newest post becomes the canonical source; every post is kept in
+  source_urls, and affected areas are combined.
+- a cancellation post marks the matching keys from earlier posts
+  'cancelled'. A cancellation without times (whole day) cancels every
+  interval of that barangay on its dates. A later post announcing the
+  same key again makes it active again.
+
+The result is synced to the schedules table (migrations/004_schedules.sql):
+changed keys are upserted and keys no longer backed by any notice are
+deleted. It runs after cleanup in each scrape, and the public page
+reads the active rows per barangay instead of filtering notices in the
+browser. Schedules whose dates could not be parsed are kept one per
+post, keyed by their date/time text.
+
+    python reconcile.py            # reconcile now
+    python reconcile.py --dry-run  # print the counts only
+"""
+import argparse
+import os
+from datetime import datetime, timezone
+
+from outage_index import schedule_intervals
+
+RECONCILE_ENABLED = os.getenv("SCHEDULE_RECONCILE_ENABLED", "true").lower() == "true"
+BATCH_SIZE = 500
+
+SCHEDULE_COLUMNS = (
+    "schedule_key", "barangay_code", "barangay", "municipality_code", "municipality",
+    "start_at", "end_at", "all_day", "date_text", "time_text", "affected_area", "reason",
+    "status", "notice_url", "source_urls", "cancelled_by",
+)
+
+
+def _published(row: dict) -> str:
+    data = row.get("data") or {}
+    return data.get("publish_date") or row.get("created_at") or ""
+
+
+def schedule_entries(row: dict):
+    """Yield (key, entry) for every barangay and interval of one notice row."""
+    for processed in (row.get("data") or {}).get("processed_images", []):
+        for sched in processed.get("structured") or []:
+            intervals = sched.get("intervals")
+            if intervals is None:
+                intervals = schedule_intervals(sched)
+            date_text = "; ".join(sched.get("dates", []))
+            time_text = "; ".join(sched.get("times", []))
+            for loc in sched.get("locations", []):
+                muni = loc.get("municipality") or {}
+                for bgy in loc.get("barangays", []):
+                    place = bgy.get("code") or f"{muni.get('name')}/{bgy.get('name')}".upper()
+                    base = {
+                        "barangay_code": bgy.get("code"),
+                        "barangay": bgy.get("name") or "",
+                        "municipality_code": muni.get("code"),
+                        "municipality": muni.get("name"),
+                        "date_text": date_text,
+                        "time_text": time_text,
+                        "affected_area": bgy.get("affected_area"),
+                        "reason": sched.get("reason"),
+                    }
+                    if not intervals:
+                        key = f"{place}|{row.get('url')}|{date_text}|{time_text}"
+                        yield key, {**base, "start_at": None, "end_at": None, "all_day": False}
+                    for iv in intervals:
+                        key = f"{place}|{iv['start']}|{iv['end']}"
+                        yield key, {**base, "start_at": iv["start"], "end_at": iv["end"],
+                                    "all_day": iv.get("all_day", False)}
+
+
+def _merge_area(old, new):
+    if not old or not new or new in old:
+        return old or new
+    if old in new:
+        return new
+    return f"{old}; {new}"
+
+
+def reconcile(rows: list) -> dict:
+    """{schedule_key: schedule row} for notice rows (url, status, created_at, data), active and cancelled."""
+    schedules = {}
+    # Which keys a whole-day cancellation for (place, date) applies to
+    by_place_day = {}
+    for row in sorted(rows, key=_published):
+        url = row.get("url")
+        if row.get("status") == "cancelled":
+            for key, entry in schedule_entries(row):
+                place = key.split("|", 1)[0]
+                if entry["all_day"]:
+                    targets = by_place_day.get((place, entry["start_at"][:10]), ())
+                else:
+                    targets = (key,)
+                for target in targets:
+                    current = schedules.get(target)
+                    if current is not None and current["status"] == "active":
+                        current.update(status="cancelled", cancelled_by=url)
+            continue
+
+        for key, entry in schedule_entries(row):
+            current = schedules.get(key)
+            if current is None:
+                schedules[key] = {
+                    "schedule_key": key, **entry,
+                    "status": "active", "notice_url": url, "source_urls": [url], "cancelled_by": None,
+                }
+                if entry["start_at"]:
+                    by_place_day.setdefault((key.split("|", 1)[0], entry["start_at"][:10]), []).append(key)
+                continue
+            # A newer post for the same interval: it becomes the canonical source
+            area = _merge_area(current["affected_area"], entry["affected_area"])
+            current.update(entry, affected_area=area, status="active", notice_url=url, cancelled_by=None)
+            current["reason"] = entry["reason"] or current["reason"]
+            if url not in current["source_urls"]:
+                current["source_urls"].append(url)
+    return schedules
+
+
+# ==============================
+# Storage
+# ==============================
+
+def _fetch_notices() -> list:
+    from learned_sync import fetch_pages
+
+    return fetch_pages(
+        "notices",
+        lambda t: t.select("id,title,url,status,created_at,data").in_("status", ["active", "cancelled"]).order("id"),
+    )
+
+
+def _fetch_existing() -> dict:
+    from learned_sync import fetch_pages
+
+    rows = fetch_pages("schedules", lambda t: t.select(",".join(SCHEDULE_COLUMNS)).order("schedule_key"))
+    return {r["schedule_key"]: r for r in rows}
+
+
+def _same(stored: dict, row: dict) -> bool:
+    # Timestamps come back from PostgREST in their own format; compare the instant
+    for column in SCHEDULE_COLUMNS:
+        a, b = stored.get(column), row.get(column)
+        if column in ("start_at", "end_at") and a and b:
+            a, b = datetime.fromisoformat(a), datetime.fromisoformat(b)
+        if a != b:
+            return False
+    return True
+
+
+def sync(dry_run: bool = False) -> dict:
+    """Reconcile the notices table into the schedules table. Returns counts."""
+    from supabase_client import run_query
+
+    notices = _fetch_notices()
+    schedules = reconcile(notices)
+    existing = _fetch_existing()
+
+    now = datetime.now(timezone.utc).isoformat()
+    changed = [dict(row, updated_at=now) for key, row in schedules.items()
+               if key not in existing or not _same(existing[key], row)]
+    stale = [key for key in existing if key not in schedules]
+    counts = {
+        "notices": len(notices),
+        "schedules": len(schedules),
+        "active": sum(1 for s in schedules.values() if s["status"] == "active"),
+        "cancelled": sum(1 for s in schedules.values() if s["status"] == "cancelled"),
+        "merged": sum(len(s["source_urls"]) - 1 for s in schedules.values()),
+        "upserted": len(changed),
+        "deleted": len(stale),
+    }
+    if dry_run:
+        return counts
+    for start in range(0, len(changed), BATCH_SIZE):
+        batch = changed[start:start + BATCH_SIZE]
+        run_query("schedules", "upsert", lambda t: t.upsert(batch, on_conflict="schedule_key"))
+    for start in range(0, len(stale), BATCH_SIZE):
+        batch = stale[start:start + BATCH_SIZE]
+        run_query("schedules", "delete", lambda t: t.delete().in_("schedule_key", batch))
+    return counts
+
+
+def run() -> dict:
+    """sync() for the scrape pipeline: never raises (the notices are saved either way)."""
+    if not RECONCILE_ENABLED:
+        return {}
+    try:
+        counts = sync()
+        print(
+            f"Reconciled {counts['notices']} notices into {counts['schedules']} schedules "
+            f"({counts['active']} active, {counts['cancelled']} cancelled, {counts['merged']} duplicate(s) merged; "
+            f"{counts['upserted']} written, {counts['deleted']} removed)"
+        )
+        return counts
+    except Exception as e:
+        print(f"  Note: Schedule reconciliation failed ({e})")
+        return {"error": str(e)}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="compute and print the counts without writing")
+    args = parser.parse_args()
+    print(sync(dry_run=args.dry_run))
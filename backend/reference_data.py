@@ -0,0 +1,128 @@
+"""
+Hot-reloadable reference data.
+
+Long-running processes (API workers, the scrape worker thread) used to
+keep the reference JSON and verified learned_locations from whenever they
+first loaded them. This module keeps the current versions and swaps in
+new ones without a restart:
+
+- Reference files: every REFERENCE_RELOAD_INTERVAL_SECONDS the source
+  files are stat()ed; if any mtime/size changed, the compiled index is
+  reloaded (and recompiled if the content hash changed).
+- Verified learned_locations: the admin endpoints bump a version
+  watermark in app_settings ("learned_locations_version"); when it
+  differs from the loaded one (or LEARNED_LOCATIONS_MAX_AGE_SECONDS has
+  passed, to catch dashboard edits), the snapshot is delta-synced
+  (see learned_sync.py).
+
+New data is built off to the side and published by replacing a single
+module reference, so readers never see a half-built state. Work that
+must stay consistent (one scrape run) takes get_snapshot() once and keeps
+using it even if a reload happens meanwhile.
+"""
+import os
+import threading
+import time
+
+import reference_index
+
+RELOAD_INTERVAL = float(os.getenv("REFERENCE_RELOAD_INTERVAL_SECONDS", "60"))
+# Verified locations are delta-synced at least this often even if the version is unchanged
+LEARNED_MAX_AGE = float(os.getenv("LEARNED_LOCATIONS_MAX_AGE_SECONDS", "600"))
+
+LEARNED_VERSION_KEY = "learned_locations_version"
+
+_index_lock = threading.Lock()
+_learned_lock = threading.Lock()
+
+_index = None
+_index_stamp = None
+_index_checked_at = 0.0
+
+_learned = None
+_learned_version = None
+_learned_loaded_at = 0.0
+_learned_checked_at = 0.0
+
+
+def _source_stamp() -> tuple:
+    stamp = []
+    for path in reference_index.SOURCE_FILES:
+        try:
+            st = path.stat()
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def get_index(force: bool = False) -> dict:
+    """Current compiled reference index, reloaded if the source files changed."""
+    global _index, _index_stamp, _index_checked_at
+    now = time.monotonic()
+    if _index is not None and not force and now - _index_checked_at < RELOAD_INTERVAL:
+        return _index
+
+    # Only one thread checks/rebuilds; the others keep using the current index
+    if not _index_lock.acquire(blocking=_index is None or force):
+        return _index
+    try:
+        if _index is not None and not force and time.monotonic() - _index_checked_at < RELOAD_INTERVAL:
+            return _index
+        stamp = _source_stamp()
+        if _index is None or force or stamp != _index_stamp:
+            new_index = reference_index.load_index()
+            if _index is not None:
+                print(f"Reference data reloaded (source {new_index['source_hash'][:12]})")
+            _index, _index_stamp = new_index, stamp
+        _index_checked_at = time.monotonic()
+        return _index
+    finally:
+        _index_lock.release()
+
+
+def _fetch_learned_version():
+    from supabase_client import run_query
+
+    try:
+        res = run_query(
+            "app_settings", "select",
+            lambda t: t.select("value").eq("key", LEARNED_VERSION_KEY),
+        )
+        return res.data[0]["value"] if res.data else None
+    except Exception as e:
+        print(f"  Note: Could not read {LEARNED_VERSION_KEY} ({e})")
+        return None
+
+
+def get_verified_locations(force: bool = False) -> list:
+    """Current verified learned_locations, delta-synced when the watermark moves."""
+    global _learned, _learned_version, _learned_loaded_at, _learned_checked_at
+    now = time.monotonic()
+    if _learned is not None and not force and now - _learned_checked_at < RELOAD_INTERVAL:
+        return _learned
+
+    if not _learned_lock.acquire(blocking=_learned is None or force):
+        return _learned
+    try:
+        if _learned is not None and not force and time.monotonic() - _learned_checked_at < RELOAD_INTERVAL:
+            return _learned
+        import learned_sync
+
+        version = _fetch_learned_version()
+        stale = version != _learned_version or now - _learned_loaded_at >= LEARNED_MAX_AGE
+        if _learned is None or force or stale:
+            rows = learned_sync.sync()
+            _learned, _learned_version, _learned_loaded_at = rows, version, time.monotonic()
+        _learned_checked_at = time.monotonic()
+        return _learned
+    finally:
+        _learned_lock.release()
+
+
+def get_snapshot() -> dict:
+    """
+    Consistent view for one unit of work (e.g. a scrape run):
+    {"index": ..., "verified_locations": [...]}. Later reloads don't affect it.
+    """
+    return {"index": get_index(), "verified_locations": get_verified_locations()}
@@ -0,0 +1,144 @@
+"""
+Compiled reference-data artifact.
+
+zamboanga_del_norte_locations.json, barangay_details.json and
+barangay_adjacency.json stay the canonical sources. This module compiles
+them, together with the lookup structures the normalizer needs
+(per-municipality choice arrays, name → barangay maps, normalized
+sub-location → barangay maps, prompt JSON text), into one versioned
+pickle that loads in a few milliseconds.
+
+The artifact records a hash of the source files and is rebuilt
+automatically when they change. Build it ahead of time with:
+
+    python reference_index.py
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+# Bump when the structure of the compiled index changes
+FORMAT_VERSION = 2
+
+LOCATIONS_FILE = Path("zamboanga_del_norte_locations.json")
+BARANGAY_DETAILS_FILE = Path("barangay_details.json")
+BARANGAY_ADJACENCY_FILE = Path("barangay_adjacency.json")
+ARTIFACT_FILE = Path(os.getenv("REFERENCE_INDEX_FILE", "reference_index.pickle"))
+
+SOURCE_FILES = (LOCATIONS_FILE, BARANGAY_DETAILS_FILE, BARANGAY_ADJACENCY_FILE)
+
+SUB_LOCATION_CATEGORIES = ("puroks", "landmarks", "streets", "establishments", "aliases")
+
+_NON_ALNUM_RE = re.compile(r'[^A-Za-z0-9\s]')
+# "Purok Malayan", "Prk. Malayan" and "PRK.MALAYAN" share one key
+_PUROK_PREFIX_RE = re.compile(r'^\s*(?:purok|prk)\b\.?\s*', re.IGNORECASE)
+
+
+@lru_cache(maxsize=8192)
+def normalize_key(text: str) -> str:
+    """Lookup key for sub-locations: unify the purok prefix, strip punctuation, collapse spaces, uppercase."""
+    if text[:1] in "pP" or text[:1].isspace():
+        text = _PUROK_PREFIX_RE.sub('PRK ', text, count=1)
+    return " ".join(_NON_ALNUM_RE.sub('', text).upper().split())
+
+
+def source_hash() -> str:
+    h = hashlib.sha256()
+    for path in SOURCE_FILES:
+        h.update(path.name.encode())
+        h.update(path.read_bytes() if path.exists() else b"")
+    return h.hexdigest()
+
+
+def _load_json_file(filepath: Path):
+    if filepath.exists():
+        with open(filepath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def build_index(reference_json: list, details: dict, adjacency: dict, digest: str = None) -> dict:
+    if not reference_json or not isinstance(reference_json[0], dict):
+        raise RuntimeError("❌ Reference JSON corrupted, expected list of dicts but got something else.")
+
+    location_to_barangays = {}
+    for muni_name, bgys in details.items():
+        if muni_name == "_README" or not isinstance(bgys, dict):
+            continue
+        lookup = {}
+        for bgy_name, d in bgys.items():
+            for category in SUB_LOCATION_CATEGORIES:
+                for loc in d.get(category, []):
+                    key = normalize_key(loc)
+                    if key:
+                        lookup.setdefault(key, set()).add(bgy_name.upper())
+        location_to_barangays[muni_name] = {k: frozenset(v) for k, v in lookup.items()}
+
+    return {
+        "version": FORMAT_VERSION,
+        "source_hash": digest or source_hash(),
+        "reference_json": reference_json,
+        "barangay_details": details,
+        "barangay_adjacency": adjacency,
+        "municipality_names": [m["name"] for m in reference_json],
+        "municipality_names_upper": [m["name"].upper() for m in reference_json],
+        "municipalities": {m["name"]: m for m in reference_json},
+        "barangay_names": {m["name"]: [b["name"] for b in m["barangays"]] for m in reference_json},
+        "barangay_names_upper": {m["name"]: [b["name"].upper() for b in m["barangays"]] for m in reference_json},
+        "barangays_by_name": {m["name"]: {b["name"]: b for b in m["barangays"]} for m in reference_json},
+        "barangays_by_upper_name": {m["name"]: {b["name"].upper(): b for b in m["barangays"]} for m in reference_json},
+        "location_to_barangays": location_to_barangays,
+        # Serialized once here instead of per image when building Gemini prompts
+        "reference_json_text": json.dumps(reference_json, ensure_ascii=False),
+        "barangay_details_text": json.dumps({k: v for k, v in details.items() if k != "_README"}, ensure_ascii=False),
+    }
+
+
+def compile_artifact(path: Path = None) -> dict:
+    """Rebuild the index from the JSON sources and write it atomically."""
+    path = path or ARTIFACT_FILE
+    digest = source_hash()
+    index = build_index(
+        _load_json_file(LOCATIONS_FILE),
+        _load_json_file(BARANGAY_DETAILS_FILE),
+        _load_json_file(BARANGAY_ADJACENCY_FILE),
+        digest,
+    )
+    try:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError as e:
+        # Read-only deploys still work; they just rebuild in memory each start
+        print(f"Note: Could not write reference index ({e})")
+    return index
+
+
+def load_index(path: Path = None) -> dict:
+    """
+    Load the compiled index, rebuilding it if it is missing, from another
+    format version, or out of date with the source JSON files.
+    """
+    path = path or ARTIFACT_FILE
+    digest = source_hash()
+    if path.exists():
+        try:
+            with open(path, "rb") as f:
+                index = pickle.load(f)
+            if index.get("version") == FORMAT_VERSION and index.get("source_hash") == digest:
+                return index
+        except Exception as e:
+            print(f"Note: Reference index unreadable, rebuilding ({e})")
+    return compile_artifact(path)
+
+
+if __name__ == "__main__":
+    out = Path(sys.argv[1]) if len(sys.argv) > 1 else ARTIFACT_FILE
+    idx = compile_artifact(out)
+    print(f"Compiled {len(idx['reference_json'])} municipalities into {out} (source {idx['source_hash'][:12]})")
@@ -0,0 +1,181 @@
+"""
+Live per-barangay counts of community outage reports.
+
+For each barangay the aggregate keeps one minute-bucketed sliding window
+per WINDOWS entry (15 and 60 minutes): a deque of [minute, count] plus
+its running total. A new report bumps the newest bucket of each window
+and expiry pops whole minutes off the old end, so adding and expiring
+are O(1) per report and nothing is recomputed from a table scan.
+
+Reports reach the aggregate in two ways:
+
+- add_report() as they are accepted by the API (report ingestion), and
+- sync(), which reads community_reports created since the last row it
+  saw, less HEATMAP_SYNC_OVERLAP_SECONDS (the first sync only reads the
+  last hour). This catches reports written elsewhere, including by other
+  API workers. Those carry the time they were accepted, not written, so
+  a batch flushed after this worker synced has older timestamps; the
+  overlap re-reads them and ids already counted are skipped.
+
+heatmap() renders the counts, cached for HEATMAP_CACHE_SECONDS so the
+public and admin pages can poll it cheaply during large outages.
+Only outage_report rows are counted; residents send them from the
+"Report No Power" form on the report page, and the checker shows the
+counts for the selected barangay. Location corrections and suggestions
+are not outage reports and are not counted. Reports deleted by an admin stay counted until they age out.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+WINDOWS = (15, 60)  # minutes
+SYNC_INTERVAL = float(os.getenv("HEATMAP_SYNC_SECONDS", "10"))
+CACHE_SECONDS = float(os.getenv("HEATMAP_CACHE_SECONDS", "5"))
+# Re-read this much before the watermark: report_ingest writes rows up to
+# REPORT_FLUSH_SECONDS (longer while retrying) after their created_at.
+SYNC_OVERLAP = float(os.getenv("HEATMAP_SYNC_OVERLAP_SECONDS", "120"))
+# Report types that are not about an outage in progress
+IGNORED_TYPES = {"location_report", "suggestion"}
+
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+
+# {(municipality, barangay): {window: {"buckets": deque([[minute, count], ...]), "total": int}}}
+_windows = {}
+# ids already counted, with the minute they were counted under (pruned as they age out)
+_seen = {}
+_watermark = None
+_synced_at = 0.0
+_cache = {"at": 0.0, "body": None}
+
+
+def _minute(ts: float) -> int:
+    return int(ts // 60)
+
+
+def _parse_created_at(value) -> float:
+    if not value:
+        return time.time()
+    t = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    # A client clock ahead of ours must not keep a report "new" for longer
+    return min(t.timestamp(), time.time())
+
+
+def _expire(slot: dict, now_minute: int):
+    for window, w in slot.items():
+        buckets = w["buckets"]
+        while buckets and buckets[0][0] <= now_minute - window:
+            w["total"] -= buckets.popleft()[1]
+
+
+def add_report(row: dict, now: float = None) -> bool:
+    """Count one community_reports row. Returns False if it isn't an outage report or was already counted."""
+    if row.get("type") in IGNORED_TYPES or not row.get("barangay"):
+        return False
+    now = now or time.time()
+    ts = _parse_created_at(row.get("created_at"))
+    minute = _minute(ts)
+    if minute <= _minute(now) - max(WINDOWS):
+        return False
+    key = ((row.get("municipality") or "").strip().upper(), row["barangay"].strip().upper())
+    with _lock:
+        if row.get("id") is not None:
+            if row["id"] in _seen:
+                return False
+            _seen[row["id"]] = minute
+        slot = _windows.setdefault(key, {w: {"buckets": deque(), "total": 0} for w in WINDOWS})
+        for window, w in slot.items():
+            if minute <= _minute(now) - window:
+                continue
+            buckets = w["buckets"]
+            if buckets and buckets[-1][0] == minute:
+                buckets[-1][1] += 1
+            elif not buckets or buckets[-1][0] < minute:
+                buckets.append([minute, 1])
+            else:
+                # Late arrival (sync overlap): insert in order; windows hold at most 60 buckets
+                i = next(i for i, b in enumerate(buckets) if b[0] >= minute)
+                if buckets[i][0] == minute:
+                    buckets[i][1] += 1
+                else:
+                    buckets.insert(i, [minute, 1])
+            w["total"] += 1
+    return True
+
+
+def counts(now: float = None) -> dict:
+    """{(municipality, barangay): {window: count}} for barangays with recent reports."""
+    now_minute = _minute(now or time.time())
+    result = {}
+    with _lock:
+        for key in list(_windows):
+            slot = _windows[key]
+            _expire(slot, now_minute)
+            if not any(w["total"] for w in slot.values()):
+                del _windows[key]
+                continue
+            result[key] = {window: w["total"] for window, w in slot.items()}
+        for report_id in [i for i, m in _seen.items() if m <= now_minute - max(WINDOWS)]:
+            del _seen[report_id]
+    return result
+
+
+def sync():
+    """Count community_reports created since the last sync (last hour on the first one)."""
+    global _watermark, _synced_at
+    from learned_sync import fetch_pages
+
+    if _watermark is None:
+        since = datetime.fromtimestamp(time.time() - max(WINDOWS) * 60, timezone.utc).isoformat()
+    else:
+        since = datetime.fromtimestamp(_parse_created_at(_watermark) - SYNC_OVERLAP, timezone.utc).isoformat()
+    # Overlap + seen ids: late-flushed rows are picked up and none is counted twice
+    rows = fetch_pages(
+        "community_reports",
+        lambda t: t.select("id,type,municipality,barangay,created_at").gte("created_at", since).order("created_at"),
+    )
+    for row in rows:
+        add_report(row)
+    if rows:
+        _watermark = rows[-1]["created_at"]
+    elif _watermark is None:
+        _watermark = since
+    _synced_at = time.time()
+
+
+def heatmap() -> dict:
+    """
+    {"generated_at", "windows", "barangays": [{"municipality", "barangay", "last_15m", "last_60m"}]},
+    busiest first. Synced at most every HEATMAP_SYNC_SECONDS and cached for HEATMAP_CACHE_SECONDS.
+    """
+    now = time.time()
+    cached = _cache["body"]
+    if cached is not None and now - _cache["at"] < CACHE_SECONDS:
+        return cached
+
+    # One thread syncs; the others answer from the counts they have
+    if now - _synced_at >= SYNC_INTERVAL and _sync_lock.acquire(blocking=False):
+        try:
+            sync()
+        except Exception as e:
+            # The counts already held are still useful; retry on the next poll
+            print(f"Heatmap sync failed: {e}")
+        finally:
+            _sync_lock.release()
+
+    barangays = [
+        {"municipality": muni, "barangay": bgy, **{f"last_{w}m": n for w, n in by_window.items()}}
+        for (muni, bgy), by_window in counts(now).items()
+    ]
+    barangays.sort(key=lambda b: tuple(-b[f"last_{w}m"] for w in WINDOWS) + (b["municipality"], b["barangay"]))
+    body = {
+        "generated_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        "windows": list(WINDOWS),
+        "barangays": barangays,
+    }
+    _cache.update(at=now, body=body)
+    return body
@@ -0,0 +1,250 @@
+"""
+Community report ingestion: validate, rate-limit, coalesce, batch.
+
+The report page used to insert every click straight into
+community_reports. During a real outage hundreds of people in one
+barangay send the same report within minutes (and tap submit more than
+once), so POST /api/reports now goes through here:
+
+1. validate() checks the type, field lengths and, for barangay reports,
+   that the municipality/barangay exist in the reference data.
+2. Each device gets a token bucket (REPORT_RATE_PER_MINUTE, bursts of
+   REPORT_RATE_BURST) and each client IP a looser one
+   (REPORT_IP_RATE_PER_MINUTE; mobile carriers put many people behind
+   one address). Over either limit the API answers 429.
+3. Reports are coalesced per (type, barangay, content, device
+   fingerprint, REPORT_COALESCE_SECONDS window): a repeat from the same
+   device in the same window is acknowledged but not stored. Different
+   devices are different people and are all kept.
+4. Accepted rows wait in a buffer that a background thread flushes as one
+   batched insert every REPORT_FLUSH_SECONDS, or sooner once
+   REPORT_BATCH_SIZE rows are waiting. Inserted rows are fed to the
+   outage heatmap (report_heatmap.py) straight away. Each row carries a
+   submission_id generated here, and the batch is an upsert ignoring
+   duplicates on it (migrations/005_community_reports_submission_id.sql),
+   so a batch retried after a timeout that the server had in fact
+   committed is not stored twice.
+
+So database writes grow with distinct events, not with button presses.
+State is per process; with several gunicorn workers a repeat that lands
+on another worker is still stored.
+"""
+import atexit
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+import reference_data
+import report_heatmap
+from reference_index import normalize_key
+from supabase_client import run_query
+
+COALESCE_SECONDS = int(os.getenv("REPORT_COALESCE_SECONDS", "600"))
+FLUSH_SECONDS = float(os.getenv("REPORT_FLUSH_SECONDS", "2"))
+BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "50"))
+RATE_PER_MINUTE = float(os.getenv("REPORT_RATE_PER_MINUTE", "6"))
+RATE_BURST = float(os.getenv("REPORT_RATE_BURST", "3"))
+IP_RATE_PER_MINUTE = float(os.getenv("REPORT_IP_RATE_PER_MINUTE", "60"))
+# Rows kept while the database is unreachable; the oldest are dropped beyond this
+MAX_BUFFER = int(os.getenv("REPORT_MAX_BUFFER", "2000"))
+
+REPORT_TYPES = ("location_report", "outage_report", "suggestion")
+LOCATION_TYPES = ("purok", "landmark", "street", "establishment")
+MAX_NAME_LENGTH = 120
+MAX_MESSAGE_LENGTH = 1000
+
+stats = Counter()
+
+_lock = threading.Lock()
+_buckets = {}      # ("device"|"ip", key) -> [tokens, last refill time]
+_recent = {}       # coalescing key -> window it was seen in
+_buffer = []
+_wake = threading.Event()
+_flusher = None
+
+
+def _text(body: dict, field: str, limit: int):
+    value = body.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    value = " ".join(value.split())
+    if len(value) > limit:
+        raise ValueError(f"{field} is too long (max {limit} characters)")
+    return value or None
+
+
+def validate(body: dict) -> dict:
+    """The community_reports row for a submitted report. Raises ValueError with a user-facing message."""
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object")
+    report_type = body.get("type")
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f"type must be one of: {', '.join(REPORT_TYPES)}")
+
+    row = {"type": report_type}
+    message = _text(body, "message", MAX_MESSAGE_LENGTH)
+    if report_type == "suggestion":
+        if not message:
+            raise ValueError("message is required")
+        row["message"] = message
+        return row
+
+    municipality = (_text(body, "municipality", MAX_NAME_LENGTH) or "").upper()
+    barangay = (_text(body, "barangay", MAX_NAME_LENGTH) or "").upper()
+    barangays = reference_data.get_index()["barangays_by_upper_name"]
+    if municipality not in barangays:
+        raise ValueError("Unknown municipality")
+    if barangay not in barangays[municipality]:
+        raise ValueError("Unknown barangay for this municipality")
+    row.update(municipality=municipality, barangay=barangay)
+    if message:
+        row["message"] = message
+
+    if report_type == "location_report":
+        if body.get("location_type") not in LOCATION_TYPES:
+            raise ValueError(f"location_type must be one of: {', '.join(LOCATION_TYPES)}")
+        location_name = _text(body, "location_name", MAX_NAME_LENGTH)
+        if not location_name:
+            raise ValueError("location_name is required")
+        row.update(location_type=body["location_type"], location_name=location_name)
+    return row
+
+
+def fingerprint(device_id: str, ip: str, user_agent: str) -> str:
+    """Stable per-device key; the device id the page keeps in localStorage, else IP + user agent."""
+    basis = f"d:{device_id}" if device_id else f"a:{ip}|{user_agent}"
+    return hashlib.sha256(basis.encode("utf-8")).hexdigest()[:16]
+
+
+def _coalesce_key(row: dict, device: str) -> tuple:
+    if row["type"] == "location_report":
+        content = normalize_key(row["location_name"])
+    elif row["type"] == "suggestion":
+        content = hashlib.sha256(normalize_key(row["message"]).encode("utf-8")).hexdigest()[:16]
+    else:
+        # One outage report per device and barangay per window, whatever the wording
+        content = ""
+    return (row["type"], row.get("municipality"), row.get("barangay"), content, device)
+
+
+def _take_token(bucket: tuple, rate: float, burst: float, now: float) -> float:
+    """0 if the bucket has a token (taken), else seconds until it will. Caller holds _lock."""
+    tokens, last = _buckets.get(bucket, (burst, now))
+    tokens = min(burst, tokens + (now - last) * rate / 60)
+    if tokens < 1:
+        _buckets[bucket] = [tokens, now]
+        return (1 - tokens) * 60 / rate
+    _buckets[bucket] = [tokens - 1, now]
+    return 0.0
+
+
+def _prune(now: float):
+    """Forget coalescing keys from past windows and idle, refilled buckets. Caller holds _lock."""
+    window = int(now // COALESCE_SECONDS)
+    for key in [k for k, w in _recent.items() if w < window]:
+        del _recent[key]
+    idle = RATE_BURST * 60 / min(RATE_PER_MINUTE, IP_RATE_PER_MINUTE)
+    for bucket in [b for b, (_, last) in _buckets.items() if now - last > idle]:
+        del _buckets[bucket]
+
+
+def submit(row: dict, ip: str, device: str) -> tuple:
+    """
+    Rate-limit, coalesce and buffer a validated row. Returns (outcome, retry_after):
+    "accepted", "duplicate", or "rate_limited" with the seconds to wait.
+    """
+    now = time.time()
+    window = int(now // COALESCE_SECONDS)
+    key = _coalesce_key(row, device)
+    with _lock:
+        stats["received"] += 1
+        if len(_recent) > 10000 or stats["received"] % 500 == 0:
+            _prune(now)
+        wait = _take_token(("device", device), RATE_PER_MINUTE, RATE_BURST, now)
+        if not wait and _recent.get(key) == window:
+            stats["duplicate"] += 1
+            return "duplicate", 0.0
+        # The shared per-IP budget is only spent on reports that would be stored
+        wait = wait or _take_token(("ip", ip), IP_RATE_PER_MINUTE, IP_RATE_PER_MINUTE / 2, now)
+        if wait:
+            stats["rate_limited"] += 1
+            return "rate_limited", wait
+        _recent[key] = window
+        stats["accepted"] += 1
+        _buffer.append({
+            **row,
+            "submission_id": str(uuid.uuid4()),
+            "created_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        })
+        full = len(_buffer) >= BATCH_SIZE
+    _start_flusher()
+    if full:
+        _wake.set()
+    return "accepted", 0.0
+
+
+def flush() -> int:
+    """Insert everything buffered as one batch. Returns rows written (0 if the insert failed)."""
+    with _lock:
+        batch = _buffer[:]
+        del _buffer[:]
+    if not batch:
+        return 0
+    try:
+        # Idempotent on submission_id: safe to replay whatever happened to the last attempt
+        res = run_query(
+            "community_reports", "upsert",
+            lambda t: t.upsert(batch, on_conflict="submission_id", ignore_duplicates=True),
+        )
+    except Exception as e:
+        with _lock:
+            # Put them back in front of anything that arrived meanwhile
+            _buffer[:0] = batch
+            dropped = len(_buffer) - MAX_BUFFER
+            if dropped > 0:
+                del _buffer[:dropped]
+                stats["dropped"] += dropped
+            stats["flush_errors"] += 1
+        print(f"Report flush failed ({len(batch)} rows kept for retry): {e}")
+        return 0
+    with _lock:
+        stats["batches"] += 1
+        stats["rows_written"] += len(batch)
+    for inserted in res.data or []:
+        report_heatmap.add_report(inserted)
+    return len(batch)
+
+
+def _flush_loop():
+    while True:
+        _wake.wait(FLUSH_SECONDS)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            # Keep flushing; a dead flusher would leave reports in the buffer
+            print(f"  Note: Report flusher error ({e})")
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            if _flusher is None:
+                # Don't lose the last batch on a graceful worker shutdown
+                atexit.register(flush)
+            _flusher = threading.Thread(target=_flush_loop, name="report-flusher", daemon=True)
+            _flusher.start()
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**stats, "buffered": len(_buffer)}
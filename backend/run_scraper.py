@@ -5,42 +5,64 @@ This is the entry point for scheduled brownout notice fetching.
 
 import os
 from dotenv import load_dotenv
-from logic import get_notices
+from logic import get_notices, revalidate_notices
 from db import save_notices_to_supabase, delete_old_notices
+import tracing
+import gemini_usage
+import notify
+import reconcile
 
 # Load environment variables
 load_dotenv()
 
 def main():
     """Run the scraper workflow"""
+    # Per-stage timing spans as JSON lines (uploaded as a CI artifact)
+    tracing.configure(os.getenv("SCRAPER_TRACE_FILE", "scraper_trace.jsonl"))
+    gemini_usage.start_run()
     try:
         print("=" * 60)
         print("Starting brownout notice scraper...")
         print("=" * 60)
         
         # Step 1: Scrape fresh notices from ZANECO
-        print("\n[1/3] Scraping notices from ZANECO...")
+        print("\n[1/5] Scraping notices from ZANECO...")
         notices = get_notices()
         print(f"✓ Found {len(notices)} new notices")
         
         # Step 2: Save to Supabase
-        print("\n[2/3] Saving notices to database...")
+        print("\n[2/5] Saving notices to database...")
         result = save_notices_to_supabase(notices)
         print(f"✓ Inserted {result['inserted']} notices")
+        notify.fan_out(notices)
         
-        # Step 3: Clean up old expired notices
-        print("\n[3/3] Cleaning up expired notices...")
+        # Step 3: Re-check saved notices for edits (cancellations, replaced images)
+        print("\n[3/5] Revalidating saved notices...")
+        revalidated = revalidate_notices(skip_urls={n["url"] for n in notices})
+        print(f"✓ Updated {revalidated['updated']} notices")
+        
+        # Step 4: Clean up old expired notices
+        print("\n[4/5] Cleaning up expired notices...")
         deleted = delete_old_notices()
         print(f"✓ Deleted {deleted} old notices")
+
+        # Step 5: One canonical schedule set across reposts and cancellations
+        print("\n[5/5] Reconciling schedules...")
+        reconciled = reconcile.run()
+        print(f"✓ {reconciled.get('active', 0)} active schedules, {reconciled.get('cancelled', 0)} cancelled")
         
         print("\n" + "=" * 60)
         print("Scraper completed successfully!")
-        print(f"Summary: +{result['inserted']} new, -{deleted} old")
+        print(f"Summary: +{result['inserted']} new, ~{revalidated['updated']} updated, -{deleted} old")
         print("=" * 60)
         
     except Exception as e:
         print(f"\n❌ Scraper failed: {str(e)}")
         raise
+    finally:
+        gemini_usage.finish_run()
+        tracing.print_summary()
+        tracing.close()
 
 if __name__ == "__main__":
     main()
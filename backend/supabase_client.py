@@ -1,9 +1,210 @@
 # supabase_client.py
+"""
+Shared Supabase data-access layer.
+
+One lazily created client per process (so app.py, db.py and the scraper
+share a single connection pool), a configurable request timeout, retries
+with jittered backoff for idempotent calls, and a timing hook that sees
+every call by table/operation.
+
+Usage:
+    from supabase_client import run_query
+    res = run_query("notices", "select", lambda t: t.select("url"))
+
+The async serving mode (asgi.py) uses run_query_async() instead: the
+same retries and timing hook on supabase's AsyncClient, so an endpoint
+can await several independent queries with asyncio.gather().
+"""
+import asyncio
 import os
-from supabase import create_client, Client
+import random
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
+
+load_dotenv()
+
+# Request timeout for PostgREST calls (seconds)
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "15"))
+# Total attempts for idempotent calls (1 = no retry)
+SUPABASE_RETRIES = int(os.getenv("SUPABASE_RETRIES", "3"))
+# Base backoff in seconds; doubles each attempt, with full jitter
+SUPABASE_RETRY_BACKOFF = float(os.getenv("SUPABASE_RETRY_BACKOFF_SECONDS", "0.5"))
+# Calls slower than this are printed by the default timing hook
+SUPABASE_SLOW_MS = float(os.getenv("SUPABASE_SLOW_MS", "2000"))
+
+# Operations that are safe to replay after a transport failure.
+# Plain inserts are not (a timed-out insert may still have landed).
+IDEMPOTENT_OPS = {"select", "upsert", "update", "delete"}
+
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
+# An async client's connection pool belongs to the event loop that created it:
+# one client per loop, created under that loop's lock
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+_async_client_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> "Client":
+    """Return the process-wide Supabase client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # supabase (and httpx under it) is the slowest import in the API
+                # process, so it is deferred until the first query.
+                from supabase import create_client, ClientOptions
+                _client = create_client(
+                    os.environ["SUPABASE_URL"],
+                    os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+                    options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT),
+                )
+    return _client
+
+
+async def get_async_client() -> "AsyncClient":
+    """Return the Supabase AsyncClient for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is not None:
+        return client
+    with _client_lock:
+        lock = _async_client_locks.setdefault(loop, asyncio.Lock())
+    # Concurrent first requests wait for one client instead of each creating one
+    async with lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            from supabase import acreate_client, AsyncClientOptions
+            client = await acreate_client(
+                os.environ["SUPABASE_URL"],
+                os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+                options=AsyncClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT),
+            )
+            _async_clients[loop] = client
+    return client
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from supabase_client import supabase`
+    if name == "supabase":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ==============================
+# Timing
+# ==============================
+
+_timings: Dict[tuple, Dict[str, float]] = {}
+_timings_lock = threading.Lock()
+
+
+def _record_timing(table: str, op: str, elapsed: float, ok: bool, attempts: int):
+    """Default timing hook: aggregate per (table, op) and print slow calls."""
+    with _timings_lock:
+        stats = _timings.setdefault((table, op), {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = elapsed * 1000
+        stats["count"] += 1
+        stats["total_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+        if not ok:
+            stats["errors"] += 1
+    if elapsed * 1000 >= SUPABASE_SLOW_MS:
+        print(f"  Slow Supabase call: {table}.{op} took {elapsed * 1000:.0f}ms ({attempts} attempt(s))")
+
+
+_timing_hook: Callable[[str, str, float, bool, int], None] = _record_timing
+
+
+def set_timing_hook(hook: Optional[Callable[[str, str, float, bool, int], None]]):
+    """
+    Replace the per-call timing hook. The hook is called as
+    hook(table, op, elapsed_seconds, ok, attempts). Pass None to restore
+    the default aggregating hook.
+    """
+    global _timing_hook
+    _timing_hook = hook or _record_timing
+
+
+def get_timings() -> Dict[str, Dict[str, float]]:
+    """Snapshot of the default hook's aggregates, keyed "table.op"."""
+    with _timings_lock:
+        return {f"{t}.{o}": dict(s) for (t, o), s in _timings.items()}
+
+
+# ==============================
+# Query execution
+# ==============================
+
+def _max_attempts(op: str, idempotent: Optional[bool]) -> int:
+    if idempotent is None:
+        idempotent = op in IDEMPOTENT_OPS
+    return max(1, SUPABASE_RETRIES) if idempotent else 1
+
+
+def _backoff(table: str, op: str, attempt: int, error: Exception) -> float:
+    wait_time = random.uniform(0, SUPABASE_RETRY_BACKOFF * (2 ** (attempt - 1)))
+    print(f"  Supabase {table}.{op} failed ({error.__class__.__name__}), retrying in {wait_time:.2f}s...")
+    return wait_time
+
+
+def run_query(table: str, op: str, build: Callable[[Any], Any], idempotent: Optional[bool] = None):
+    """
+    Build a query on `table` with `build(client.table(table))` and execute it.
+    `op` labels the call for timing ("select", "upsert", "insert", ...).
+    Transport errors (timeouts, dropped connections) are retried with
+    jittered exponential backoff when the operation is idempotent.
+    """
+    import httpx
+
+    max_attempts = _max_attempts(op, idempotent)
+    start = time.perf_counter()
+    attempt = 0
+    ok = False
+    try:
+        while True:
+            attempt += 1
+            try:
+                res = build(get_client().table(table)).execute()
+                ok = True
+                return res
+            except httpx.TransportError as e:
+                if attempt >= max_attempts:
+                    raise
+                time.sleep(_backoff(table, op, attempt, e))
+    finally:
+        _timing_hook(table, op, time.perf_counter() - start, ok, attempt)
+
 
-# Store in environment variables for security
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Use service_role or anon depending on needs
+async def run_query_async(table: str, op: str, build: Callable[[Any], Any], idempotent: Optional[bool] = None):
+    """
+    run_query() on the async client: `build` receives the async table
+    builder, and the call waits without holding a thread, so concurrent
+    calls can share one event loop (await asyncio.gather(...)).
+    """
+    import httpx
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    max_attempts = _max_attempts(op, idempotent)
+    start = time.perf_counter()
+    attempt = 0
+    ok = False
+    try:
+        while True:
+            attempt += 1
+            try:
+                client = await get_async_client()
+                res = await build(client.table(table)).execute()
+                ok = True
+                return res
+            except httpx.TransportError as e:
+                if attempt >= max_attempts:
+                    raise
+                await asyncio.sleep(_backoff(table, op, attempt, e))
+    finally:
+        _timing_hook(table, op, time.perf_counter() - start, ok, attempt)
@@ -0,0 +1,209 @@
+"""
+Rule-based extraction for notices whose schedule is posted as text.
+
+Some ZANECO posts carry the schedule in the post body (date, time range,
+"Affected areas" per municipality) and not only in the attached images.
+parse_notice_text() reads that text deterministically and returns the
+same {"notices": [...]} shape Gemini produces, so it can go through the
+usual normalization. It only answers when it is confident — every
+schedule has a date and a time range, and every listed area resolves
+exactly to a reference municipality and barangay (or a known
+sub-location of one). A labelled line whose label is neither a
+municipality nor a known non-area label (Note:, Remarks:, ...) counts
+as unresolved. Otherwise it returns None and the caller falls
+back to the model.
+"""
+import re
+from datetime import datetime
+
+from reference_index import normalize_key
+
+_MONTHS = (
+    "january|february|march|april|may|june|july|august|"
+    "september|october|november|december|"
+    "jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec"
+)
+# "April 14, 2026", "April 15 & 16, 2026", "Apr. 14 2026"
+DATE_RE = re.compile(
+    rf"\b(?:{_MONTHS})\.?\s+\d{{1,2}}(?:\s*(?:&|,|and|-|–)\s*\d{{1,2}})*,?\s+\d{{4}}\b",
+    re.IGNORECASE,
+)
+_CLOCK = r"\d{1,2}(?::\d{2})?\s*(?:[ap]\.?\s?m\.?|nn|noon)"
+TIME_RANGE_RE = re.compile(rf"({_CLOCK})\s*(?:-|–|—|to)\s*({_CLOCK})", re.IGNORECASE)
+# "POLANCO: Guinles, Poblacion North" / "DIPOLOG CITY – Galas"
+AREA_LINE_RE = re.compile(r"^\s*([A-Za-z .ñÑ()]+?)\s*(?::|–|—|-)\s*(.+)$")
+REASON_RE = re.compile(r"^\s*(?:reason|purpose)\s*[:\-–]\s*(.+)$", re.IGNORECASE)
+ALL_BARANGAYS_RE = re.compile(r"^(?:all|entire|whole)\s+(?:barangays?|brgys?\.?|municipality|town|city)$", re.IGNORECASE)
+_ITEM_SPLIT_RE = re.compile(r"\s*(?:,|;|&|\band\b)\s*", re.IGNORECASE)
+_AREA_PREFIX_RE = re.compile(r"^(?:brgy\.?|barangay|portion\s+of|part\s+of|parts\s+of)\s+", re.IGNORECASE)
+
+# Labelled lines that are not area lines; any other label must be a municipality
+NON_AREA_LABEL_RE = re.compile(
+    r"^(?:notes?|remarks?|activity|activities|work|works|duration|contact|for inquiries)$", re.IGNORECASE
+)
+
+# "Reason:" alone on a line (bold label before a <br>), value on the next line
+_LABEL_ONLY_RE = re.compile(r"^(?:date|time|schedule|reason|purpose)s?\s*:$", re.IGNORECASE)
+
+_ABBREVIATIONS = (
+    (re.compile(r"^STA\.?\s", re.IGNORECASE), "SANTA "),
+    (re.compile(r"^STO\.?\s", re.IGNORECASE), "SANTO "),
+)
+
+
+def _name_key(name: str) -> str:
+    """Key for matching municipality/barangay names: expand Sta./Sto., drop "(Pob.)", Ñ → N."""
+    for pattern, repl in _ABBREVIATIONS:
+        name = pattern.sub(repl, name)
+    return normalize_key(re.sub(r"\(.*?\)", "", name).replace("ñ", "n").replace("Ñ", "N"))
+
+
+# Name lookups derived from the last reference index seen (rebuilt on hot reload)
+_lookups = {"index": None}
+
+
+def _get_lookups(index: dict) -> dict:
+    """
+    {"municipalities": {key: name}, "barangays": {muni: {key: name}}}.
+    Municipality keys cover "CITY OF DIPOLOG", "DIPOLOG CITY" and "DIPOLOG".
+    """
+    global _lookups
+    if _lookups["index"] is index:
+        return _lookups
+    municipalities = {}
+    for name in index["municipality_names"]:
+        municipalities[_name_key(name)] = name
+        m = re.match(r"^CITY OF (.+)$", name, re.IGNORECASE)
+        if m:
+            municipalities.setdefault(_name_key(f"{m.group(1)} CITY"), name)
+            municipalities.setdefault(_name_key(m.group(1)), name)
+    barangays = {
+        muni: {_name_key(b): b for b in names}
+        for muni, names in index["barangay_names"].items()
+    }
+    _lookups = {"index": index, "municipalities": municipalities, "barangays": barangays}
+    return _lookups
+
+
+def parse_clock(text: str):
+    """Clock text like "8:30AM", "5 p.m." or "12NN" → datetime on 1900-01-01, or None."""
+    text = re.sub(r"[\s.]", "", text.lower()).replace("noon", "pm").replace("nn", "pm")
+    for fmt in ("%I:%M%p", "%I%p"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _duration_hours(start: str, end: str):
+    a, b = parse_clock(start), parse_clock(end)
+    if a is None or b is None or b <= a:
+        return None
+    return round((b - a).total_seconds() / 3600, 2)
+
+
+def _resolve_items(muni_name: str, items: list, index: dict):
+    """
+    Map area items to barangays. Returns ({"all_barangays": bool, "barangays": [...]}, unresolved).
+    An item is a barangay name or a sub-location owned by exactly one barangay.
+    """
+    by_key = _get_lookups(index)["barangays"][muni_name]
+    sub_locations = index["location_to_barangays"].get(muni_name, {})
+    barangays = {}
+    whole = set()
+    unresolved = []
+    for item in items:
+        if ALL_BARANGAYS_RE.match(item):
+            return {"all_barangays": True, "barangays": []}, []
+        bname = by_key.get(_name_key(_AREA_PREFIX_RE.sub("", item)))
+        if bname:
+            barangays.setdefault(bname, [])
+            whole.add(bname)
+            continue
+        owners = sub_locations.get(normalize_key(_AREA_PREFIX_RE.sub("", item)))
+        if owners and len(owners) == 1:
+            (owner,) = owners
+            barangays.setdefault(owner, []).append(item)
+        else:
+            unresolved.append(item)
+    return {
+        "all_barangays": False,
+        "barangays": [
+            # A barangay listed by name is affected as a whole
+            {"name": name, "affected_area": ", ".join(areas) if areas and name not in whole else None}
+            for name, areas in barangays.items()
+        ],
+    }, unresolved
+
+
+def _lines(text: str) -> list:
+    """Non-empty stripped lines, with label-only lines joined to the value after them."""
+    lines = []
+    pending_label = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if _LABEL_ONLY_RE.match(line):
+            pending_label = line
+            continue
+        lines.append(f"{pending_label} {line}" if pending_label else line)
+        pending_label = None
+    return lines
+
+
+def parse_notice_text(text: str, index: dict):
+    """
+    Parse a post body into {"notices": [...]} (Gemini's output shape), or
+    return None when any part of it can't be read with confidence.
+    """
+    if not text or not DATE_RE.search(text) or not TIME_RANGE_RE.search(text):
+        return None
+
+    aliases = _get_lookups(index)["municipalities"]
+    schedules = []
+    current = None
+    for line in _lines(text):
+        dates = DATE_RE.findall(line)
+        # A new date after locations were listed starts the next schedule
+        if dates and (current is None or current["locations"]):
+            current = {"dates": [], "times": [], "locations": [], "reason": None}
+            schedules.append(current)
+        if current is None:
+            continue
+        current["dates"].extend(d for d in dates if d not in current["dates"])
+
+        for start, end in TIME_RANGE_RE.findall(line):
+            current["times"].append(f"{start.strip()} - {end.strip()}")
+        if dates or TIME_RANGE_RE.search(line):
+            continue
+
+        reason = REASON_RE.match(line)
+        if reason:
+            current["reason"] = reason.group(1).strip()
+            continue
+
+        area = AREA_LINE_RE.match(line)
+        if not area:
+            continue
+        muni_name = aliases.get(_name_key(area.group(1)))
+        if muni_name is None:
+            if NON_AREA_LABEL_RE.match(area.group(1).strip()):
+                continue
+            # Likely a misspelled or unknown municipality: its barangays would be lost
+            return None
+        items = [i.strip(" .") for i in _ITEM_SPLIT_RE.split(area.group(2)) if i.strip(" .")]
+        resolved, unresolved = _resolve_items(muni_name, items, index)
+        if unresolved or not (resolved["all_barangays"] or resolved["barangays"]):
+            return None
+        current["locations"].append({"municipality": muni_name, **resolved})
+
+    if not schedules:
+        return None
+    for s in schedules:
+        if not s["dates"] or not s["times"] or not s["locations"]:
+            return None
+        start, end = TIME_RANGE_RE.search(s["times"][0]).groups()
+        s["duration_hours"] = _duration_hours(start, end)
+    return {"notices": schedules}
@@ -0,0 +1,154 @@
+"""
+Lightweight timing spans for the scraper pipeline.
+
+Disabled by default so API workers pay nothing. run_scraper.py calls
+configure() to turn it on; every span is then kept in memory for the
+end-of-run summary and, when a path is given, written to a JSON lines
+file (one object per span) that CI uploads as an artifact.
+
+    with span("post_fetch", url=post_url):
+        ...
+    record("normalize", elapsed_seconds, image=img_url)
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_enabled = False
+_spans = []
+_lock = threading.Lock()
+_trace_fp = None
+
+
+def configure(path: str = None):
+    """Enable tracing; spans are also written to `path` as JSON lines if given."""
+    global _enabled, _trace_fp
+    with _lock:
+        _enabled = True
+        _spans.clear()
+        if _trace_fp:
+            _trace_fp.close()
+        _trace_fp = open(path, "w", encoding="utf-8") if path else None
+
+    # Time every Supabase call as a span too
+    from supabase_client import set_timing_hook
+
+    def _db_hook(table, op, elapsed, ok, attempts):
+        record(f"db_{op}", elapsed, ok=ok, table=table, attempts=attempts)
+
+    set_timing_hook(_db_hook)
+
+
+def close():
+    global _trace_fp
+    with _lock:
+        if _trace_fp:
+            _trace_fp.close()
+            _trace_fp = None
+
+
+def record(stage: str, duration: float, ok: bool = True, **attrs):
+    """Record a finished span that was timed by the caller."""
+    if not _enabled:
+        return
+    entry = {
+        "stage": stage,
+        "ts": datetime.utcnow().isoformat(),
+        "duration_ms": round(duration * 1000, 2),
+        "ok": ok,
+        **attrs,
+    }
+    with _lock:
+        _spans.append(entry)
+        if _trace_fp:
+            _trace_fp.write(json.dumps(entry, default=str) + "\n")
+            _trace_fp.flush()
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Time the enclosed block. Yields the attrs dict so the block can add
+    details (e.g. a status code); an exception marks the span ok=False.
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield attrs
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, ok=ok, **attrs)
+
+
+def get_spans() -> list:
+    with _lock:
+        return list(_spans)
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(spans: list = None) -> dict:
+    """Per-stage count/total/p50/p95/max and per-model Gemini totals."""
+    spans = get_spans() if spans is None else spans
+    by_stage = {}
+    for s in spans:
+        by_stage.setdefault(s["stage"], []).append(s)
+
+    stages = {}
+    for stage, items in by_stage.items():
+        durations = sorted(i["duration_ms"] for i in items)
+        stages[stage] = {
+            "count": len(items),
+            "errors": sum(1 for i in items if not i.get("ok", True)),
+            "total_ms": round(sum(durations), 1),
+            "p50_ms": round(_percentile(durations, 50), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "max_ms": round(durations[-1], 1),
+        }
+
+    models = {}
+    for s in spans:
+        model = s.get("model")
+        if not model:
+            continue
+        m = models.setdefault(model, {"attempts": 0, "successes": 0, "call_ms": 0.0, "backoff_ms": 0.0})
+        if s["stage"] == "gemini_attempt":
+            m["attempts"] += 1
+            m["successes"] += 1 if s.get("ok", True) else 0
+            m["call_ms"] = round(m["call_ms"] + s["duration_ms"], 1)
+        elif s["stage"] == "gemini_backoff":
+            m["backoff_ms"] = round(m["backoff_ms"] + s["duration_ms"], 1)
+
+    return {"stages": stages, "models": models}
+
+
+def print_summary(spans: list = None):
+    summary = summarize(spans)
+    if not summary["stages"]:
+        return
+    print("\nStage timings (ms):")
+    print(f"  {'stage':<22} {'count':>6} {'errors':>6} {'total':>10} {'p50':>9} {'p95':>9} {'max':>9}")
+    for stage, st in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        print(
+            f"  {stage:<22} {st['count']:>6} {st['errors']:>6} {st['total_ms']:>10.1f} "
+            f"{st['p50_ms']:>9.1f} {st['p95_ms']:>9.1f} {st['max_ms']:>9.1f}"
+        )
+    if summary["models"]:
+        print("\nGemini totals per model:")
+        print(f"  {'model':<32} {'attempts':>8} {'ok':>4} {'call s':>9} {'backoff s':>10}")
+        for model, m in summary["models"].items():
+            print(
+                f"  {model:<32} {m['attempts']:>8} {m['successes']:>4} "
+                f"{m['call_ms'] / 1000:>9.1f} {m['backoff_ms'] / 1000:>10.1f}"
+            )